@@ -6,8 +6,9 @@ Routes are organized in separate blueprint modules in the routes package.
 """
 
 from flask import Flask
-from database import init_database, add_sample_data
+from database import init_app, ensure_schema, add_sample_data
 from routes import register_blueprints
+from cli import register_commands
 
 
 def create_app():
@@ -20,18 +21,23 @@ def create_app():
     app = Flask(__name__)
     app.secret_key = "super secret key"
     
-    # Initialize the database
-    init_database()
+    # Configure the connection pool and per-request connection handling
+    init_app(app)
     
-    # Add sample data for testing and demonstration
-    add_sample_data()
+    # Create or migrate the database (once per process; a no-op when the schema is current)
+    ensure_schema()
     
     # Register all route blueprints
     register_blueprints(app)
     
+    # Register CLI commands (flask import-books, ...)
+    register_commands(app)
+    
     return app
 
 
 if __name__ == '__main__':
     app = create_app()
+    # Sample data for demonstration; otherwise seed with `flask seed`
+    add_sample_data()
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,13 @@
+"""
+ASGI entry point, e.g.
+
+    uvicorn asgi:app --workers 2
+
+/api/late_fee and /api/search are served asynchronously (routes/async_api.py);
+every other path is handed to the Flask app.
+"""
+
+from app import create_app
+from routes.async_api import create_asgi_app
+
+app = create_asgi_app(create_app())
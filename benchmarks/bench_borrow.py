@@ -0,0 +1,94 @@
+"""
+Benchmark: borrows/sec for the legacy multi-commit borrow path versus the
+single-transaction borrow_book_transaction().
+
+The legacy path is the pre-transaction sequence of helper calls
+(get_book_by_id, get_patron_borrow_count, insert_borrow_record,
+update_book_availability). Both run from several threads against a fresh
+database and the benchmark reports throughput and any oversubscribed copies.
+
+Usage:
+    python -m benchmarks.bench_borrow [--borrows 2000] [--threads 8] [--profile durability]
+"""
+
+import argparse
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+import database
+
+
+def legacy_borrow(patron_id, book_id, borrow_date, due_date):
+    book = database.get_book_by_id(book_id)
+    if not book or book['available_copies'] <= 0:
+        return 'unavailable', book
+    if database.get_patron_borrow_count(patron_id) >= database.MAX_BORROWED_BOOKS:
+        return 'limit_reached', book
+    if not database.insert_borrow_record(patron_id, book_id, borrow_date, due_date):
+        return 'error', book
+    if not database.update_book_availability(book_id, -1):
+        return 'error', book
+    return 'borrowed', book
+
+
+def run(borrow, borrows: int, threads: int, copies: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DATABASE = os.path.join(tmp, 'bench.db')
+        database.init_database()
+        database.insert_book('Bench Book', 'Bench Author', '9999999999999', copies, copies)
+        book_id = database.get_book_by_isbn('9999999999999')['id']
+
+        per_thread = borrows // threads
+        counts = []
+        lock = threading.Lock()
+
+        def worker(offset):
+            ok = 0
+            for i in range(per_thread):
+                patron_id = f'{offset * per_thread + i:06d}'
+                now = datetime.now()
+                if borrow(patron_id, book_id, now, now + timedelta(days=14))[0] == 'borrowed':
+                    ok += 1
+            with lock:
+                counts.append(ok)
+
+        workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+        start = time.perf_counter()
+        for t in workers:
+            t.start()
+        for t in workers:
+            t.join()
+        elapsed = time.perf_counter() - start
+
+        book = database.get_book_by_id(book_id)
+        database.close_pool()
+
+    return {
+        'borrows_per_sec': per_thread * threads / elapsed,
+        'borrowed': sum(counts),
+        'available_copies': book['available_copies'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--borrows', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--profile', default=database.STORAGE_PROFILE)
+    args = parser.parse_args()
+    database.STORAGE_PROFILE = args.profile
+
+    print(f"{'scenario':<12}{'path':<14}{'borrows/s':>12}{'borrowed':>10}{'copies left':>13}")
+    # 'plenty': every attempt succeeds; 'contended': threads race for the last copies
+    for scenario, copies in (('plenty', args.borrows), ('contended', args.borrows // 2)):
+        for name, borrow in (('legacy', legacy_borrow), ('transaction', database.borrow_book_transaction)):
+            stats = run(borrow, args.borrows, args.threads, copies)
+            print(f"{scenario:<12}{name:<14}{stats['borrows_per_sec']:>12.0f}{stats['borrowed']:>10}"
+                  f"{stats['available_copies']:>13}")
+    print("('copies left' below 0 means copies were oversubscribed)")
+
+if __name__ == '__main__':
+    main()
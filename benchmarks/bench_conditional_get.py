@@ -0,0 +1,70 @@
+"""
+Benchmark: polling clients re-fetching /catalog and /api/search with and
+without conditional GET (If-None-Match against the catalog ETag).
+
+Usage:
+    python -m benchmarks.bench_conditional_get [--books 5000] [--polls 2000] [--change-every 100]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import database
+from app import create_app
+
+PATHS = ['/catalog', '/catalog?per_page=200', '/api/search?q=title+1&limit=50']
+
+
+def _setup(path: str, books: int):
+    database.DATABASE = path
+    database.init_database()
+    database.insert_books_batch(
+        [(f'Title {i}', f'Author {i % 500}', f'{i:013d}', 3, 3) for i in range(books)]
+    )
+
+
+def _poll(client, polls: int, change_every: int, conditional: bool) -> dict:
+    etags = {}
+    sent = not_modified = 0
+    start = time.perf_counter()
+    for i in range(polls):
+        if change_every and i and i % change_every == 0:
+            database.update_book_availability(1, -1 if i % (2 * change_every) else 1)
+        path = PATHS[i % len(PATHS)]
+        headers = {'If-None-Match': etags[path]} if conditional and path in etags else {}
+        response = client.get(path, headers=headers)
+        if response.status_code == 304:
+            not_modified += 1
+        else:
+            etags[path] = response.headers['ETag']
+        sent += len(response.data)
+    seconds = time.perf_counter() - start
+    return {'seconds': seconds, 'rps': polls / seconds, 'not_modified': not_modified, 'bytes': sent}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--books', type=int, default=5000)
+    parser.add_argument('--polls', type=int, default=2000)
+    parser.add_argument('--change-every', type=int, default=100,
+                        help='Polls between catalog changes (0: never changes)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        _setup(os.path.join(tmp, 'bench.db'), args.books)
+        client = create_app().test_client()
+        results = {
+            'unconditional': _poll(client, args.polls, args.change_every, conditional=False),
+            'If-None-Match': _poll(client, args.polls, args.change_every, conditional=True),
+        }
+        database.close_pool()
+
+    print(f"{'polling':<16}{'seconds':>10}{'req/s':>10}{'304s':>8}{'KB sent':>10}")
+    for name, r in results.items():
+        print(f"{name:<16}{r['seconds']:>10.2f}{r['rps']:>10.0f}{r['not_modified']:>8}{r['bytes'] / 1024:>10.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""
+Benchmark: peak Python memory for a full catalog export, materialized with
+get_all_books() versus streamed with iter_table_rows().
+
+Usage:
+    python -m benchmarks.bench_export [--sizes 10000 50000 200000]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+import database
+
+
+def _populate(count: int):
+    conn = database.get_db_connection()
+    conn.executemany(
+        'INSERT INTO books (title, author, isbn, total_copies, available_copies) VALUES (?, ?, ?, ?, ?)',
+        ((f'Title {i}', f'Author {i}', f'{i:013d}', 3, 3) for i in range(count))
+    )
+    conn.commit()
+    conn.close()
+
+
+def _measure(func) -> tuple:
+    tracemalloc.start()
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 1024 / 1024, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 50000, 200000])
+    args = parser.parse_args()
+
+    print(f"{'rows':>10}{'list MB':>12}{'stream MB':>12}{'list s':>10}{'stream s':>10}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            database.DATABASE = os.path.join(tmp, 'bench.db')
+            database.init_database()
+            _populate(size)
+            list_mb, list_s = _measure(database.get_all_books)
+            stream_mb, stream_s = _measure(lambda: sum(1 for _ in database.iter_table_rows('books')))
+            database.close_pool()
+        print(f"{size:>10}{list_mb:>12.1f}{stream_mb:>12.1f}{list_s:>10.2f}{stream_s:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
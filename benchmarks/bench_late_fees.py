@@ -0,0 +1,45 @@
+"""
+Benchmark: late fees for 1M synthetic loans, evaluated one loan at a time
+with compute_late_fee() versus the whole batch with compute_late_fees().
+
+Usage:
+    python -m benchmarks.bench_late_fees [--loans 1000000]
+"""
+
+import argparse
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from services.fee_engine import compute_late_fee, compute_late_fees
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--loans', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(327)
+    now = datetime.now()
+    now_ts = int(now.timestamp())
+    # Due dates spread from 10 days in the future to 60 days overdue
+    due_ts = now_ts - rng.integers(-10 * 86400, 60 * 86400, size=args.loans)
+
+    due_dates = [now - timedelta(seconds=int(now_ts - ts)) for ts in due_ts]
+    start = time.perf_counter()
+    scalar_total = sum(compute_late_fee(due, now)[0] for due in due_dates)
+    scalar_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    fees, _ = compute_late_fees(due_ts, now_ts)
+    vector_total = float(fees.sum())
+    vector_s = time.perf_counter() - start
+
+    print(f"{'engine':<12}{'seconds':>10}{'loans/s':>14}{'total fees':>14}")
+    print(f"{'scalar':<12}{scalar_s:>10.3f}{args.loans / scalar_s:>14.0f}{scalar_total:>14.2f}")
+    print(f"{'vectorized':<12}{vector_s:>10.3f}{args.loans / vector_s:>14.0f}{vector_total:>14.2f}")
+
+
+if __name__ == '__main__':
+    main()
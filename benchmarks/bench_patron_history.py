@@ -0,0 +1,126 @@
+"""
+Benchmark: reading a large patron history with ISO text dates versus
+integer epoch dates.
+
+Builds the same loans twice, once in the legacy schema (ISO text columns,
+parsed with datetime.fromisoformat per row and is_overdue checked against
+datetime.now() per row) and once through the current schema and
+get_patron_borrowed_books() (epoch integers, is_overdue computed in SQL).
+Reports time and peak Python memory for the materialized rows.
+
+Usage:
+    python -m benchmarks.bench_patron_history [--loans 200000]
+"""
+
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import database
+
+
+def _loans(count: int):
+    now = datetime.now()
+    for i in range(count):
+        borrowed = now - timedelta(days=i % 30, minutes=i)
+        yield '123456', 1, borrowed, borrowed + timedelta(days=14)
+
+
+def _setup_legacy(path: str, count: int):
+    conn = sqlite3.connect(path)
+    conn.executescript('''
+        CREATE TABLE books (id INTEGER PRIMARY KEY, title TEXT NOT NULL, author TEXT NOT NULL);
+        CREATE TABLE borrow_records (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            patron_id TEXT NOT NULL,
+            book_id INTEGER NOT NULL,
+            borrow_date TEXT NOT NULL,
+            due_date TEXT NOT NULL,
+            return_date TEXT
+        );
+        CREATE INDEX idx_borrow_records_open_patron ON borrow_records (patron_id) WHERE return_date IS NULL;
+        INSERT INTO books VALUES (1, 'Title', 'Author');
+    ''')
+    conn.executemany(
+        'INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date) VALUES (?, ?, ?, ?)',
+        ((patron, book, borrowed.isoformat(), due.isoformat()) for patron, book, borrowed, due in _loans(count))
+    )
+    conn.commit()
+    conn.close()
+
+
+def _setup_epoch(path: str, count: int):
+    database.DATABASE = path
+    database.init_database()
+    conn = database.get_pool().acquire()
+    conn.execute("INSERT INTO books (id, title, author, isbn, total_copies, available_copies) "
+                 "VALUES (1, 'Title', 'Author', '0000000000001', 1, 1)")
+    conn.executemany(
+        'INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date) VALUES (?, ?, ?, ?)',
+        ((patron, book, database.to_epoch(borrowed), database.to_epoch(due))
+         for patron, book, borrowed, due in _loans(count))
+    )
+    conn.commit()
+    conn.close()
+
+
+def _legacy_borrowed_books(path: str):
+    """The pre-migration get_patron_borrowed_books()."""
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    records = conn.execute('''
+        SELECT br.*, b.title, b.author
+        FROM borrow_records br
+        JOIN books b ON br.book_id = b.id
+        WHERE br.patron_id = ? AND br.return_date IS NULL
+        ORDER BY br.borrow_date
+    ''', ('123456',)).fetchall()
+    conn.close()
+    return [{
+        'book_id': record['book_id'],
+        'title': record['title'],
+        'author': record['author'],
+        'borrow_date': datetime.fromisoformat(record['borrow_date']),
+        'due_date': datetime.fromisoformat(record['due_date']),
+        'is_overdue': datetime.now() > datetime.fromisoformat(record['due_date'])
+    } for record in records]
+
+
+def _measure(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    rows = fn()
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak, sum(row['is_overdue'] for row in rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--loans', type=int, default=200_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_path = os.path.join(tmp, 'legacy.db')
+        epoch_path = os.path.join(tmp, 'epoch.db')
+        _setup_legacy(legacy_path, args.loans)
+        _setup_epoch(epoch_path, args.loans)
+
+        results = {
+            'iso text': _measure(lambda: _legacy_borrowed_books(legacy_path)),
+            'epoch int': _measure(lambda: database.get_patron_borrowed_books('123456')),
+        }
+        database.close_pool()
+
+    print(f"{'dates':<12}{'seconds':>10}{'peak MB':>10}{'overdue':>10}")
+    for name, (seconds, peak, overdue) in results.items():
+        print(f"{name:<12}{seconds:>10.3f}{peak / 2**20:>10.1f}{overdue:>10}")
+
+
+if __name__ == '__main__':
+    main()
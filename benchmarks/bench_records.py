@@ -0,0 +1,71 @@
+"""
+Benchmark: building catalog rows as dicts from sqlite3.Row versus slotted
+Book records from a row_factory.
+
+Usage:
+    python -m benchmarks.bench_records [--books 200000]
+"""
+
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+
+import database
+from records import Book
+
+
+def _setup(path: str, books: int):
+    database.DATABASE = path
+    database.init_database()
+    conn = database.get_pool().acquire()
+    conn.executemany(
+        'INSERT INTO books (title, author, isbn, total_copies, available_copies) VALUES (?, ?, ?, ?, ?)',
+        ((f'Title {i}', f'Author {i % 5000}', f'{i:013d}', 3, 3) for i in range(books))
+    )
+    conn.commit()
+    conn.close()
+
+
+def _as_dicts(conn):
+    """The pre-record data layer: sqlite3.Row copied into a dict per row."""
+    conn.row_factory = sqlite3.Row
+    return [dict(row) for row in conn.execute(f'SELECT {database.BOOK_COLUMNS} FROM books')]
+
+
+def _as_records(conn):
+    return database.query_records(conn, Book, f'SELECT {database.BOOK_COLUMNS} FROM books').fetchall()
+
+
+def _measure(path: str, build):
+    conn = sqlite3.connect(path)
+    tracemalloc.start()
+    start = time.perf_counter()
+    rows = build(conn)
+    seconds = time.perf_counter() - start
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    conn.close()
+    return seconds, size / len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--books', type=int, default=200_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        _setup(path, args.books)
+        database.close_pool()
+        results = {'dict': _measure(path, _as_dicts), 'Book': _measure(path, _as_records)}
+
+    print(f"{'row type':<10}{'seconds':>10}{'rows/s':>12}{'bytes/row':>12}")
+    for name, (seconds, per_row) in results.items():
+        print(f"{name:<10}{seconds:>10.3f}{args.books / seconds:>12.0f}{per_row:>12.0f}")
+
+
+if __name__ == '__main__':
+    main()
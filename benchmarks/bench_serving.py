@@ -0,0 +1,143 @@
+"""
+Load test: requests/sec and latency for the development server (`flask run`)
+versus the production gunicorn profile (wsgi.py + gunicorn.conf.py).
+
+Each server is started against a freshly seeded database in a temporary
+directory, then hammered by keep-alive client threads cycling through the
+catalog page and a few JSON endpoints.
+
+Usage:
+    python -m benchmarks.bench_serving [--seconds 10] [--clients 32] [--workers 4] [--threads 8]
+"""
+
+import argparse
+import http.client
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PATHS = ['/catalog', '/api/search?q=great&type=title', '/api/late_fee/123456/3', '/api/patron/123456']
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _wait_until_up(port: int, timeout: float = 20):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            conn.request('GET', '/catalog')
+            conn.getresponse().read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f'server on port {port} did not start')
+
+
+def _load(port: int, seconds: float, clients: int) -> dict:
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    stop_at = time.monotonic() + seconds
+
+    def client(offset):
+        mine, failed = [], 0
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+        i = offset
+        while time.monotonic() < stop_at:
+            start = time.perf_counter()
+            for attempt in range(2):
+                try:
+                    conn.request('GET', PATHS[i % len(PATHS)])
+                    response = conn.getresponse()
+                    response.read()
+                    if response.status >= 500:
+                        failed += 1
+                    if response.getheader('Connection', '').lower() == 'close':
+                        conn.close()
+                    break
+                except (OSError, http.client.HTTPException):
+                    # A recycled worker drops its keep-alive connections; retry once on a new one
+                    conn.close()
+                    if attempt:
+                        failed += 1
+            mine.append(time.perf_counter() - start)
+            i += 1
+        conn.close()
+        with lock:
+            latencies.extend(mine)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'rps': len(latencies) / seconds,
+        'p50_ms': latencies[len(latencies) // 2] * 1000 if latencies else 0.0,
+        'p99_ms': latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0.0,
+        'errors': errors[0],
+    }
+
+
+def _serve(command, env, tmp, port, seconds, clients) -> dict:
+    server = subprocess.Popen(command, cwd=tmp, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        _wait_until_up(port)
+        return _load(port, seconds, clients)
+    finally:
+        server.terminate()
+        server.wait(10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        # The database path is relative ('library.db'), so each server uses the temp directory's copy
+        env = dict(os.environ, PYTHONPATH=ROOT, FLASK_APP='app',
+                   LIBRARY_WEB_WORKERS=str(args.workers), LIBRARY_WEB_THREADS=str(args.threads),
+                   LIBRARY_ACCESS_LOG='')
+        subprocess.run([sys.executable, '-m', 'flask', 'seed'], cwd=tmp, env=env, check=True,
+                       stdout=subprocess.DEVNULL)
+
+        port = _free_port()
+        results['flask run'] = _serve([sys.executable, '-m', 'flask', 'run', '--port', str(port)],
+                                      env, tmp, port, args.seconds, args.clients)
+        try:
+            import gunicorn  # noqa: F401
+        except ImportError:
+            print('gunicorn is not installed; skipping the production profile (pip install gunicorn)')
+        else:
+            port = _free_port()
+            env['LIBRARY_BIND'] = f'127.0.0.1:{port}'
+            results[f'gunicorn {args.workers}x{args.threads}'] = _serve(
+                [sys.executable, '-m', 'gunicorn', '-c', os.path.join(ROOT, 'gunicorn.conf.py'), 'wsgi:app'],
+                env, tmp, port, args.seconds, args.clients)
+
+    print(f"{'server':<18}{'requests':>10}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for name, r in results.items():
+        print(f"{name:<18}{r['requests']:>10}{r['rps']:>10.0f}{r['p50_ms']:>10.1f}{r['p99_ms']:>10.1f}{r['errors']:>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""
+Benchmark: concurrent catalog reads while borrows are being written.
+
+Runs one writer thread that keeps committing borrow-style transactions and
+several reader threads that keep listing the catalog, once per storage
+profile, and reports read throughput and worst-case read latency.
+
+Usage:
+    python -m benchmarks.bench_storage_profile [--seconds 3] [--readers 4]
+"""
+
+import argparse
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+import database
+
+
+def _setup(path: str, books: int = 2000):
+    conn = sqlite3.connect(path)
+    conn.execute('''
+        CREATE TABLE books (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            author TEXT NOT NULL,
+            isbn TEXT UNIQUE NOT NULL,
+            total_copies INTEGER NOT NULL,
+            available_copies INTEGER NOT NULL
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE borrow_records (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            patron_id TEXT NOT NULL,
+            book_id INTEGER NOT NULL,
+            borrow_date INTEGER NOT NULL,
+            due_date INTEGER NOT NULL,
+            return_date INTEGER
+        )
+    ''')
+    conn.executemany(
+        'INSERT INTO books (title, author, isbn, total_copies, available_copies) VALUES (?, ?, ?, ?, ?)',
+        [(f'Title {i}', f'Author {i}', f'{i:013d}', 1000000, 1000000) for i in range(books)]
+    )
+    conn.commit()
+    conn.close()
+
+
+def _connect(path: str, settings: dict) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+    database.apply_storage_settings(conn, settings)
+    return conn
+
+
+def run(profile: str, seconds: float, readers: int) -> dict:
+    settings = database.get_storage_settings(profile) if profile != 'default' else {}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        _setup(path)
+        stop = threading.Event()
+        stats = {'reads': 0, 'writes': 0, 'max_read_ms': 0.0}
+        lock = threading.Lock()
+
+        def writer():
+            conn = _connect(path, settings)
+            while not stop.is_set():
+                conn.execute('BEGIN IMMEDIATE')
+                conn.execute('UPDATE books SET available_copies = available_copies - 1 WHERE id = 1')
+                conn.execute(
+                    "INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date) "
+                    "VALUES ('123456', 1, CAST(strftime('%s', 'now') AS INTEGER), "
+                    "CAST(strftime('%s', 'now', '+14 days') AS INTEGER))"
+                )
+                conn.commit()
+                stats['writes'] += 1
+            conn.close()
+
+        def reader():
+            conn = _connect(path, settings)
+            reads, worst = 0, 0.0
+            while not stop.is_set():
+                start = time.perf_counter()
+                conn.execute('SELECT * FROM books ORDER BY title LIMIT 50').fetchall()
+                worst = max(worst, time.perf_counter() - start)
+                reads += 1
+            conn.close()
+            with lock:
+                stats['reads'] += reads
+                stats['max_read_ms'] = max(stats['max_read_ms'], worst * 1000)
+
+        threads = [threading.Thread(target=writer)] + [threading.Thread(target=reader) for _ in range(readers)]
+        for t in threads:
+            t.start()
+        time.sleep(seconds)
+        stop.set()
+        for t in threads:
+            t.join()
+
+    stats['reads_per_sec'] = stats['reads'] / seconds
+    stats['writes_per_sec'] = stats['writes'] / seconds
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--seconds', type=float, default=3.0)
+    parser.add_argument('--readers', type=int, default=4)
+    args = parser.parse_args()
+
+    print(f"{'profile':<12}{'reads/s':>12}{'writes/s':>12}{'max read ms':>14}")
+    for profile in ('default', 'durability', 'throughput'):
+        stats = run(profile, args.seconds, args.readers)
+        print(f"{profile:<12}{stats['reads_per_sec']:>12.0f}{stats['writes_per_sec']:>12.0f}"
+              f"{stats['max_read_ms']:>14.2f}")
+
+
+if __name__ == '__main__':
+    main()
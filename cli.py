@@ -0,0 +1,122 @@
+"""
+CLI Commands - Flask command line tasks for the Library Management System
+Run with `flask <command>`; see `flask --help` for the list.
+"""
+
+import csv
+import json
+import os
+
+import click
+
+from database import add_sample_data, rebuild_patron_counters
+from services.library_service import import_books_to_catalog, settle_outstanding_fees
+from services.reconciliation import ReconciliationWorker, RECONCILE_BATCH_SIZE
+
+
+def _read_csv(stream):
+    """Yield (line_number, row) pairs from a CSV file with a header row."""
+    for line_number, row in enumerate(csv.DictReader(stream), start=2):
+        yield line_number, row
+
+def _read_ndjson(stream):
+    """Yield (line_number, object) pairs from newline-delimited JSON."""
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except ValueError:
+            yield line_number, None
+
+READERS = {'csv': _read_csv, 'ndjson': _read_ndjson}
+
+
+@click.command('import-books')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'file_format', type=click.Choice(sorted(READERS)),
+              help='Input format (default: from the file extension).')
+@click.option('--batch-size', default=1000, show_default=True, help='Books inserted per transaction.')
+def import_books_command(path, file_format, batch_size):
+    """Bulk-import books from a CSV or NDJSON file."""
+    if file_format is None:
+        extension = os.path.splitext(path)[1].lower().lstrip('.')
+        file_format = 'ndjson' if extension in ('ndjson', 'jsonl') else 'csv'
+    
+    with open(path, newline='', encoding='utf-8') as stream:
+        result = import_books_to_catalog(READERS[file_format](stream), batch_size)
+    
+    for line_number, reason in result['rejected']:
+        click.echo(f"line {line_number}: {reason}", err=True)
+    
+    total = result['imported'] + len(result['rejected'])
+    rate = total / result['seconds'] if result['seconds'] > 0 else total
+    click.echo(f"Imported {result['imported']} books, rejected {len(result['rejected'])} "
+               f"in {result['seconds']:.2f}s ({rate:.0f} rows/sec).")
+
+
+@click.command('seed')
+def seed_command():
+    """Add the sample books and loan if the catalog is empty."""
+    add_sample_data()
+    click.echo("Sample data ready.")
+
+
+@click.command('rebuild-patron-counters')
+@click.option('--check', is_flag=True, help='Report drift without repairing it; exit 1 if any.')
+def rebuild_patron_counters_command(check):
+    """Recompute per-patron loan and fee counters from borrow_records."""
+    mismatches = rebuild_patron_counters(check_only=check)
+    for row in mismatches:
+        click.echo(f"patron {row['patron_id']}: open_loans {row['stored_open_loans']} -> {row['open_loans']}, "
+                   f"fees_owed {row['stored_fees_owed']:.2f} -> {row['fees_owed']:.2f}", err=True)
+    
+    if check:
+        click.echo(f"{len(mismatches)} patron counters out of date.")
+        if mismatches:
+            raise SystemExit(1)
+    else:
+        click.echo(f"Repaired {len(mismatches)} patron counters.")
+
+
+@click.command('settle-fees')
+@click.option('--workers', default=4, show_default=True, help='Patrons charged concurrently.')
+def settle_fees_command(workers):
+    """Charge every patron's outstanding late fees, one payment per patron."""
+    result = settle_outstanding_fees(workers)
+    for patron_id, message in result['failed']:
+        click.echo(f"patron {patron_id}: {message}", err=True)
+    click.echo(f"Settled {result['settled']} patrons, {len(result['failed'])} failed "
+               f"in {result['seconds']:.2f}s. ${result['accruing']:.2f} still accruing on open loans.")
+    if result['failed']:
+        raise SystemExit(1)
+
+
+@click.command('reconcile-payments')
+@click.option('--batch-size', default=RECONCILE_BATCH_SIZE, show_default=True,
+              help='Pending payments checked per gateway batch.')
+@click.option('--loop', is_flag=True,
+              help='Keep reconciling every LIBRARY_RECONCILE_INTERVAL seconds until interrupted.')
+def reconcile_payments_command(batch_size, loop):
+    """Check pending ledger payments with the gateway (once, or as the dedicated reconciler)."""
+    worker = ReconciliationWorker(batch_size=batch_size)
+    if not loop:
+        result = worker.run_once()
+        click.echo(f"Checked {result['checked']} pending payments, {result['settled']} settled.")
+        return
+    if worker.interval <= 0:
+        raise click.UsageError("LIBRARY_RECONCILE_INTERVAL must be positive with --loop.")
+    click.echo(f"Reconciling pending payments every {worker.interval:g}s.")
+    try:
+        worker.run()
+    except KeyboardInterrupt:
+        pass
+
+
+def register_commands(app):
+    """Register all CLI commands with the Flask app."""
+    app.cli.add_command(seed_command)
+    app.cli.add_command(import_books_command)
+    app.cli.add_command(rebuild_patron_counters_command)
+    app.cli.add_command(settle_fees_command)
+    app.cli.add_command(reconcile_payments_command)
@@ -1,5 +1,13 @@
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
 import pytest
-from database import init_db
+
+import database
+from database import get_book_by_isbn, init_db, insert_book, insert_borrow_record, return_book_transaction
 
 @pytest.fixture(autouse=True)
 def reset_database():
@@ -8,3 +16,164 @@ def reset_database():
     database schema exists and the books table is empty.
     """
     init_db()
+
+
+@pytest.fixture(autouse=True)
+def reset_payment_guards(monkeypatch):
+    """Give each test a closed circuit breaker and an empty bulkhead."""
+    from services import resilience
+
+    monkeypatch.setattr(resilience, "payment_breaker", resilience.CircuitBreaker())
+    monkeypatch.setattr(resilience, "payment_bulkhead", resilience.Bulkhead())
+
+
+@pytest.fixture
+def temp_db(tmp_path, monkeypatch):
+    """
+    Point the database layer at a fresh, fully initialized SQLite file
+    for tests that need an isolated database.
+    """
+    path = str(tmp_path / "library_test.db")
+    monkeypatch.setattr(database, "DATABASE", path)
+    database.init_database()
+    yield path
+    database.close_pool()
+
+
+@pytest.fixture
+def client(temp_db):
+    """Flask test client backed by the isolated test database, seeded with the sample data."""
+    from app import create_app
+
+    app = create_app()
+    database.add_sample_data()
+    app.config["TESTING"] = True
+    return app.test_client()
+
+
+@pytest.fixture
+def book_ids(temp_db):
+    """IDs of six books (10 copies each) added to the isolated test database."""
+    ids = []
+    for i in range(6):
+        isbn = f"{8000000000000 + i}"
+        assert insert_book(f"Book {i}", "Author", isbn, 10, 10)
+        ids.append(get_book_by_isbn(isbn)["id"])
+    return ids
+
+
+@pytest.fixture
+def book_id(book_ids):
+    """ID of one book in the isolated test database."""
+    return book_ids[0]
+
+
+@pytest.fixture
+def overdue_loan(temp_db):
+    """Add an open loan that is days_overdue days past due (negative: due in the future)."""
+    def add(patron_id, book_id, days_overdue):
+        due = datetime.now() - timedelta(days=days_overdue, hours=1)
+        assert insert_borrow_record(patron_id, book_id, due - timedelta(days=14), due)
+    return add
+
+
+@pytest.fixture
+def late_return(overdue_loan):
+    """Add a loan returned now, days_late days after it was due."""
+    def add(patron_id, book_id, days_late):
+        overdue_loan(patron_id, book_id, days_late)
+        assert return_book_transaction(patron_id, book_id, datetime.now())[0] == "returned"
+    return add
+
+
+@pytest.fixture
+def late_book(mocker):
+    """Book 7 ("Late Book") with a $2.50 late fee outstanding, for payment tests."""
+    mocker.patch("services.library_service.calculate_late_fee_for_book",
+                 return_value={"fee_amount": 2.5, "days_overdue": 5, "status": "Overdue"})
+    mocker.patch("services.library_service.get_book_by_id", return_value={"id": 7, "title": "Late Book"})
+
+
+class PaymentStubHandler(BaseHTTPRequestHandler):
+    """Minimal payment gateway API with the same rules as PaymentGateway."""
+
+    protocol_version = "HTTP/1.1"  # keep-alive, so connection reuse is observable
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read(self):
+        time.sleep(self.server.delay)
+        with self.server.lock:
+            self.server.requests.append((self.command, self.path))
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length)) if length else {}
+
+    def do_POST(self):
+        payload = self._read()
+        if self.server.fail_status:
+            return self._send(self.server.fail_status, {"error": "Service unavailable"})
+        if self.path == "/charges":
+            amount, patron_id = payload.get("amount", 0), payload.get("customer_id", "")
+            if amount <= 0:
+                return self._send(400, {"error": "Invalid amount: must be greater than 0"})
+            if amount > 1000:
+                return self._send(402, {"error": "Payment declined: amount exceeds limit"})
+            if len(patron_id) != 6:
+                return self._send(400, {"error": "Invalid patron ID format"})
+            with self.server.lock:
+                transaction_id = f"txn_{patron_id}_{len(self.server.charges) + 1}"
+                self.server.charges[transaction_id] = amount
+            return self._send(200, {"id": transaction_id, "status": "completed",
+                                    "message": f"Payment of ${amount:.2f} processed successfully"})
+        if self.path == "/refunds":
+            if payload.get("transaction_id") not in self.server.charges:
+                return self._send(404, {"error": "Invalid transaction ID"})
+            return self._send(200, {"message": f"Refund of ${payload['amount']:.2f} processed successfully"})
+        self._send(404, {"error": "Not found"})
+
+    def do_GET(self):
+        self._read()
+        if self.server.fail_status:
+            return self._send(self.server.fail_status, {"error": "Service unavailable"})
+        transaction_id = self.path.rsplit("/", 1)[-1]
+        if self.path.startswith("/charges/") and transaction_id in self.server.charges:
+            return self._send(200, {"transaction_id": transaction_id, "status": "completed",
+                                    "amount": self.server.charges[transaction_id]})
+        self._send(404, {"error": "Transaction not found"})
+
+
+@pytest.fixture
+def payment_server():
+    """
+    Local HTTP stand-in for the payment gateway. Exposes .url, .delay
+    (seconds added to every call), .fail_status (HTTP status every call
+    answers with, when set), .connections, .requests and .charges.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), PaymentStubHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.delay = 0.0
+    server.fail_status = None
+    server.connections = 0
+    server.requests = []
+    server.charges = {}
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
@@ -3,22 +3,319 @@ Database module for Library Management System
 Handles all database operations and connections
 """
 
+import base64
+import functools
+import json
+import os
+import queue
 import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from flask import g, has_app_context
+
+from cache import LRUCache
+from records import Book, Loan
+from services.fee_engine import late_fee_sql
 
 # Database configuration
 DATABASE = 'library.db'
 
+# Maximum number of books a patron may have borrowed at once
+MAX_BORROWED_BOOKS = 5
+
+# Maximum number of idle connections kept open by the pool
+POOL_SIZE = int(os.environ.get('LIBRARY_DB_POOL_SIZE', '5'))
+
+# Book lookup cache: maximum entries and seconds before an entry expires
+BOOK_CACHE_SIZE = int(os.environ.get('LIBRARY_BOOK_CACHE_SIZE', '1024'))
+BOOK_CACHE_TTL = float(os.environ.get('LIBRARY_BOOK_CACHE_TTL', '60'))
+
+# Maximum number of pre-rendered catalog table rows kept in memory
+CATALOG_ROW_CACHE_SIZE = int(os.environ.get('LIBRARY_CATALOG_ROW_CACHE_SIZE', '4096'))
+
+# Seconds a payment/refund result is replayed for duplicate requests
+IDEMPOTENCY_TTL = int(os.environ.get('LIBRARY_IDEMPOTENCY_TTL', '86400'))
+
+# Seconds an in-progress payment/refund holds its key; well above a gateway
+# call's timeouts, so the key frees up soon if the worker dies mid-call
+IDEMPOTENCY_LEASE = int(os.environ.get('LIBRARY_IDEMPOTENCY_LEASE', '30'))
+
+# Seconds a reconciler's claim on a batch of pending payments lasts if it
+# dies before storing their status
+PAYMENT_CLAIM_LEASE = int(os.environ.get('LIBRARY_RECONCILE_LEASE', '300'))
+
+# Storage profiles: PRAGMAs applied to every new connection
+STORAGE_PROFILES = {
+    # Readers never wait on writers; a crash can lose the last few commits
+    'throughput': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -64000,        # ~64 MB page cache
+        'mmap_size': 268435456,      # 256 MB memory-mapped I/O
+        'temp_store': 'MEMORY',
+        'busy_timeout': 5000,        # milliseconds
+    },
+    # Readers never wait on writers; every commit is fsynced
+    'durability': {
+        'journal_mode': 'WAL',
+        'synchronous': 'FULL',
+        'cache_size': -16000,
+        'mmap_size': 0,
+        'temp_store': 'DEFAULT',
+        'busy_timeout': 10000,
+    },
+}
+STORAGE_PROFILE = os.environ.get('LIBRARY_DB_PROFILE', 'throughput')
+
+# Individual PRAGMA overrides applied on top of the selected profile
+STORAGE_OVERRIDES: Dict = {}
+
+def get_storage_settings(profile: Optional[str] = None) -> Dict:
+    """Get the PRAGMA settings for a storage profile, including overrides."""
+    profile = profile or STORAGE_PROFILE
+    if profile not in STORAGE_PROFILES:
+        raise ValueError(f"Unknown storage profile: {profile!r}")
+    settings = dict(STORAGE_PROFILES[profile])
+    settings.update(STORAGE_OVERRIDES)
+    return settings
+
+def apply_storage_settings(conn: sqlite3.Connection, settings: Dict):
+    """Apply storage PRAGMAs to a connection."""
+    for name, value in settings.items():
+        conn.execute(f'PRAGMA {name} = {value}')
+
+
+class PooledConnection(sqlite3.Connection):
+    """
+    SQLite connection that belongs to a ConnectionPool.
+
+    Calling close() hands the connection back to its pool instead of closing
+    it, so the existing helpers can keep their open/close pattern. Connections
+    scoped to a Flask app context ignore close() until teardown.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool = None
+        self.request_scoped = False
+
+    def close(self):
+        if self.request_scoped:
+            # Discard uncommitted work like a real close would, keep the connection
+            if self.in_transaction:
+                self.rollback()
+            return
+        if self.pool is None:
+            super().close()
+        else:
+            self.pool.release(self)
+
+    def discard(self):
+        """Really close the underlying SQLite connection."""
+        self.pool = None
+        self.request_scoped = False
+        super().close()
+
+
+class ConnectionPool:
+    """Thread-safe pool of reusable SQLite connections for one database file."""
+
+    def __init__(self, database: str, size: int = POOL_SIZE, settings: Optional[Dict] = None):
+        self.database = database
+        self.size = size
+        self.settings = settings or {}
+        self.closed = False
+        self._idle = queue.LifoQueue(maxsize=size)
+
+    def _connect(self) -> PooledConnection:
+        conn = sqlite3.connect(self.database, factory=PooledConnection, check_same_thread=False)
+        conn.row_factory = sqlite3.Row  # This enables column access by name
+        apply_storage_settings(conn, self.settings)
+        return conn
+
+    @staticmethod
+    def _is_healthy(conn: PooledConnection) -> bool:
+        try:
+            conn.execute('SELECT 1').fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def idle_count(self) -> int:
+        """Number of connections currently waiting in the pool."""
+        return self._idle.qsize()
+
+    def acquire(self) -> PooledConnection:
+        """Take a healthy idle connection, or open a new one if none is left."""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self._connect()
+                break
+            if self._is_healthy(conn):
+                break
+            conn.discard()
+        conn.pool = self
+        conn.request_scoped = False
+        return conn
+
+    def release(self, conn: PooledConnection):
+        """Return a connection to the pool, closing it if the pool is full or closed."""
+        conn.request_scoped = False
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            conn.discard()
+            return
+        if self.closed:
+            conn.discard()
+            return
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.discard()
+
+    def close_all(self):
+        """Close every idle connection; connections still in use close on release."""
+        self.closed = True
+        while True:
+            try:
+                self._idle.get_nowait().discard()
+            except queue.Empty:
+                break
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def _pool_is_current(pool: Optional[ConnectionPool], settings: Dict) -> bool:
+    return (pool is not None and pool.database == DATABASE
+            and pool.size == POOL_SIZE and pool.settings == settings)
+
+def get_pool() -> ConnectionPool:
+    """Get the connection pool for the current configuration, creating it on first use."""
+    global _pool
+    settings = get_storage_settings()
+    pool = _pool
+    if not _pool_is_current(pool, settings):
+        with _pool_lock:
+            if not _pool_is_current(_pool, settings):
+                if _pool is not None:
+                    _pool.close_all()
+                    clear_book_cache()
+                _pool = ConnectionPool(DATABASE, POOL_SIZE, settings)
+            pool = _pool
+    return pool
+
+def close_pool():
+    """Close all pooled connections (e.g. before forking or switching databases)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close_all()
+            _pool = None
+
+# Threads that run database work for async callers (each uses one pooled connection at a time)
+DB_THREADS = int(os.environ.get('LIBRARY_DB_THREADS', str(POOL_SIZE)))
+
+_db_executor = None
+_db_executor_lock = threading.Lock()
+
+def get_db_executor() -> ThreadPoolExecutor:
+    """Get the dedicated SQLite thread pool used by run_db, creating it on first use."""
+    global _db_executor
+    with _db_executor_lock:
+        if _db_executor is None:
+            _db_executor = ThreadPoolExecutor(max_workers=DB_THREADS, thread_name_prefix='sqlite')
+        return _db_executor
+
+def shutdown_db_executor():
+    """Stop the SQLite thread pool (it is recreated on next use)."""
+    global _db_executor
+    with _db_executor_lock:
+        if _db_executor is not None:
+            _db_executor.shutdown(wait=True)
+            _db_executor = None
+
+async def run_db(func: Callable, *args, **kwargs):
+    """
+    Await a blocking database (or service layer) call from async code.
+
+    The call runs on the dedicated SQLite thread pool, so the event loop
+    stays free while a query runs or waits on a lock, and at most
+    DB_THREADS connections are in use however many requests are awaiting.
+    """
+    import asyncio
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_db_executor(), functools.partial(func, *args, **kwargs))
+
 def get_db_connection():
-    """Get a database connection."""
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row  # This enables column access by name
-    return conn
+    """
+    Get a database connection.
+
+    Inside a Flask app context the same pooled connection is reused for the
+    whole request and returned to the pool on teardown. Elsewhere (e.g. the
+    service layer in scripts and tests) each call borrows a connection from
+    the pool and close() hands it back.
+    """
+    if has_app_context():
+        conn = g.get('_db_conn')
+        if conn is None:
+            conn = get_pool().acquire()
+            conn.request_scoped = True
+            g._db_conn = conn
+        return conn
+    return get_pool().acquire()
+
+def close_db(exception=None):
+    """Release the request-scoped connection back to the pool."""
+    conn = g.pop('_db_conn', None)
+    if conn is not None:
+        conn.request_scoped = False
+        conn.close()
+
+@contextmanager
+def write_transaction():
+    """
+    Run a block of statements as one BEGIN IMMEDIATE transaction.
+
+    The write lock is taken up front, so reads inside the block cannot be
+    invalidated by a concurrent writer. Commits on success, rolls back on error.
+    """
+    conn = get_db_connection()
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        yield conn
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+def init_app(app):
+    """Configure the database layer from app config and register teardown."""
+    global DATABASE, POOL_SIZE, STORAGE_PROFILE, STORAGE_OVERRIDES
+    DATABASE = app.config.get('DATABASE', DATABASE)
+    POOL_SIZE = int(app.config.get('DATABASE_POOL_SIZE', POOL_SIZE))
+    STORAGE_PROFILE = app.config.get('DATABASE_PROFILE', STORAGE_PROFILE)
+    STORAGE_OVERRIDES = dict(app.config.get('DATABASE_PRAGMAS', STORAGE_OVERRIDES))
+    get_storage_settings()  # fail fast on an unknown profile
+    app.teardown_appcontext(close_db)
 
 def init_database():
     """Initialize the database with required tables."""
     conn = get_db_connection()
+    if schema_is_current(conn):
+        conn.close()
+        return
     
     # Create books table
     conn.execute('''
@@ -38,16 +335,289 @@ def init_database():
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             patron_id TEXT NOT NULL,
             book_id INTEGER NOT NULL,
-            borrow_date TEXT NOT NULL,
-            due_date TEXT NOT NULL,
-            return_date TEXT,
+            borrow_date INTEGER NOT NULL,
+            due_date INTEGER NOT NULL,
+            return_date INTEGER,
             FOREIGN KEY (book_id) REFERENCES books (id)
         )
     ''')
     
     conn.commit()
+    
+    # Bring the schema up to date (indexes and later changes)
+    run_migrations(conn)
+    conn.execute(f'PRAGMA user_version = {MIGRATIONS[-1][0]}')
     conn.close()
 
+def schema_is_current(conn: sqlite3.Connection) -> bool:
+    """
+    Cheap startup check: PRAGMA user_version is set to the latest migration
+    once init_database has fully run, so a current database needs no DDL.
+    """
+    return conn.execute('PRAGMA user_version').fetchone()[0] == MIGRATIONS[-1][0]
+
+_schema_ready = set()
+_schema_lock = threading.Lock()
+
+def ensure_schema():
+    """Run init_database once per process for the configured database file."""
+    if DATABASE in _schema_ready:
+        return
+    with _schema_lock:
+        if DATABASE not in _schema_ready:
+            init_database()
+            _schema_ready.add(DATABASE)
+
+# Schema migrations
+# Forward-only and applied in order; each entry is (version, description, statements).
+# Loan dates are stored as integer epoch seconds and only turned back into
+# datetimes where they are displayed
+def to_epoch(value: datetime) -> int:
+    """Convert a (naive, local) datetime to epoch seconds for storage."""
+    return int(value.timestamp())
+
+def from_epoch(value: Optional[int]) -> Optional[datetime]:
+    """Convert stored epoch seconds back to a local datetime (None stays None)."""
+    return datetime.fromtimestamp(value) if value is not None else None
+
+def _iso_to_epoch(column: str) -> str:
+    """SQL converting a legacy ISO text date column (local time) to epoch seconds."""
+    return (f"CASE WHEN typeof({column}) = 'text' "
+            f"THEN CAST(strftime('%s', {column}, 'utc') AS INTEGER) ELSE {column} END")
+
+def _patron_counters_sql(due: str, returned: str, payments: bool = True) -> str:
+    """SELECT recomputing the patrons counters from borrow_records (less fee_payments)."""
+    paid = (''' - (SELECT TOTAL(amount) FROM fee_payments p
+                           WHERE p.patron_id = br.patron_id)''' if payments else '')
+    return f'''
+    SELECT patron_id,
+           SUM(return_date IS NULL),
+           ROUND(TOTAL(CASE WHEN return_date IS NOT NULL
+                            THEN {late_fee_sql(due, returned)} END){paid}, 2)
+    FROM borrow_records br
+    GROUP BY patron_id
+'''
+
+# Used by rebuild_patron_counters(); dates are epoch seconds since migration 8
+# and payments are deducted since migration 9
+PATRON_COUNTERS_SQL = _patron_counters_sql('due_date', 'return_date')
+
+def _patron_counter_triggers(due: str, returned: str) -> List[str]:
+    """Triggers keeping the patrons counters in step with borrow_records."""
+    return [
+        # Counters move in the same transaction as the loan row, whoever writes it
+        f'''CREATE TRIGGER IF NOT EXISTS patrons_loan_inserted
+           AFTER INSERT ON borrow_records BEGIN
+               INSERT INTO patrons (patron_id) VALUES (new.patron_id)
+               ON CONFLICT (patron_id) DO NOTHING;
+               UPDATE patrons SET open_loans = open_loans + (new.return_date IS NULL),
+                   total_fees_owed = total_fees_owed + COALESCE({late_fee_sql(due, returned)}, 0)
+               WHERE patron_id = new.patron_id;
+           END''',
+        f'''CREATE TRIGGER IF NOT EXISTS patrons_loan_closed
+           AFTER UPDATE OF return_date ON borrow_records
+           WHEN old.return_date IS NULL AND new.return_date IS NOT NULL BEGIN
+               UPDATE patrons SET open_loans = open_loans - 1,
+                   total_fees_owed = total_fees_owed + {late_fee_sql(due, returned)}
+               WHERE patron_id = new.patron_id;
+           END''',
+    ]
+
+BORROW_RECORDS_INDEXES = [
+    '''CREATE INDEX IF NOT EXISTS idx_borrow_records_book_return
+       ON borrow_records (book_id, return_date)''',
+    '''CREATE INDEX IF NOT EXISTS idx_borrow_records_due_date
+       ON borrow_records (due_date)''',
+    '''CREATE INDEX IF NOT EXISTS idx_borrow_records_patron_id
+       ON borrow_records (patron_id, id)''',
+    # Last, so the planner (which has no statistics) picks the partial index
+    # over idx_borrow_records_patron_id for open-loan lookups
+    '''CREATE INDEX IF NOT EXISTS idx_borrow_records_open_patron
+       ON borrow_records (patron_id) WHERE return_date IS NULL''',
+]
+
+MIGRATIONS = [
+    (1, 'Partial index on open loans per patron', [
+        '''CREATE INDEX IF NOT EXISTS idx_borrow_records_open_patron
+           ON borrow_records (patron_id) WHERE return_date IS NULL''',
+    ]),
+    (2, 'Index on loans by book and return date', [
+        '''CREATE INDEX IF NOT EXISTS idx_borrow_records_book_return
+           ON borrow_records (book_id, return_date)''',
+    ]),
+    (3, 'Index on loan due dates for overdue scans', [
+        '''CREATE INDEX IF NOT EXISTS idx_borrow_records_due_date
+           ON borrow_records (due_date)''',
+    ]),
+    (4, 'Full-text index on book titles and authors', [
+        # Trigram tokens give case-insensitive substring matching
+        '''CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5(
+               title, author, content='books', content_rowid='id', tokenize='trigram'
+           )''',
+        '''CREATE TRIGGER IF NOT EXISTS books_fts_insert AFTER INSERT ON books BEGIN
+               INSERT INTO books_fts (rowid, title, author) VALUES (new.id, new.title, new.author);
+           END''',
+        '''CREATE TRIGGER IF NOT EXISTS books_fts_delete AFTER DELETE ON books BEGIN
+               INSERT INTO books_fts (books_fts, rowid, title, author)
+               VALUES ('delete', old.id, old.title, old.author);
+           END''',
+        '''CREATE TRIGGER IF NOT EXISTS books_fts_update AFTER UPDATE OF title, author ON books BEGIN
+               INSERT INTO books_fts (books_fts, rowid, title, author)
+               VALUES ('delete', old.id, old.title, old.author);
+               INSERT INTO books_fts (rowid, title, author) VALUES (new.id, new.title, new.author);
+           END''',
+        "INSERT INTO books_fts (books_fts) VALUES ('rebuild')",
+    ]),
+    (5, 'Index on books by title for keyset catalog paging', [
+        '''CREATE INDEX IF NOT EXISTS idx_books_title_id ON books (title, id)''',
+    ]),
+    (6, 'Index on loans by patron for keyset history paging', [
+        '''CREATE INDEX IF NOT EXISTS idx_borrow_records_patron_id
+           ON borrow_records (patron_id, id)''',
+    ]),
+    (7, 'Per-patron open loan and fees owed counters', [
+        '''CREATE TABLE IF NOT EXISTS patrons (
+               patron_id TEXT PRIMARY KEY,
+               open_loans INTEGER NOT NULL DEFAULT 0,
+               total_fees_owed REAL NOT NULL DEFAULT 0
+           )''',
+        *_patron_counter_triggers(_iso_to_epoch('new.due_date'), _iso_to_epoch('new.return_date')),
+        'INSERT INTO patrons (patron_id, open_loans, total_fees_owed) '
+        + _patron_counters_sql(_iso_to_epoch('due_date'), _iso_to_epoch('return_date'), payments=False),
+    ]),
+    (8, 'Store loan dates as integer epoch seconds', [
+        # SQLite cannot change a column type in place: copy into a new table
+        '''CREATE TABLE borrow_records_epoch (
+               id INTEGER PRIMARY KEY AUTOINCREMENT,
+               patron_id TEXT NOT NULL,
+               book_id INTEGER NOT NULL,
+               borrow_date INTEGER NOT NULL,
+               due_date INTEGER NOT NULL,
+               return_date INTEGER,
+               FOREIGN KEY (book_id) REFERENCES books (id)
+           )''',
+        f'''INSERT INTO borrow_records_epoch (id, patron_id, book_id, borrow_date, due_date, return_date)
+           SELECT id, patron_id, book_id, {_iso_to_epoch('borrow_date')},
+                  {_iso_to_epoch('due_date')}, {_iso_to_epoch('return_date')}
+           FROM borrow_records''',
+        'DROP TABLE borrow_records',
+        'ALTER TABLE borrow_records_epoch RENAME TO borrow_records',
+        *BORROW_RECORDS_INDEXES,
+        *_patron_counter_triggers('new.due_date', 'new.return_date'),
+    ]),
+    (9, 'Late fee payment ledger', [
+        # One line item per loan covered by a gateway charge
+        '''CREATE TABLE IF NOT EXISTS fee_payments (
+               id INTEGER PRIMARY KEY AUTOINCREMENT,
+               patron_id TEXT NOT NULL,
+               loan_id INTEGER NOT NULL,
+               book_id INTEGER NOT NULL,
+               amount REAL NOT NULL,
+               transaction_id TEXT NOT NULL,
+               paid_at INTEGER NOT NULL,
+               FOREIGN KEY (loan_id) REFERENCES borrow_records (id)
+           )''',
+        '''CREATE INDEX IF NOT EXISTS idx_fee_payments_loan_id ON fee_payments (loan_id)''',
+        '''CREATE INDEX IF NOT EXISTS idx_fee_payments_patron_id ON fee_payments (patron_id)''',
+        '''CREATE TRIGGER IF NOT EXISTS patrons_fee_paid
+           AFTER INSERT ON fee_payments BEGIN
+               UPDATE patrons SET total_fees_owed = total_fees_owed - new.amount
+               WHERE patron_id = new.patron_id;
+           END''',
+    ]),
+    (10, 'Idempotency keys for payment gateway calls', [
+        # result is NULL while the first request is still talking to the gateway
+        '''CREATE TABLE IF NOT EXISTS idempotency_keys (
+               key TEXT PRIMARY KEY,
+               result TEXT,
+               expires_at INTEGER NOT NULL
+           )''',
+        '''CREATE INDEX IF NOT EXISTS idx_idempotency_keys_expires_at ON idempotency_keys (expires_at)''',
+    ]),
+    (11, 'Payments ledger for gateway reconciliation', [
+        # One row per gateway charge; status moves from pending to a final
+        # status as the reconciliation worker hears back from the gateway
+        '''CREATE TABLE IF NOT EXISTS payments (
+               transaction_id TEXT PRIMARY KEY,
+               patron_id TEXT NOT NULL,
+               amount REAL NOT NULL,
+               description TEXT NOT NULL DEFAULT '',
+               status TEXT NOT NULL DEFAULT 'pending',
+               created_at INTEGER NOT NULL,
+               checked_at INTEGER,
+               attempts INTEGER NOT NULL DEFAULT 0
+           )''',
+        '''CREATE INDEX IF NOT EXISTS idx_payments_patron_id ON payments (patron_id)''',
+        '''CREATE INDEX IF NOT EXISTS idx_payments_pending ON payments (checked_at)
+           WHERE status = 'pending' ''',
+    ]),
+    (12, 'Catalog version counter for HTTP caching', [
+        # catalog_id is random per database so a rebuilt database never
+        # reuses an old database's (id, version) pair
+        '''CREATE TABLE IF NOT EXISTS meta (
+               key TEXT PRIMARY KEY,
+               value NOT NULL
+           )''',
+        '''INSERT OR IGNORE INTO meta (key, value) VALUES ('catalog_id', lower(hex(randomblob(4))))''',
+        '''INSERT OR IGNORE INTO meta (key, value) VALUES ('catalog_version', 0)''',
+        *[f'''CREATE TRIGGER IF NOT EXISTS catalog_version_{event.lower()}
+              AFTER {event} ON books BEGIN
+                  UPDATE meta SET value = value + 1 WHERE key = 'catalog_version';
+              END''' for event in ('INSERT', 'UPDATE', 'DELETE')],
+    ]),
+    (13, 'Replay-safe fee payment ledger writes', [
+        # Set on refund lines, so a replayed refund is not reversed twice
+        '''ALTER TABLE fee_payments ADD COLUMN refund_key TEXT''',
+        '''CREATE INDEX IF NOT EXISTS idx_fee_payments_transaction_id ON fee_payments (transaction_id)''',
+    ]),
+    (14, 'Reconciliation claims on pending payments', [
+        # Epoch seconds until which a reconciler owns the row (0: unclaimed)
+        '''ALTER TABLE payments ADD COLUMN claimed_until INTEGER NOT NULL DEFAULT 0''',
+    ]),
+]
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """Get the latest applied migration version (0 if none)."""
+    row = conn.execute('SELECT MAX(version) FROM schema_version').fetchone()
+    return row[0] or 0
+
+def run_migrations(conn: sqlite3.Connection) -> List[int]:
+    """
+    Apply any pending migrations, each in its own transaction.
+
+    Safe to call from several processes at once: the version check happens
+    inside a write transaction, so every migration runs exactly once.
+    Returns the list of versions applied by this call.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TEXT NOT NULL
+        )
+    ''')
+    conn.commit()
+    
+    applied = []
+    for version, description, statements in MIGRATIONS:
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if get_schema_version(conn) >= version:
+                conn.rollback()
+                continue
+            for statement in statements:
+                conn.execute(statement)
+            conn.execute('''
+                INSERT INTO schema_version (version, description, applied_at)
+                VALUES (?, ?, ?)
+            ''', (version, description, datetime.now().isoformat()))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append(version)
+    return applied
+
 def add_sample_data():
     """Add sample data to the database if it's empty."""
     conn = get_db_connection()
@@ -72,8 +642,8 @@ def add_sample_data():
             INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date)
             VALUES (?, ?, ?, ?)
         ''', ('123456', 3, 
-              (datetime.now() - timedelta(days=5)).isoformat(),
-              (datetime.now() + timedelta(days=9)).isoformat()))
+              to_epoch(datetime.now() - timedelta(days=5)),
+              to_epoch(datetime.now() + timedelta(days=9))))
         
         # Update available copies for 1984
         conn.execute('UPDATE books SET available_copies = 0 WHERE id = 3')
@@ -84,77 +654,659 @@ def add_sample_data():
 
 # Helper Functions for Database Operations
 
-def get_all_books() -> List[Dict]:
+# Select lists matching the field order of the record types
+BOOK_COLUMNS = Book.columns()
+LOAN_COLUMNS = '''br.id, br.book_id, b.title, b.author, br.borrow_date, br.due_date, br.return_date,
+    br.return_date IS NULL AND br.due_date < ? AS is_overdue'''
+
+def query_records(conn: sqlite3.Connection, record_type: type, sql: str, params: Tuple = ()) -> sqlite3.Cursor:
+    """Execute a query whose rows are built directly as record_type instances."""
+    cursor = conn.cursor()
+    cursor.row_factory = record_type.from_row
+    return cursor.execute(sql, params)
+
+def get_all_books() -> List[Book]:
     """Get all books from the database."""
     conn = get_db_connection()
-    books = conn.execute('SELECT * FROM books ORDER BY title').fetchall()
+    books = query_records(conn, Book, f'SELECT {BOOK_COLUMNS} FROM books ORDER BY title').fetchall()
     conn.close()
-    return [dict(book) for book in books]
+    return books
+
+# Catalog paging: default and maximum books per page
+CATALOG_PAGE_SIZE = 50
+CATALOG_MAX_PAGE_SIZE = 200
+
+def encode_catalog_cursor(book: Book) -> str:
+    """Encode a book's (title, id) position as an opaque URL-safe cursor."""
+    raw = json.dumps([book.title, book.id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_catalog_cursor(cursor: str) -> Tuple[str, int]:
+    """Decode a catalog cursor; raises ValueError if it is malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        title, book_id = json.loads(raw)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid catalog cursor: {cursor!r}") from e
+    if not isinstance(title, str) or not isinstance(book_id, int):
+        raise ValueError(f"Invalid catalog cursor: {cursor!r}")
+    return title, book_id
+
+def get_books_page(after: Optional[str] = None, before: Optional[str] = None,
+                   limit: int = CATALOG_PAGE_SIZE) -> Dict:
+    """
+    Get one page of the catalog ordered by title, using keyset pagination.
+
+    Seeks to the cursor position on the (title, id) index instead of using
+    OFFSET, so every page costs the same no matter how deep it is.
+
+    Args:
+        after: Cursor of the last book on the previous page (next page)
+        before: Cursor of the first book on the following page (previous page)
+        limit: Books per page (capped at CATALOG_MAX_PAGE_SIZE)
+
+    Returns:
+        dict: 'books', plus 'next_cursor' / 'prev_cursor' (None at either end)
+    """
+    limit = max(1, min(limit, CATALOG_MAX_PAGE_SIZE))
+    conn = get_db_connection()
+    if before is not None:
+        rows = query_records(conn, Book, f'''
+            SELECT {BOOK_COLUMNS} FROM books WHERE (title, id) < (?, ?)
+            ORDER BY title DESC, id DESC LIMIT ?
+        ''', (*decode_catalog_cursor(before), limit + 1)).fetchall()
+        has_more = len(rows) > limit
+        books = rows[:limit][::-1]
+        has_prev, has_next = has_more, True
+    else:
+        if after is not None:
+            rows = query_records(conn, Book, f'''
+                SELECT {BOOK_COLUMNS} FROM books WHERE (title, id) > (?, ?)
+                ORDER BY title, id LIMIT ?
+            ''', (*decode_catalog_cursor(after), limit + 1)).fetchall()
+        else:
+            rows = query_records(conn, Book, f'''
+                SELECT {BOOK_COLUMNS} FROM books ORDER BY title, id LIMIT ?
+            ''', (limit + 1,)).fetchall()
+        has_more = len(rows) > limit
+        books = rows[:limit]
+        has_prev, has_next = after is not None, has_more
+    conn.close()
+    
+    return {
+        'books': books,
+        'next_cursor': encode_catalog_cursor(books[-1]) if books and has_next else None,
+        'prev_cursor': encode_catalog_cursor(books[0]) if books and has_prev else None
+    }
+
+# Patron borrowing history: default and maximum loans per page
+HISTORY_PAGE_SIZE = 20
+HISTORY_MAX_PAGE_SIZE = 100
+
+# Streaming export: rows fetched per round trip and the exported columns per table
+EXPORT_BATCH_SIZE = 500
+EXPORT_COLUMNS = {
+    'books': ('id', 'title', 'author', 'isbn', 'total_copies', 'available_copies'),
+    'borrow_records': ('id', 'patron_id', 'book_id', 'borrow_date', 'due_date', 'return_date'),
+}
+
+def iter_table_rows(table: str, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[Tuple]:
+    """
+    Stream every row of an exportable table in id order.
+
+    Rows come from a server-side cursor with fetchmany(), so memory stays
+    flat regardless of table size. The generator holds its own pooled
+    connection (not the request-scoped one, since streaming outlives the
+    request) and returns it when exhausted or closed.
+    """
+    if table not in EXPORT_COLUMNS:
+        raise ValueError(f"Table {table!r} cannot be exported")
+    columns = ', '.join(EXPORT_COLUMNS[table])
+    
+    conn = get_pool().acquire()
+    try:
+        cursor = conn.execute(f'SELECT {columns} FROM {table} ORDER BY id')
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield tuple(row)
+    finally:
+        conn.close()
+
+# Read-through cache for single-book lookups.
+# book_cache maps id -> row; isbn_cache maps isbn -> id (ISBNs never change).
+book_cache = LRUCache(BOOK_CACHE_SIZE, BOOK_CACHE_TTL)
+isbn_cache = LRUCache(BOOK_CACHE_SIZE, BOOK_CACHE_TTL)
+
+# Catalog version the book cache was last checked against (see sync_book_cache)
+_book_cache_version = None
+
+# Rendered catalog <tr> fragments, filled by the catalog page.
+# Maps id -> (row the fragment was rendered from, fragment).
+catalog_row_cache = LRUCache(CATALOG_ROW_CACHE_SIZE)
+
+def invalidate_book(book_id: int):
+    """Drop a book from the lookup and row caches after its row changed."""
+    book_cache.invalidate(book_id)
+    catalog_row_cache.invalidate(book_id)
+
+def clear_book_cache():
+    """Drop every cached book lookup and rendered row."""
+    book_cache.clear()
+    isbn_cache.clear()
+    catalog_row_cache.clear()
+
+def get_catalog_version() -> str:
+    """
+    Get a token that changes whenever any book row is inserted, updated or
+    deleted (kept by triggers), without reading the books table.
+    """
+    conn = get_db_connection()
+    rows = conn.execute(
+        "SELECT value FROM meta WHERE key IN ('catalog_id', 'catalog_version') ORDER BY key"
+    ).fetchall()
+    conn.close()
+    return '-'.join(str(row[0]) for row in rows)
+
+def sync_book_cache() -> int:
+    """
+    Drop the cached book rows if any book changed since the last check.
+
+    Rows carry available_copies, which other processes sharing the database
+    (e.g. other gunicorn workers) change without touching this process's
+    cache, so the catalog version is checked before every cached lookup.
+
+    Returns:
+        int: The book cache generation to fill the cache with
+    """
+    global _book_cache_version
+    version = get_catalog_version()
+    if version != _book_cache_version:
+        book_cache.clear()
+        _book_cache_version = version
+    return book_cache.generation
+
+def warm_up(connections: Optional[int] = None, books: Optional[int] = None) -> Dict:
+    """
+    Open pooled connections and fill the book cache before serving requests,
+    so a fresh worker's first requests do not pay for either.
+
+    Returns:
+        dict: 'connections' (idle in the pool) and 'books' (cached)
+    """
+    pool = get_pool()
+    generation = sync_book_cache()
+    conns = [pool.acquire() for _ in range(connections or pool.size)]
+    rows = query_records(conns[0], Book, f'SELECT {BOOK_COLUMNS} FROM books ORDER BY id LIMIT ?',
+                         (books or BOOK_CACHE_SIZE,)).fetchall()
+    for conn in conns:
+        conn.close()
+    for book in rows:
+        book_cache.set(book.id, book, generation)
+        isbn_cache.set(book.isbn, book.id)
+    return {'connections': pool.idle_count(), 'books': len(rows)}
 
-def get_book_by_id(book_id: int) -> Optional[Dict]:
+def get_book_by_id(book_id: int) -> Optional[Book]:
     """Get a specific book by ID."""
+    generation = sync_book_cache()
+    book = book_cache.get(book_id)
+    if book is not None:
+        return book.copy()
+    
     conn = get_db_connection()
-    book = conn.execute('SELECT * FROM books WHERE id = ?', (book_id,)).fetchone()
+    book = query_records(conn, Book, f'SELECT {BOOK_COLUMNS} FROM books WHERE id = ?', (book_id,)).fetchone()
     conn.close()
-    return dict(book) if book else None
+    if not book:
+        return None
+    book_cache.set(book_id, book, generation)
+    return book.copy()
 
-def get_book_by_isbn(isbn: str) -> Optional[Dict]:
+def get_book_by_isbn(isbn: str) -> Optional[Book]:
     """Get a specific book by ISBN."""
+    book_id = isbn_cache.get(isbn)
+    if book_id is not None:
+        book = get_book_by_id(book_id)
+        if book and book.isbn == isbn:
+            return book
+        isbn_cache.invalidate(isbn)
+    
+    generation = isbn_cache.generation
+    conn = get_db_connection()
+    book = query_records(conn, Book, f'SELECT {BOOK_COLUMNS} FROM books WHERE isbn = ?', (isbn,)).fetchone()
+    conn.close()
+    if not book:
+        return None
+    isbn_cache.set(isbn, book.id, generation)
+    return book
+
+# Shortest term the trigram index can match; shorter terms fall back to LIKE
+FTS_MIN_TERM_LENGTH = 3
+
+def search_books(term: str, field: str, limit: int, offset: int = 0) -> List[Book]:
+    """
+    Search books by partial, case-insensitive title or author match.
+
+    Uses the books_fts full-text index and orders results by relevance.
+
+    Args:
+        term: Text to look for anywhere in the field
+        field: 'title' or 'author'
+        limit: Maximum number of results
+        offset: Number of results to skip
+    """
+    if field not in ('title', 'author'):
+        raise ValueError(f"Cannot search books by {field!r}")
+    
     conn = get_db_connection()
-    book = conn.execute('SELECT * FROM books WHERE isbn = ?', (isbn,)).fetchone()
+    if len(term) >= FTS_MIN_TERM_LENGTH:
+        # Quote the term as an FTS5 string so it matches as one substring
+        query = '{%s} : "%s"' % (field, term.replace('"', '""'))
+        books = query_records(conn, Book, f'''
+            SELECT {Book.columns('b')} FROM books_fts f
+            JOIN books b ON b.id = f.rowid
+            WHERE books_fts MATCH ?
+            ORDER BY f.rank, b.id
+            LIMIT ? OFFSET ?
+        ''', (query, limit, offset)).fetchall()
+    else:
+        pattern = '%' + term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        books = query_records(conn, Book, f'''
+            SELECT {BOOK_COLUMNS} FROM books WHERE {field} LIKE ? ESCAPE '\\'
+            ORDER BY title, id
+            LIMIT ? OFFSET ?
+        ''', (pattern, limit, offset)).fetchall()
     conn.close()
-    return dict(book) if book else None
+    return books
+
+def get_patron_borrowed_books(patron_id: str, now: Optional[int] = None) -> List[Loan]:
+    """
+    Get currently borrowed books for a patron.
 
-def get_patron_borrowed_books(patron_id: str) -> List[Dict]:
-    """Get currently borrowed books for a patron."""
+    Dates are epoch seconds; is_overdue is evaluated in SQL against a single
+    now (epoch seconds, default the current time).
+    """
+    if now is None:
+        now = to_epoch(datetime.now())
     conn = get_db_connection()
-    records = conn.execute('''
-        SELECT br.*, b.title, b.author 
+    loans = query_records(conn, Loan, f'''
+        SELECT {LOAN_COLUMNS}
         FROM borrow_records br 
         JOIN books b ON br.book_id = b.id 
         WHERE br.patron_id = ? AND br.return_date IS NULL
         ORDER BY br.borrow_date
-    ''', (patron_id,)).fetchall()
+    ''', (now, patron_id)).fetchall()
+    conn.close()
+    return loans
+
+def get_patron_history(patron_id: str, before: Optional[int] = None, limit: int = HISTORY_PAGE_SIZE,
+                       now: Optional[int] = None) -> Dict:
+    """
+    Get one page of a patron's borrowing history, newest first.
+
+    Keyset pagination on the loan id: pass the returned 'next_cursor' as
+    before to get the following (older) page.
+
+    Returns:
+        dict: 'loans' and 'next_cursor' (None on the last page)
+    """
+    limit = max(1, min(limit, HISTORY_MAX_PAGE_SIZE))
+    if now is None:
+        now = to_epoch(datetime.now())
+    conn = get_db_connection()
+    loans = query_records(conn, Loan, f'''
+        SELECT {LOAN_COLUMNS}
+        FROM borrow_records br 
+        JOIN books b ON br.book_id = b.id 
+        WHERE br.patron_id = ? AND br.id < ?
+        ORDER BY br.id DESC
+        LIMIT ?
+    ''', (now, patron_id, before if before is not None else 2 ** 63 - 1, limit + 1)).fetchall()
     conn.close()
     
-    borrowed_books = []
-    for record in records:
-        borrowed_books.append({
-            'book_id': record['book_id'],
-            'title': record['title'],
-            'author': record['author'],
-            'borrow_date': datetime.fromisoformat(record['borrow_date']),
-            'due_date': datetime.fromisoformat(record['due_date']),
-            'is_overdue': datetime.now() > datetime.fromisoformat(record['due_date'])
-        })
+    return {
+        'loans': loans[:limit],
+        'next_cursor': loans[limit - 1].id if len(loans) > limit else None
+    }
+
+def get_loan_for_fee(patron_id: str, book_id: int) -> Optional[Dict]:
+    """
+    Get a patron's open loan of a book, or else their most recently returned
+    one, with 'paid' (its fee payments less refunds).
+    """
+    conn = get_db_connection()
+    loan = conn.execute('''
+        SELECT id, borrow_date, due_date, return_date,
+               (SELECT TOTAL(p.amount) FROM fee_payments p WHERE p.loan_id = borrow_records.id) AS paid
+        FROM borrow_records 
+        WHERE patron_id = ? AND book_id = ?
+        ORDER BY return_date IS NOT NULL, borrow_date DESC
+        LIMIT 1
+    ''', (patron_id, book_id)).fetchone()
+    conn.close()
+    return dict(loan) if loan else None
+
+def iter_open_loans(patron_id: Optional[str] = None, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[Tuple]:
+    """
+    Stream open loans as (loan_id, patron_id, book_id, due_timestamp) tuples.
+
+    Due dates are stored as epoch seconds, so callers can build arrays
+    without parsing a date per row.
+    """
+    query = '''
+        SELECT id, patron_id, book_id, due_date
+        FROM borrow_records WHERE return_date IS NULL
+    '''
+    params = ()
+    if patron_id is not None:
+        query += ' AND patron_id = ?'
+        params = (patron_id,)
     
-    return borrowed_books
+    conn = get_pool().acquire()
+    try:
+        cursor = conn.execute(query + ' ORDER BY id', params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield tuple(row)
+    finally:
+        conn.close()
 
 def get_patron_borrow_count(patron_id: str) -> int:
     """Get the number of books currently borrowed by a patron."""
+    return get_patron_counters(patron_id)['open_loans']
+
+def get_patron_counters(patron_id: str) -> Dict:
+    """Get a patron's materialized open loan count and fees owed on returned loans."""
+    conn = get_db_connection()
+    row = conn.execute(
+        'SELECT open_loans, total_fees_owed FROM patrons WHERE patron_id = ?', (patron_id,)
+    ).fetchone()
+    conn.close()
+    if not row:
+        return {'open_loans': 0, 'total_fees_owed': 0.0}
+    return {'open_loans': row['open_loans'], 'total_fees_owed': round(row['total_fees_owed'], 2)}
+
+def get_patrons_owing_fees() -> List[str]:
+    """Get the IDs of patrons with assessed late fees still unpaid."""
+    conn = get_db_connection()
+    rows = conn.execute(
+        'SELECT patron_id FROM patrons WHERE total_fees_owed >= 0.01 ORDER BY patron_id'
+    ).fetchall()
+    conn.close()
+    return [row['patron_id'] for row in rows]
+
+def get_outstanding_fees(patron_id: str) -> List[Dict]:
+    """
+    Get the unpaid late fee of each of a patron's returned loans.
+
+    Fees on open loans are still accruing and are not included.
+
+    Returns:
+        list: dicts with 'loan_id', 'book_id', 'title' and 'amount' (fee less payments)
+    """
     conn = get_db_connection()
-    count = conn.execute('''
-        SELECT COUNT(*) as count FROM borrow_records 
-        WHERE patron_id = ? AND return_date IS NULL
-    ''', (patron_id,)).fetchone()['count']
+    rows = conn.execute(f'''
+        SELECT br.id AS loan_id, br.book_id, b.title,
+               ROUND({late_fee_sql('br.due_date', 'br.return_date')}
+                     - (SELECT TOTAL(p.amount) FROM fee_payments p WHERE p.loan_id = br.id), 2) AS amount
+        FROM borrow_records br
+        LEFT JOIN books b ON b.id = br.book_id
+        WHERE br.patron_id = ? AND br.return_date IS NOT NULL AND br.return_date > br.due_date
+        ORDER BY br.id
+    ''', (patron_id,)).fetchall()
+    conn.close()
+    return [dict(row) for row in rows if row['amount'] > 0]
+
+def record_fee_payments(patron_id: str, items: List[Tuple[int, int, float]], transaction_id: str):
+    """
+    Record the loans covered by one gateway charge in the fee_payments ledger.
+
+    Loans already recorded for this charge are skipped, so this can be
+    repeated for a replayed payment.
+
+    Args:
+        items: (loan_id, book_id, amount) per loan
+    """
+    paid_at = to_epoch(datetime.now())
+    with write_transaction() as conn:
+        recorded = {row[0] for row in conn.execute(
+            'SELECT loan_id FROM fee_payments WHERE transaction_id = ? AND amount > 0', (transaction_id,))}
+        conn.executemany('''
+            INSERT INTO fee_payments (patron_id, loan_id, book_id, amount, transaction_id, paid_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', [(patron_id, loan_id, book_id, amount, transaction_id, paid_at)
+              for loan_id, book_id, amount in items if loan_id not in recorded])
+
+def get_refundable_amount(transaction_id: str) -> Optional[float]:
+    """
+    Get what is left of a charge in the fee_payments ledger (paid less
+    refunded), or None if the charge has no ledger lines.
+    """
+    conn = get_db_connection()
+    row = conn.execute('''
+        SELECT COUNT(*) AS lines, ROUND(TOTAL(amount), 2) AS amount
+        FROM fee_payments WHERE transaction_id = ?
+    ''', (transaction_id,)).fetchone()
     conn.close()
-    return count
+    return row['amount'] if row['lines'] else None
+
+def reverse_fee_payments(transaction_id: str, amount: float, refund_key: str):
+    """
+    Record a refund of a charge as negative fee_payments lines.
+
+    The refund is taken from the charge's loans, most recent line first, so
+    those fees count as owed again. A charge refunded in full is also marked
+    refunded in the payments ledger. Repeating a refund_key within the
+    idempotency TTL (a replayed refund) changes nothing.
+    """
+    refunded_at = to_epoch(datetime.now())
+    with write_transaction() as conn:
+        if conn.execute('''
+            SELECT 1 FROM fee_payments WHERE transaction_id = ? AND refund_key = ? AND paid_at > ? LIMIT 1
+        ''', (transaction_id, refund_key, refunded_at - IDEMPOTENCY_TTL)).fetchone():
+            return
+        lines = conn.execute('''
+            SELECT patron_id, loan_id, book_id, ROUND(TOTAL(amount), 2) AS amount
+            FROM fee_payments WHERE transaction_id = ?
+            GROUP BY patron_id, loan_id, book_id ORDER BY MAX(id) DESC
+        ''', (transaction_id,)).fetchall()
+        paid = round(sum(line['amount'] for line in lines), 2)
+        remaining = round(amount, 2)
+        reversals = []
+        for line in lines:
+            part = round(min(line['amount'], remaining), 2)
+            if part > 0:
+                reversals.append((line['patron_id'], line['loan_id'], line['book_id'], -part,
+                                  transaction_id, refunded_at, refund_key))
+                remaining = round(remaining - part, 2)
+        conn.executemany('''
+            INSERT INTO fee_payments (patron_id, loan_id, book_id, amount, transaction_id, paid_at, refund_key)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', reversals)
+        if lines and round(amount, 2) >= paid:
+            conn.execute("UPDATE payments SET status = 'refunded' WHERE transaction_id = ?", (transaction_id,))
+
+def record_payment(transaction_id: str, patron_id: str, amount: float, description: str = ''):
+    """Add a gateway charge to the payments ledger as pending (ignored if already recorded)."""
+    with write_transaction() as conn:
+        conn.execute('''
+            INSERT OR IGNORE INTO payments (transaction_id, patron_id, amount, description, created_at)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (transaction_id, patron_id, amount, description, to_epoch(datetime.now())))
+
+def get_payment(transaction_id: str) -> Optional[Dict]:
+    """Get a payments ledger row by transaction ID."""
+    conn = get_db_connection()
+    row = conn.execute('SELECT * FROM payments WHERE transaction_id = ?', (transaction_id,)).fetchone()
+    conn.close()
+    return dict(row) if row else None
+
+def claim_pending_payments(limit: int, lease: int = PAYMENT_CLAIM_LEASE) -> List[str]:
+    """
+    Claim up to limit pending transaction IDs for checking, never-checked
+    and least recently checked first.
+
+    Claimed payments are skipped by other reconcilers until their status is
+    stored or the lease (seconds) runs out, so two reconcilers never check
+    the same payment.
+    """
+    now = to_epoch(datetime.now())
+    with write_transaction() as conn:
+        rows = conn.execute('''
+            SELECT transaction_id FROM payments WHERE status = 'pending' AND claimed_until <= ?
+            ORDER BY checked_at NULLS FIRST LIMIT ?
+        ''', (now, limit)).fetchall()
+        transaction_ids = [row['transaction_id'] for row in rows]
+        conn.executemany('UPDATE payments SET claimed_until = ? WHERE transaction_id = ?',
+                         [(now + lease, transaction_id) for transaction_id in transaction_ids])
+    return transaction_ids
+
+def update_payment_statuses(updates: List[Tuple[str, str]]):
+    """
+    Store the gateway's answer for a batch of payments in one transaction
+    and release their reconciliation claims.
+
+    Args:
+        updates: (transaction_id, status) per payment; 'pending' only marks it checked
+    """
+    checked_at = to_epoch(datetime.now())
+    with write_transaction() as conn:
+        conn.executemany('''
+            UPDATE payments SET status = ?, checked_at = ?, attempts = attempts + 1, claimed_until = 0
+            WHERE transaction_id = ?
+        ''', [(status, checked_at, transaction_id) for transaction_id, status in updates])
+
+def claim_idempotency_key(key: str, lease: int = IDEMPOTENCY_LEASE) -> Tuple[bool, Optional[object]]:
+    """
+    Claim an idempotency key before making a non-repeatable call.
+
+    Expired keys are evicted first. Returns (True, None) if the caller now
+    owns the key and should make the call; otherwise (False, result), where
+    result is the stored result of the earlier call, or None while that
+    call is still in progress. The claim lasts lease seconds, unless
+    save_idempotency_result extends it or release_idempotency_key ends it.
+    """
+    now = to_epoch(datetime.now())
+    with write_transaction() as conn:
+        conn.execute('DELETE FROM idempotency_keys WHERE expires_at <= ?', (now,))
+        row = conn.execute('SELECT result FROM idempotency_keys WHERE key = ?', (key,)).fetchone()
+        if row:
+            return False, json.loads(row['result']) if row['result'] is not None else None
+        conn.execute('INSERT INTO idempotency_keys (key, expires_at) VALUES (?, ?)', (key, now + lease))
+    return True, None
+
+def save_idempotency_result(key: str, result: object, ttl: int = IDEMPOTENCY_TTL):
+    """Store the (JSON-serializable) result for a key, replayed until the TTL expires."""
+    with write_transaction() as conn:
+        conn.execute('''
+            INSERT INTO idempotency_keys (key, result, expires_at) VALUES (?, ?, ?)
+            ON CONFLICT (key) DO UPDATE SET result = excluded.result, expires_at = excluded.expires_at
+        ''', (key, json.dumps(result), to_epoch(datetime.now()) + ttl))
+
+def get_idempotency_result(key: str) -> Optional[object]:
+    """Get the unexpired stored result for a key (None if missing or still in progress)."""
+    conn = get_db_connection()
+    row = conn.execute(
+        'SELECT result FROM idempotency_keys WHERE key = ? AND expires_at > ?',
+        (key, to_epoch(datetime.now()))
+    ).fetchone()
+    conn.close()
+    return json.loads(row['result']) if row and row['result'] is not None else None
+
+def release_idempotency_key(key: str):
+    """Give up a claimed key (the call failed and may be retried)."""
+    with write_transaction() as conn:
+        conn.execute('DELETE FROM idempotency_keys WHERE key = ?', (key,))
+
+def rebuild_patron_counters(check_only: bool = False) -> List[Dict]:
+    """
+    Compare the patrons counters against borrow_records and repair drift.
+
+    Returns the patrons whose stored counters disagreed with the loan table,
+    with both values. With check_only the counters are left untouched.
+    """
+    with write_transaction() as conn:
+        expected = {row[0]: (row[1], row[2]) for row in conn.execute(PATRON_COUNTERS_SQL)}
+        stored = {row[0]: (row[1], round(row[2], 2)) for row in conn.execute(
+            'SELECT patron_id, open_loans, total_fees_owed FROM patrons'
+        )}
+        mismatches = []
+        for patron_id in sorted(expected.keys() | stored.keys()):
+            want = expected.get(patron_id, (0, 0.0))
+            have = stored.get(patron_id, (0, 0.0))
+            if want != have:
+                mismatches.append({
+                    'patron_id': patron_id,
+                    'stored_open_loans': have[0], 'open_loans': want[0],
+                    'stored_fees_owed': have[1], 'fees_owed': want[1],
+                })
+        if mismatches and not check_only:
+            conn.execute('DELETE FROM patrons')
+            conn.execute('INSERT INTO patrons (patron_id, open_loans, total_fees_owed) ' + PATRON_COUNTERS_SQL)
+    return mismatches
 
 def insert_book(title: str, author: str, isbn: str, total_copies: int, available_copies: int) -> bool:
     """Insert a new book into the database."""
     conn = get_db_connection()
     try:
-        conn.execute('''
+        book_id = conn.execute('''
             INSERT INTO books (title, author, isbn, total_copies, available_copies)
             VALUES (?, ?, ?, ?, ?)
-        ''', (title, author, isbn, total_copies, available_copies))
+        ''', (title, author, isbn, total_copies, available_copies)).lastrowid
         conn.commit()
         conn.close()
+        isbn_cache.invalidate(isbn)
+        # Never serve anything cached under this id before the insert
+        invalidate_book(book_id)
         return True
     except Exception as e:
         conn.close()
         return False
 
+def insert_books_batch(books: List[Tuple]) -> List[int]:
+    """
+    Insert many books in one transaction with executemany.
+
+    ISBNs already in the catalog, or repeated within the batch, are skipped.
+    The check runs under the write lock, so it cannot race another import.
+
+    Args:
+        books: (title, author, isbn, total_copies, available_copies) tuples
+
+    Returns:
+        list: Positions in books that were skipped as duplicates
+    """
+    isbns = [book[2] for book in books]
+    skipped = []
+    with write_transaction() as conn:
+        existing = set()
+        # Stay well below SQLite's bound-parameter limit
+        for i in range(0, len(isbns), 500):
+            part = isbns[i:i + 500]
+            placeholders = ', '.join('?' * len(part))
+            existing.update(row[0] for row in conn.execute(
+                f'SELECT isbn FROM books WHERE isbn IN ({placeholders})', part))
+        
+        new_books = []
+        for position, book in enumerate(books):
+            if book[2] in existing:
+                skipped.append(position)
+            else:
+                existing.add(book[2])
+                new_books.append(book)
+        conn.executemany('''
+            INSERT INTO books (title, author, isbn, total_copies, available_copies)
+            VALUES (?, ?, ?, ?, ?)
+        ''', new_books)
+    
+    for isbn in isbns:
+        isbn_cache.invalidate(isbn)
+    return skipped
+
 def insert_borrow_record(patron_id: str, book_id: int, borrow_date: datetime, due_date: datetime) -> bool:
     """Insert a new borrow record into the database."""
     conn = get_db_connection()
@@ -162,7 +1314,7 @@ def insert_borrow_record(patron_id: str, book_id: int, borrow_date: datetime, du
         conn.execute('''
             INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date)
             VALUES (?, ?, ?, ?)
-        ''', (patron_id, book_id, borrow_date.isoformat(), due_date.isoformat()))
+        ''', (patron_id, book_id, to_epoch(borrow_date), to_epoch(due_date)))
         conn.commit()
         conn.close()
         return True
@@ -179,11 +1331,101 @@ def update_book_availability(book_id: int, change: int) -> bool:
         ''', (change, book_id))
         conn.commit()
         conn.close()
+        invalidate_book(book_id)
         return True
     except Exception as e:
         conn.close()
         return False
 
+def borrow_book_transaction(patron_id: str, book_id: int, borrow_date: datetime, due_date: datetime) -> Tuple[str, Optional[Book]]:
+    """
+    Borrow a book in a single transaction.
+
+    Checks the book and the patron's limit, takes a copy with a conditional
+    UPDATE and inserts the borrow record under one write lock and one commit.
+
+    Returns:
+        tuple: (status, book) where status is one of 'borrowed', 'not_found',
+        'unavailable', 'limit_reached' or 'error'
+    """
+    try:
+        with write_transaction() as conn:
+            book = query_records(conn, Book, f'SELECT {BOOK_COLUMNS} FROM books WHERE id = ?', (book_id,)).fetchone()
+            if not book:
+                return 'not_found', None
+            
+            if book.available_copies <= 0:
+                return 'unavailable', book
+            
+            row = conn.execute(
+                'SELECT open_loans FROM patrons WHERE patron_id = ?', (patron_id,)
+            ).fetchone()
+            if row and row[0] >= MAX_BORROWED_BOOKS:
+                return 'limit_reached', book
+            
+            updated = conn.execute('''
+                UPDATE books SET available_copies = available_copies - 1 
+                WHERE id = ? AND available_copies > 0
+            ''', (book_id,)).rowcount
+            if updated == 0:
+                return 'unavailable', book
+            
+            conn.execute('''
+                INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date)
+                VALUES (?, ?, ?, ?)
+            ''', (patron_id, book_id, to_epoch(borrow_date), to_epoch(due_date)))
+            return 'borrowed', book
+    except sqlite3.Error:
+        return 'error', None
+    finally:
+        # After commit, so readers cannot re-cache the old availability
+        invalidate_book(book_id)
+
+def return_book_transaction(patron_id: str, book_id: int, return_date: datetime) -> Tuple[str, Optional[Dict]]:
+    """
+    Return a book in a single transaction.
+
+    Closes the patron's open loan for the book and gives the copy back
+    (never exceeding total_copies) under one write lock and one commit.
+
+    Returns:
+        tuple: (status, loan) where status is one of 'returned',
+        'not_borrowed' or 'error', and loan holds the closed record's
+        title, borrow_date, due_date and return_date
+    """
+    try:
+        with write_transaction() as conn:
+            loan = conn.execute('''
+                SELECT br.id, br.borrow_date, br.due_date, b.title
+                FROM borrow_records br 
+                JOIN books b ON br.book_id = b.id 
+                WHERE br.patron_id = ? AND br.book_id = ? AND br.return_date IS NULL
+                ORDER BY br.borrow_date
+                LIMIT 1
+            ''', (patron_id, book_id)).fetchone()
+            if not loan:
+                return 'not_borrowed', None
+            
+            conn.execute('''
+                UPDATE borrow_records SET return_date = ? WHERE id = ?
+            ''', (to_epoch(return_date), loan['id']))
+            conn.execute('''
+                UPDATE books SET available_copies = MIN(available_copies + 1, total_copies) 
+                WHERE id = ?
+            ''', (book_id,))
+            
+            return 'returned', {
+                'book_id': book_id,
+                'title': loan['title'],
+                'borrow_date': loan['borrow_date'],
+                'due_date': loan['due_date'],
+                'return_date': to_epoch(return_date)
+            }
+    except sqlite3.Error:
+        return 'error', None
+    finally:
+        invalidate_book(book_id)
+
 def update_borrow_record_return_date(patron_id: str, book_id: int, return_date: datetime) -> bool:
     """Update the return date for a borrow record."""
     conn = get_db_connection()
@@ -192,7 +1434,7 @@ def update_borrow_record_return_date(patron_id: str, book_id: int, return_date:
             UPDATE borrow_records 
             SET return_date = ? 
             WHERE patron_id = ? AND book_id = ? AND return_date IS NULL
-        ''', (return_date.isoformat(), patron_id, book_id))
+        ''', (to_epoch(return_date), patron_id, book_id))
         conn.commit()
         conn.close()
         return True
@@ -205,26 +1447,18 @@ import sqlite3
 def init_db():
     """
     Initialize the SQLite database with the tables needed for the library app.
-    Also clears the books table so tests start from a clean state.
+    Also clears the books table and stored payment results so tests start
+    from a clean state.
     """
+    init_database()
+
     conn = get_db_connection()
     cursor = conn.cursor()
 
-    cursor.execute(
-        """
-        CREATE TABLE IF NOT EXISTS books (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT NOT NULL,
-            author TEXT NOT NULL,
-            isbn TEXT NOT NULL UNIQUE,
-            total_copies INTEGER NOT NULL,
-            available_copies INTEGER NOT NULL
-        );
-        """
-    )
-
     cursor.execute("DELETE FROM books;")
+    cursor.execute("DELETE FROM idempotency_keys;")
+    cursor.execute("DELETE FROM payments;")
 
     conn.commit()
-    conn.close() 
-
+    conn.close()
+    clear_book_cache() 
@@ -0,0 +1,46 @@
+"""
+Gunicorn configuration for production serving:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Pre-fork workers, each with a pool of threads; every setting can be
+overridden from the environment.
+"""
+
+import multiprocessing
+import os
+
+bind = os.environ.get('LIBRARY_BIND', '0.0.0.0:5000')
+
+# Worker processes and request threads per worker. Keep threads above
+# LIBRARY_PAYMENT_MAX_CONCURRENT so a slow payment gateway cannot occupy them all.
+workers = int(os.environ.get('LIBRARY_WEB_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+worker_class = 'gthread'
+threads = int(os.environ.get('LIBRARY_WEB_THREADS', '8'))
+
+# Seconds an idle keep-alive connection is held open
+keepalive = int(os.environ.get('LIBRARY_KEEPALIVE', '5'))
+
+# Recycle a worker after this many requests (plus up to jitter) to bound memory growth
+max_requests = int(os.environ.get('LIBRARY_MAX_REQUESTS', '1000'))
+max_requests_jitter = int(os.environ.get('LIBRARY_MAX_REQUESTS_JITTER', '100'))
+
+# Seconds before a silent worker is killed and restarted, and allowed for graceful shutdown
+timeout = int(os.environ.get('LIBRARY_WORKER_TIMEOUT', '30'))
+graceful_timeout = timeout
+
+# Access log file ('-' for stdout); set empty to disable
+accesslog = os.environ.get('LIBRARY_ACCESS_LOG', '-') or None
+
+# Each worker imports the app after the fork, so no SQLite connection or
+# background thread is ever shared across processes
+preload_app = False
+
+
+def post_worker_init(worker):
+    """Open the worker's pooled connections and prime its book cache before it takes requests."""
+    from database import warm_up
+
+    stats = warm_up()
+    worker.log.info("Worker warmed up: %d pooled connections, %d cached books",
+                    stats['connections'], stats['books'])
@@ -0,0 +1,82 @@
+"""
+Records Module - Slotted row types returned by the data layer
+Rows are built straight from cursor tuples by a row_factory; fields read
+by attribute (templates) or by key (code written against dict rows).
+"""
+
+from dataclasses import dataclass
+from typing import Any, Iterator, Optional, Tuple
+
+
+class Record:
+    """
+    Dict-style access for slotted dataclass records.
+
+    Subclasses are @dataclass(slots=True) types whose fields are listed in
+    the same order as the columns their queries select.
+    """
+
+    __slots__ = ()
+
+    @classmethod
+    def from_row(cls, cursor, row: Tuple):
+        """sqlite3 row_factory: build a record from one row's values."""
+        return cls(*row)
+
+    @classmethod
+    def columns(cls, alias: Optional[str] = None) -> str:
+        """SQL select list for this record's fields, optionally table-qualified."""
+        prefix = f"{alias}." if alias else ''
+        return ', '.join(prefix + name for name in cls.__slots__)
+
+    def keys(self) -> Tuple[str, ...]:
+        return self.__slots__
+
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        return ((name, getattr(self, name)) for name in self.__slots__)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key) if key in self.__slots__ else default
+
+    def copy(self):
+        return type(self)(*(getattr(self, name) for name in self.__slots__))
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.__slots__)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.__slots__
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key: str, value: Any):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+
+@dataclass(slots=True)
+class Book(Record):
+    """A row of the books table."""
+    id: int
+    title: str
+    author: str
+    isbn: str
+    total_copies: int
+    available_copies: int
+
+
+@dataclass(slots=True)
+class Loan(Record):
+    """A borrow record joined to its book's title and author."""
+    id: int
+    book_id: int
+    title: str
+    author: str
+    borrow_date: int
+    due_date: int
+    return_date: Optional[int]
+    is_overdue: bool
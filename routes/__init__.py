@@ -2,14 +2,22 @@
 Routes Package - Initialize all route blueprints
 """
 
+from database import from_epoch
 from .catalog_routes import catalog_bp
 from .borrowing_routes import borrowing_bp
 from .search_routes import search_bp
 from .api_routes import api_bp
+from .patron_routes import patron_bp
+
+def epoch_date(value, fmt='%Y-%m-%d'):
+    """Template filter formatting stored epoch seconds as a local date."""
+    return from_epoch(value).strftime(fmt) if value is not None else ''
 
 def register_blueprints(app):
     """Register all route blueprints with the Flask app."""
+    app.add_template_filter(epoch_date)
     app.register_blueprint(catalog_bp)
     app.register_blueprint(borrowing_bp)
     app.register_blueprint(search_bp)
     app.register_blueprint(api_bp)
+    app.register_blueprint(patron_bp)
@@ -2,8 +2,18 @@
 API Routes - JSON API endpoints
 """
 
-from flask import Blueprint, jsonify, request
-from library_service import calculate_late_fee_for_book, search_books_in_catalog
+import csv
+import io
+import json
+
+from flask import Blueprint, Response, jsonify, request
+from database import EXPORT_COLUMNS, HISTORY_PAGE_SIZE, from_epoch, iter_table_rows
+from services.library_service import (
+    calculate_late_fee_for_book, search_books_in_catalog, get_patron_status_report,
+    get_payment_status, pay_late_fees, SEARCH_DEFAULT_LIMIT
+)
+from services.resilience import payment_gateway_stats
+from .http_cache import catalog_cached
 
 api_bp = Blueprint('api', __name__, url_prefix='/api')
 
@@ -14,9 +24,20 @@ def get_late_fee(patron_id, book_id):
     API endpoint for R4: Late Fee Calculation
     """
     result = calculate_late_fee_for_book(patron_id, book_id)
-    return jsonify(result), 501 if 'not implemented' in result.get('status', '') else 200
+    if result['status'] == 'Invalid patron ID':
+        return jsonify(result), 400
+    if result['status'] == 'No borrow record found':
+        return jsonify(result), 404
+    return jsonify(result), 200
+
+@api_bp.route('/late_fee/<patron_id>/<int:book_id>/payment', methods=['POST'])
+def pay_late_fee(patron_id, book_id):
+    """Pay a patron's late fee for a book through the payment gateway."""
+    success, message, transaction_id = pay_late_fees(patron_id, book_id)
+    return jsonify({'success': success, 'message': message, 'transaction_id': transaction_id}), 200 if success else 400
 
 @api_bp.route('/search')
+@catalog_cached('public')
 def search_books_api():
     """
     Search for books via API endpoint.
@@ -24,16 +45,122 @@ def search_books_api():
     """
     search_term = request.args.get('q', '').strip()
     search_type = request.args.get('type', 'title')
+    limit = request.args.get('limit', SEARCH_DEFAULT_LIMIT, type=int)
+    offset = request.args.get('offset', 0, type=int)
     
     if not search_term:
         return jsonify({'error': 'Search term is required'}), 400
     
     # Use business logic function
-    books = search_books_in_catalog(search_term, search_type)
+    books = search_books_in_catalog(search_term, search_type, limit, offset)
     
     return jsonify({
         'search_term': search_term,
         'search_type': search_type,
+        'limit': limit,
+        'offset': offset,
         'results': books,
         'count': len(books)
     })
+
+LOAN_DATE_FIELDS = ('borrow_date', 'due_date', 'return_date')
+
+def _serialize_loan(loan):
+    """Make a loan dict JSON-friendly (stored epoch seconds become ISO 8601 dates)."""
+    return {key: from_epoch(value).isoformat() if key in LOAN_DATE_FIELDS and value is not None else value
+            for key, value in loan.items()}
+
+@api_bp.route('/patron/<patron_id>')
+def patron_status_api(patron_id):
+    """
+    Get a patron's status report as JSON.
+    API interface for R7: Patron Status Report
+    """
+    report = get_patron_status_report(patron_id, request.args.get('before', type=int),
+                                      request.args.get('limit', HISTORY_PAGE_SIZE, type=int))
+    if 'error' in report:
+        return jsonify(report), 400
+    
+    report['borrowed_books'] = [_serialize_loan(loan) for loan in report['borrowed_books']]
+    report['history'] = [_serialize_loan(loan) for loan in report['history']]
+    return jsonify(report)
+
+@api_bp.route('/payments/health')
+def payment_gateway_health():
+    """Circuit breaker state and transition counts, and bulkhead usage, for the payment gateway."""
+    stats = payment_gateway_stats()
+    return jsonify(stats), 503 if stats['circuit']['state'] == 'open' else 200
+
+@api_bp.route('/payments/<transaction_id>')
+def payment_status_api(transaction_id):
+    """
+    Get a payment's status from the local payments ledger (kept current by
+    the reconciliation worker) without calling the gateway.
+    """
+    payment = get_payment_status(transaction_id)
+    if payment is None:
+        return jsonify({'status': 'not_found', 'message': 'Transaction not found'}), 404
+    for field in ('created_at', 'checked_at'):
+        if payment[field] is not None:
+            payment[field] = from_epoch(payment[field]).isoformat()
+    return jsonify(payment)
+
+def _encode_csv(columns, rows, batch_size=500):
+    """Encode rows as CSV, yielding one chunk per batch of rows."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for count, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if count % batch_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+def _encode_ndjson(columns, rows, batch_size=500):
+    """Encode rows as newline-delimited JSON objects, one chunk per batch."""
+    chunk = []
+    for row in rows:
+        chunk.append(json.dumps(dict(zip(columns, row))))
+        if len(chunk) == batch_size:
+            yield '\n'.join(chunk) + '\n'
+            chunk = []
+    if chunk:
+        yield '\n'.join(chunk) + '\n'
+
+def _iso_loan_dates(columns, rows):
+    """Turn stored epoch seconds in loan date columns into ISO 8601 dates, as the JSON API does."""
+    positions = [i for i, column in enumerate(columns) if column in LOAN_DATE_FIELDS]
+    try:
+        for row in rows:
+            row = list(row)
+            for i in positions:
+                if row[i] is not None:
+                    row[i] = from_epoch(row[i]).isoformat()
+            yield row
+    finally:
+        rows.close()
+
+EXPORT_FORMATS = {
+    'csv': (_encode_csv, 'text/csv'),
+    'ndjson': (_encode_ndjson, 'application/x-ndjson'),
+}
+
+@api_bp.route('/export/<any(books, borrow_records):table>')
+def export_table(table):
+    """
+    Stream a full table export as CSV (default) or NDJSON (?format=ndjson).
+    Rows are read and encoded incrementally so memory use stays flat; loan
+    dates are exported as ISO 8601.
+    """
+    export_format = request.args.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'error': f'Unsupported export format: {export_format}'}), 400
+    
+    encode, mimetype = EXPORT_FORMATS[export_format]
+    columns = EXPORT_COLUMNS[table]
+    body = encode(columns, _iso_loan_dates(columns, iter_table_rows(table)))
+    return Response(body, mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename={table}.{export_format}'
+    })
@@ -0,0 +1,210 @@
+"""
+Async API Routes - ASGI variant of the JSON API endpoints
+
+Serves /api/late_fee, late fee payments and /api/search as coroutines.
+The service layer is shared with the Flask blueprint and awaited through
+database.run_db, so a request waiting on SQLite holds a coroutine, not a
+worker thread: a handful of workers can keep thousands of API clients in
+flight while only DB_THREADS connections are ever busy. Payments await the
+gateway through AsyncPaymentClient, so a slow gateway ties up no thread
+either. Every other path is handed to the
+Flask (WSGI) app on a pool of WSGI_THREADS threads, like a gunicorn
+gthread worker. /api/search is tagged with the same catalog ETag as the
+Flask route and answers a matching If-None-Match with 304.
+
+Serve with any ASGI server, e.g. `uvicorn asgi:app`.
+"""
+
+import functools
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+from werkzeug.http import parse_etags, quote_etag
+
+from database import run_db, shutdown_db_executor
+from records import Record
+from routes.http_cache import catalog_cache_control, catalog_etag
+from services.library_service import (
+    calculate_late_fee_for_book, pay_late_fees_async, search_books_in_catalog, SEARCH_DEFAULT_LIMIT
+)
+from services.payment_client import close_async_payment_client
+
+# Threads running Flask (WSGI) requests concurrently in each ASGI worker process
+WSGI_THREADS = int(os.environ.get('LIBRARY_WSGI_THREADS', '8'))
+
+# (method, path pattern, handler); handlers take (path params, query, request headers) and
+# return (payload, status) or (payload, status, response headers)
+ROUTES: List[Tuple[str, re.Pattern, Callable]] = []
+
+def route(pattern: str, method: str = 'GET'):
+    """Register an async handler for a method and a path regex with named groups."""
+    def decorator(handler):
+        ROUTES.append((method, re.compile(f'^{pattern}$'), handler))
+        return handler
+    return decorator
+
+
+def _arg(query: Dict, name: str, default=None, type=str):
+    """First value of a query argument, converted like Flask's request.args.get(type=...)."""
+    values = query.get(name)
+    if not values:
+        return default
+    try:
+        return type(values[0])
+    except ValueError:
+        return default
+
+
+def catalog_cached(handler):
+    """
+    ASGI counterpart of http_cache.catalog_cached('public'): tag 200 responses
+    with the catalog ETag and Cache-Control, and answer a matching
+    If-None-Match with 304 without running the handler.
+    """
+    @functools.wraps(handler)
+    async def wrapper(params, query, headers):
+        etag = await run_db(catalog_etag)
+        cache_headers = {'etag': quote_etag(etag), 'cache-control': catalog_cache_control('public')}
+        if parse_etags(headers.get('if-none-match')).contains(etag):
+            return None, 304, cache_headers
+        payload, status = await handler(params, query, headers)
+        if status != 200:
+            return payload, status
+        return payload, status, cache_headers
+    return wrapper
+
+
+@route(r'/api/late_fee/(?P<patron_id>[^/]+)/(?P<book_id>\d+)')
+async def get_late_fee(params, query, headers):
+    """Async variant of GET /api/late_fee/<patron_id>/<book_id> (R4)."""
+    result = await run_db(calculate_late_fee_for_book, params['patron_id'], int(params['book_id']))
+    if result['status'] == 'Invalid patron ID':
+        return result, 400
+    if result['status'] == 'No borrow record found':
+        return result, 404
+    return result, 200
+
+
+@route(r'/api/late_fee/(?P<patron_id>[^/]+)/(?P<book_id>\d+)/payment', method='POST')
+async def pay_late_fee(params, query, headers):
+    """Async variant of POST /api/late_fee/<patron_id>/<book_id>/payment."""
+    success, message, transaction_id = await pay_late_fees_async(params['patron_id'], int(params['book_id']))
+    return {'success': success, 'message': message, 'transaction_id': transaction_id}, 200 if success else 400
+
+
+@route(r'/api/search')
+@catalog_cached
+async def search_books_api(params, query, headers):
+    """Async variant of GET /api/search (R6)."""
+    search_term = _arg(query, 'q', '').strip()
+    search_type = _arg(query, 'type', 'title')
+    limit = _arg(query, 'limit', SEARCH_DEFAULT_LIMIT, int)
+    offset = _arg(query, 'offset', 0, int)
+
+    if not search_term:
+        return {'error': 'Search term is required'}, 400
+
+    books = await run_db(search_books_in_catalog, search_term, search_type, limit, offset)
+    return {
+        'search_term': search_term,
+        'search_type': search_type,
+        'limit': limit,
+        'offset': offset,
+        'results': books,
+        'count': len(books)
+    }, 200
+
+
+def _json_default(value):
+    if isinstance(value, Record):
+        return dict(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+async def _send_json(send, payload, status: int, headers: Optional[Dict[str, str]] = None):
+    """Send a JSON response; a None payload sends no body (304)."""
+    response_headers = [(name.encode(), value.encode()) for name, value in (headers or {}).items()]
+    body = b''
+    if payload is not None:
+        body = json.dumps(payload, default=_json_default).encode()
+        response_headers += [(b'content-type', b'application/json'),
+                             (b'content-length', str(len(body)).encode())]
+    await send({'type': 'http.response.start', 'status': status, 'headers': response_headers})
+    await send({'type': 'http.response.body', 'body': body})
+
+async def _lifespan(receive, send, on_shutdown: Callable):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await close_async_payment_client()
+            on_shutdown()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+def threaded_wsgi(wsgi_app: Callable, executor: ThreadPoolExecutor) -> Callable:
+    """
+    Wrap a WSGI app as an ASGI app whose requests run on executor's threads.
+
+    asgiref's WsgiToAsgi runs every WSGI call on one shared thread
+    (thread_sensitive=True), so Flask paths would be served one at a time.
+    """
+    from asgiref.sync import sync_to_async
+    from asgiref.wsgi import WsgiToAsgiInstance
+
+    # The undecorated body of asgiref's (sync_to_async-wrapped) run_wsgi_app
+    run_wsgi_app = WsgiToAsgiInstance.__dict__['run_wsgi_app'].func
+
+    class ThreadedInstance(WsgiToAsgiInstance):
+        async def run_wsgi_app(self, body):
+            await sync_to_async(run_wsgi_app, thread_sensitive=False, executor=executor)(self, body)
+
+    async def app(scope, receive, send):
+        await ThreadedInstance(wsgi_app)(scope, receive, send)
+
+    return app
+
+
+def create_asgi_app(wsgi_app: Optional[Callable] = None, wsgi_threads: int = WSGI_THREADS):
+    """
+    Build the ASGI application.
+
+    Args:
+        wsgi_app: Flask app serving every path without an async handler
+            (needs asgiref); without it those paths get a 404
+        wsgi_threads: Flask requests handled at once
+    """
+    fallback = wsgi_executor = None
+    if wsgi_app is not None:
+        wsgi_executor = ThreadPoolExecutor(max_workers=wsgi_threads, thread_name_prefix='wsgi')
+        fallback = threaded_wsgi(wsgi_app, wsgi_executor)
+
+    def shutdown():
+        shutdown_db_executor()
+        if wsgi_executor is not None:
+            wsgi_executor.shutdown(wait=True)
+
+    async def app(scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await _lifespan(receive, send, shutdown)
+
+        if scope['type'] == 'http':
+            for method, pattern, handler in ROUTES:
+                match = pattern.match(scope['path'])
+                if match and scope['method'] == method:
+                    query = parse_qs(scope.get('query_string', b'').decode())
+                    headers = {name.decode('latin-1').lower(): value.decode('latin-1')
+                               for name, value in scope.get('headers', [])}
+                    return await _send_json(send, *await handler(match.groupdict(), query, headers))
+
+        if fallback is not None:
+            return await fallback(scope, receive, send)
+        if scope['type'] == 'http':
+            await _send_json(send, {'error': 'Not found'}, 404)
+
+    return app
@@ -2,25 +2,64 @@
 Catalog Routes - Book catalog related endpoints
 """
 
-from flask import Blueprint, render_template, request, redirect, url_for, flash
-from database import get_all_books
-from library_service import add_book_to_catalog
+from typing import List
+
+from flask import Blueprint, current_app, render_template, request, redirect, url_for, flash
+from markupsafe import Markup
+from database import get_books_page, catalog_row_cache, CATALOG_PAGE_SIZE
+from records import Book
+from services.library_service import add_book_to_catalog
+from .http_cache import catalog_cached
 
 catalog_bp = Blueprint('catalog', __name__)
 
+def render_catalog_rows(books: List[Book]) -> List[Markup]:
+    """
+    Render the catalog table rows, reusing the cached fragment of every book
+    whose row has not changed since it was rendered.
+
+    Args:
+        books: Rows of the current catalog page
+
+    Returns:
+        list: One rendered <tr> per book, in order
+    """
+    template = None
+    rows = []
+    for book in books:
+        cached = catalog_row_cache.get(book.id)
+        # A fragment rendered from an older copy of the row (e.g. before a borrow) is stale
+        if cached is not None and cached[0] == book:
+            rows.append(cached[1])
+            continue
+        if template is None:
+            template = current_app.jinja_env.get_template('_catalog_row.html')
+        row = Markup(template.render(book=book))
+        catalog_row_cache.set(book.id, (book, row))
+        rows.append(row)
+    return rows
+
 @catalog_bp.route('/')
 def index():
     """Home page redirects to catalog."""
     return redirect(url_for('catalog.catalog'))
 
 @catalog_bp.route('/catalog')
+@catalog_cached('private')
 def catalog():
     """
-    Display all books in the catalog.
+    Display the books in the catalog, one page at a time.
     Implements R2: Book Catalog Display
     """
-    books = get_all_books()
-    return render_template('catalog.html', books=books)
+    per_page = request.args.get('per_page', CATALOG_PAGE_SIZE, type=int)
+    try:
+        page = get_books_page(request.args.get('after'), request.args.get('before'), per_page)
+    except ValueError:
+        # Stale or tampered cursor: start again from the first page
+        page = get_books_page(limit=per_page)
+    return render_template('catalog.html', books=page['books'], rows=render_catalog_rows(page['books']),
+                           per_page=per_page,
+                           next_cursor=page['next_cursor'], prev_cursor=page['prev_cursor'])
 
 @catalog_bp.route('/add_book', methods=['GET', 'POST'])
 def add_book():
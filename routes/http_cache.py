@@ -0,0 +1,58 @@
+"""
+HTTP caching for catalog-backed pages - ETags and conditional GET
+
+Pages that only depend on the books table are tagged with a strong ETag
+derived from the catalog version counter. A client that sends the ETag back
+in If-None-Match gets a bodiless 304 from a single meta-table read, without
+the view running or the books table being touched.
+"""
+
+import functools
+import os
+
+from flask import make_response, request, session
+
+from database import get_catalog_version
+
+# Seconds clients may reuse a catalog response before revalidating (0: revalidate every time)
+CATALOG_MAX_AGE = int(os.environ.get('LIBRARY_CATALOG_MAX_AGE', '0'))
+
+
+def catalog_etag() -> str:
+    """Strong ETag (unquoted) for responses that only depend on the books table."""
+    return f"catalog-{get_catalog_version()}"
+
+
+def catalog_cache_control(scope: str) -> str:
+    """Cache-Control value for catalog-backed responses."""
+    return f'{scope}, max-age={CATALOG_MAX_AGE}, must-revalidate'
+
+
+def catalog_cached(scope: str = 'public'):
+    """
+    Serve the view with an ETag and Cache-Control, answering a matching
+    If-None-Match with 304.
+
+    Args:
+        scope: 'public' for responses any cache may share, 'private' for
+            pages that may carry per-user content (flash messages)
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            # A pending flash message is shown once, so that page is never cached or 304'd
+            if scope == 'private' and session.get('_flashes'):
+                return view(*args, **kwargs)
+
+            etag = catalog_etag()
+            if request.if_none_match.contains(etag):
+                response = make_response('', 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = catalog_cache_control(scope)
+            return response
+        return wrapper
+    return decorator
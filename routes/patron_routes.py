@@ -0,0 +1,31 @@
+"""
+Patron Routes - Patron status report endpoints
+"""
+
+from flask import Blueprint, render_template, request, redirect, url_for, flash
+from services.library_service import get_patron_status_report
+
+patron_bp = Blueprint('patron', __name__)
+
+@patron_bp.route('/patron')
+def patron_lookup():
+    """
+    Ask for a library card number, then show that patron's report.
+    Web interface for R7: Patron Status Report
+    """
+    patron_id = request.args.get('patron_id', '').strip()
+    if not patron_id:
+        return render_template('patron_status.html', report=None)
+    return redirect(url_for('patron.patron_status', patron_id=patron_id))
+
+@patron_bp.route('/patron/<patron_id>')
+def patron_status(patron_id):
+    """
+    Display a patron's status report.
+    Web interface for R7: Patron Status Report
+    """
+    report = get_patron_status_report(patron_id, request.args.get('before', type=int))
+    if 'error' in report:
+        flash(report['error'], 'error')
+        return render_template('patron_status.html', report=None), 400
+    return render_template('patron_status.html', report=report)
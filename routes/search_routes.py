@@ -2,12 +2,14 @@
 Search Routes - Book search functionality
 """
 
-from flask import Blueprint, render_template, request, flash
-from library_service import search_books_in_catalog
+from flask import Blueprint, render_template, request
+from services.library_service import search_books_in_catalog, SEARCH_DEFAULT_LIMIT
+from .http_cache import catalog_cached
 
 search_bp = Blueprint('search', __name__)
 
 @search_bp.route('/search')
+@catalog_cached('private')
 def search_books():
     """
     Search for books in the catalog.
@@ -15,14 +17,14 @@ def search_books():
     """
     search_term = request.args.get('q', '').strip()
     search_type = request.args.get('type', 'title')
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    limit = SEARCH_DEFAULT_LIMIT
     
     if not search_term:
         return render_template('search.html', books=[], search_term='', search_type=search_type)
     
     # Use business logic function
-    books = search_books_in_catalog(search_term, search_type)
+    books = search_books_in_catalog(search_term, search_type, limit, offset)
     
-    if not books:
-        flash('Search functionality is not yet implemented.', 'error')
-    
-    return render_template('search.html', books=books, search_term=search_term, search_type=search_type)
+    return render_template('search.html', books=books, search_term=search_term, search_type=search_type,
+                           offset=offset, limit=limit)
@@ -0,0 +1,76 @@
+"""
+Fee Engine Module - Late fee calculation (R5)
+
+Implements the tiered late fee rule once, for a single loan, for whole
+batches of loans as NumPy arrays (reports, nightly jobs), and as an SQL
+expression for queries and triggers.
+"""
+
+from datetime import datetime
+from typing import TYPE_CHECKING, Tuple
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# Late fee rules (R5)
+LATE_FEE_FIRST_WEEK_RATE = 0.50
+LATE_FEE_LATER_RATE = 1.00
+FIRST_WEEK_DAYS = 7
+MAX_LATE_FEE = 15.00
+SECONDS_PER_DAY = 86400
+
+
+def compute_late_fee(due_date: datetime, as_of: datetime) -> Tuple[float, int]:
+    """
+    Compute the late fee for a loan as of a given time.
+    
+    Args:
+        due_date: When the book was due
+        as_of: Return date, or the current time for books still out
+        
+    Returns:
+        tuple: (fee_amount: float, days_overdue: int)
+    """
+    days_overdue = max((as_of - due_date).days, 0)
+    fee = (min(days_overdue, FIRST_WEEK_DAYS) * LATE_FEE_FIRST_WEEK_RATE
+           + max(days_overdue - FIRST_WEEK_DAYS, 0) * LATE_FEE_LATER_RATE)
+    return round(min(fee, MAX_LATE_FEE), 2), days_overdue
+
+
+def compute_late_fees(due_timestamps, as_of_timestamps) -> Tuple['np.ndarray', 'np.ndarray']:
+    """
+    Compute late fees for many loans at once.
+    
+    Args:
+        due_timestamps: Due dates as epoch seconds (array-like)
+        as_of_timestamps: Return dates or "now" as epoch seconds; a scalar
+            applies the same time to every loan
+            
+    Returns:
+        tuple: (fees: float64 array, days_overdue: int64 array)
+    """
+    import numpy as np  # only batch callers pay for importing NumPy
+    
+    due = np.asarray(due_timestamps, dtype=np.int64)
+    as_of = np.asarray(as_of_timestamps, dtype=np.int64)
+    # Whole days late, like timedelta.days; never negative
+    days = np.maximum((as_of - due) // SECONDS_PER_DAY, 0)
+    fees = (np.minimum(days, FIRST_WEEK_DAYS) * LATE_FEE_FIRST_WEEK_RATE
+            + np.maximum(days - FIRST_WEEK_DAYS, 0) * LATE_FEE_LATER_RATE)
+    return np.round(np.minimum(fees, MAX_LATE_FEE), 2), days
+
+
+def late_fee_sql(due_column: str, as_of_column: str) -> str:
+    """
+    Build an SQL expression for the late fee of a loan.
+    
+    Args:
+        due_column: SQL expression for the due date in epoch seconds
+        as_of_column: SQL expression for the return date (or "now") in epoch seconds
+        
+    Returns:
+        str: Expression evaluating to the fee in dollars
+    """
+    days = f"MAX(({as_of_column} - {due_column}) / {SECONDS_PER_DAY}, 0)"
+    return (f"MIN(MIN({days}, {FIRST_WEEK_DAYS}) * {LATE_FEE_FIRST_WEEK_RATE}"
+            f" + MAX({days} - {FIRST_WEEK_DAYS}, 0) * {LATE_FEE_LATER_RATE}, {MAX_LATE_FEE})")
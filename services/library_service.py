@@ -3,14 +3,71 @@ Library Service Module - Business Logic Functions
 Contains all the core business logic for the Library Management System
 """
 
+import hashlib
+import logging
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
 from database import (
-    get_book_by_id, get_book_by_isbn, get_patron_borrow_count,
-    insert_book, insert_borrow_record, update_book_availability,
-    update_borrow_record_return_date, get_all_books
+    get_book_by_id, get_book_by_isbn, insert_book, insert_books_batch,
+    borrow_book_transaction, return_book_transaction, search_books,
+    get_loan_for_fee, iter_open_loans, get_patron_borrowed_books, get_patron_history,
+    get_patron_counters, get_outstanding_fees, get_patrons_owing_fees,
+    record_fee_payments, reverse_fee_payments, get_refundable_amount,
+    claim_idempotency_key, save_idempotency_result, get_idempotency_result, release_idempotency_key,
+    record_payment, get_payment, claim_pending_payments, update_payment_statuses,
+    from_epoch, to_epoch, run_db, MAX_BORROWED_BOOKS, HISTORY_PAGE_SIZE
 )
+from services.fee_engine import compute_late_fee, compute_late_fees, MAX_LATE_FEE
 from services.payment_service import PaymentGateway
+from services.payment_client import (
+    PaymentGatewayError, ThreadedAsyncGateway, get_async_payment_client, get_payment_client
+)
+from services.resilience import Bulkhead, guard_async_payment_gateway, guard_payment_gateway
+
+logger = logging.getLogger(__name__)
+
+# Layout of iter_open_loans rows as a NumPy structured dtype (patron IDs are 6 digits)
+OPEN_LOAN_DTYPE = [('loan_id', 'i8'), ('patron_id', 'U6'), ('book_id', 'i8'), ('due_date', 'i8')]
+
+# Search result paging (R6)
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_LIMIT = 100
+
+def validate_book_fields(title: str, author: str, isbn: str, total_copies: int) -> Optional[str]:
+    """
+    Validate the fields of a new book (R1 rules).
+    
+    Returns:
+        str: The error message for the first invalid field, or None if valid
+    """
+    if not isinstance(title, str):
+        return "Title must be text."
+    
+    if not title or not title.strip():
+        return "Title is required."
+    
+    if len(title.strip()) > 200:
+        return "Title must be less than 200 characters."
+    
+    if not isinstance(author, str):
+        return "Author must be text."
+    
+    if not author or not author.strip():
+        return "Author is required."
+    
+    if len(author.strip()) > 100:
+        return "Author must be less than 100 characters."
+    
+    if len(isbn) != 13:
+        return "ISBN must be exactly 13 digits."
+    
+    if not isinstance(total_copies, int) or isinstance(total_copies, bool) or total_copies <= 0:
+        return "Total copies must be a positive integer."
+    
+    return None
 
 def add_book_to_catalog(title: str, author: str, isbn: str, total_copies: int) -> Tuple[bool, str]:
     """
@@ -27,23 +84,9 @@ def add_book_to_catalog(title: str, author: str, isbn: str, total_copies: int) -
         tuple: (success: bool, message: str)
     """
     # Input validation
-    if not title or not title.strip():
-        return False, "Title is required."
-    
-    if len(title.strip()) > 200:
-        return False, "Title must be less than 200 characters."
-    
-    if not author or not author.strip():
-        return False, "Author is required."
-    
-    if len(author.strip()) > 100:
-        return False, "Author must be less than 100 characters."
-    
-    if len(isbn) != 13:
-        return False, "ISBN must be exactly 13 digits."
-    
-    if not isinstance(total_copies, int) or total_copies <= 0:
-        return False, "Total copies must be a positive integer."
+    error = validate_book_fields(title, author, isbn, total_copies)
+    if error:
+        return False, error
     
     # Check for duplicate ISBN
     existing = get_book_by_isbn(isbn)
@@ -57,6 +100,61 @@ def add_book_to_catalog(title: str, author: str, isbn: str, total_copies: int) -
     else:
         return False, "Database error occurred while adding the book."
 
+def import_books_to_catalog(records: Iterable[Tuple[int, Dict]], batch_size: int = 1000) -> Dict:
+    """
+    Bulk-add books to the catalog.
+    
+    Each record is validated with the same rules as add_book_to_catalog, then
+    books are inserted in chunked transactions; ISBNs already in the catalog
+    (or repeated within a chunk) are rejected per row.
+    
+    Args:
+        records: (line_number, fields) pairs; fields is a dict with title, author,
+            isbn and total_copies (anything else is rejected as malformed)
+        batch_size: Books inserted per transaction
+        
+    Returns:
+        dict: 'imported' count, 'rejected' list of (line_number, reason), 'seconds'
+    """
+    start = time.perf_counter()
+    imported = 0
+    rejected = []
+    chunk = []
+    
+    def flush():
+        nonlocal imported
+        skipped = insert_books_batch([book for _, book in chunk])
+        for position in skipped:
+            rejected.append((chunk[position][0], "A book with this ISBN already exists."))
+        imported += len(chunk) - len(skipped)
+        chunk.clear()
+    
+    for line_number, fields in records:
+        if not isinstance(fields, dict):
+            rejected.append((line_number, "Malformed record."))
+            continue
+        title = fields.get('title') or ''
+        author = fields.get('author') or ''
+        isbn = str(fields.get('isbn') or '').strip()
+        total_copies = fields.get('total_copies')
+        # CSV values arrive as text; anything else must already be an int (no 2.7 -> 2, True -> 1)
+        if isinstance(total_copies, str) and total_copies.strip().isdigit():
+            total_copies = int(total_copies)
+        
+        error = validate_book_fields(title, author, isbn, total_copies)
+        if error:
+            rejected.append((line_number, error))
+            continue
+        
+        chunk.append((line_number, (title.strip(), author.strip(), isbn, total_copies, total_copies)))
+        if len(chunk) >= batch_size:
+            flush()
+    if chunk:
+        flush()
+    
+    rejected.sort()
+    return {'imported': imported, 'rejected': rejected, 'seconds': time.perf_counter() - start}
+
 def borrow_book_by_patron(patron_id: str, book_id: int) -> Tuple[bool, str]:
     """
     Allow a patron to borrow a book.
@@ -73,73 +171,356 @@ def borrow_book_by_patron(patron_id: str, book_id: int) -> Tuple[bool, str]:
     if not patron_id or not patron_id.isdigit() or len(patron_id) != 6:
         return False, "Invalid patron ID. Must be exactly 6 digits."
     
-    # Check if book exists and is available
-    book = get_book_by_id(book_id)
-    if not book:
-        return False, "Book not found."
+    # Create borrow record
+    borrow_date = datetime.now()
+    due_date = borrow_date + timedelta(days=14)
     
-    if book['available_copies'] <= 0:
-        return False, "This book is currently not available."
+    # Availability check, limit check, record insert and copy update in one transaction
+    status, book = borrow_book_transaction(patron_id, book_id, borrow_date, due_date)
     
-    # Check patron's current borrowed books count
-    current_borrowed = get_patron_borrow_count(patron_id)
+    if status == 'not_found':
+        return False, "Book not found."
     
-    if current_borrowed > 5:
-        return False, "You have reached the maximum borrowing limit of 5 books."
+    if status == 'unavailable':
+        return False, "This book is currently not available."
     
-    # Create borrow record
-    borrow_date = datetime.now()
-    due_date = borrow_date + timedelta(days=14)
+    if status == 'limit_reached':
+        return False, f"You have reached the maximum borrowing limit of {MAX_BORROWED_BOOKS} books."
     
-    # Insert borrow record and update availability
-    borrow_success = insert_borrow_record(patron_id, book_id, borrow_date, due_date)
-    if not borrow_success:
+    if status != 'borrowed':
         return False, "Database error occurred while creating borrow record."
     
-    availability_success = update_book_availability(book_id, -1)
-    if not availability_success:
-        return False, "Database error occurred while updating book availability."
-    
     return True, f'Successfully borrowed "{book["title"]}". Due date: {due_date.strftime("%Y-%m-%d")}.'
 
 def return_book_by_patron(patron_id: str, book_id: int) -> Tuple[bool, str]:
     """
     Process book return by a patron.
+    Implements R4 as per requirements
     
-    TODO: Implement R4 as per requirements
+    Args:
+        patron_id: 6-digit library card ID
+        book_id: ID of the book to return
+        
+    Returns:
+        tuple: (success: bool, message: str)
     """
-    return False, "Book return functionality is not yet implemented."
+    # Validate patron ID
+    if not patron_id or not patron_id.isdigit() or len(patron_id) != 6:
+        return False, "Invalid patron ID. Must be exactly 6 digits."
+    
+    # Close the loan and restore availability in one transaction
+    return_date = datetime.now()
+    status, loan = return_book_transaction(patron_id, book_id, return_date)
+    
+    if status == 'not_borrowed':
+        return False, "This book is not currently borrowed by this patron."
+    
+    if status != 'returned':
+        return False, "Database error occurred while processing the return."
+    
+    # Late fee comes from the loan row the transaction just closed
+    fee_amount, days_overdue = compute_late_fee(from_epoch(loan['due_date']), return_date)
+    message = f'Successfully returned "{loan["title"]}".'
+    if fee_amount > 0:
+        return True, f"{message} Late fee owed: ${fee_amount:.2f} ({days_overdue} days overdue)."
+    return True, f"{message} No late fees owed."
 
 def calculate_late_fee_for_book(patron_id: str, book_id: int) -> Dict:
     """
     Calculate late fees for a specific book.
+    Implements R5 as per requirements
     
-    TODO: Implement R5 as per requirements 
+    Uses the patron's open loan of the book (fee accrued so far), or else
+    their most recent return (fee assessed at return).
     
-    
-    return { // return the calculated values
-        'fee_amount': 0.00,
-        'days_overdue': 0,
-        'status': 'Late fee calculation not implemented'
+    Args:
+        patron_id: 6-digit library card ID
+        book_id: ID of the borrowed book
+        
+    Returns:
+        dict: 'fee_amount', 'days_overdue' and 'status'
+    """
+    if not patron_id or not patron_id.isdigit() or len(patron_id) != 6:
+        return {'fee_amount': 0.00, 'days_overdue': 0, 'status': 'Invalid patron ID'}
+    
+    loan = get_loan_for_fee(patron_id, book_id)
+    if not loan:
+        return {'fee_amount': 0.00, 'days_overdue': 0, 'status': 'No borrow record found'}
+    
+    fee_amount, days_overdue = compute_late_fee(from_epoch(loan['due_date']),
+                                                 from_epoch(loan['return_date']) or datetime.now())
+    return {
+        'fee_amount': fee_amount,
+        'days_overdue': days_overdue,
+        'status': 'Overdue' if days_overdue > 0 else 'Not overdue'
     }
+
+def calculate_late_fees_bulk(patron_id: Optional[str] = None, as_of: Optional[datetime] = None,
+                             loans: Optional[Iterable[Tuple]] = None) -> Dict:
+    """
+    Calculate accrued late fees for all open loans in one pass.
+    
+    Loans are streamed from the database into NumPy arrays and the fee rule
+    is evaluated over the whole batch, for reports and nightly jobs.
+    
+    Args:
+        patron_id: Only this patron's loans (all patrons if None)
+        as_of: Time to compute fees at (default: now)
+        loans: Open loans already read by the caller, as iter_open_loans rows
+            (default: stream them from the database)
+        
+    Returns:
+        dict: Parallel arrays 'loan_id', 'patron_id', 'book_id', 'days_overdue',
+        'fee_amount', plus the 'total' fee
     """
+    import numpy as np  # imported on first use to keep app startup light
+    
+    as_of = as_of or datetime.now()
+    # Rows go from the cursor straight into one structured array, never a list of tuples
+    if loans is None:
+        loans = iter_open_loans(patron_id)
+    loans = np.fromiter(loans, dtype=OPEN_LOAN_DTYPE)
+    
+    fees, days = compute_late_fees(loans['due_date'], to_epoch(as_of))
+    return {
+        'loan_id': loans['loan_id'],
+        'patron_id': loans['patron_id'],
+        'book_id': loans['book_id'],
+        'days_overdue': days,
+        'fee_amount': fees,
+        'total': round(float(fees.sum()), 2)
+    }
 
-def search_books_in_catalog(search_term: str, search_type: str) -> List[Dict]:
+def search_books_in_catalog(search_term: str, search_type: str, limit: int = SEARCH_DEFAULT_LIMIT,
+                            offset: int = 0) -> List[Dict]:
     """
     Search for books in the catalog.
+    Implements R6 as per requirements
     
-    TODO: Implement R6 as per requirements
+    Args:
+        search_term: Text to search for
+        search_type: 'title' or 'author' (partial, case-insensitive) or 'isbn' (exact)
+        limit: Maximum number of results (capped at SEARCH_MAX_LIMIT)
+        offset: Number of results to skip
+        
+    Returns:
+        list: Matching books, best matches first, in the catalog row format
     """
+    search_term = (search_term or '').strip()
+    if not search_term:
+        return []
+    
+    limit = max(1, min(limit, SEARCH_MAX_LIMIT))
+    offset = max(0, offset)
+    
+    if search_type == 'isbn':
+        # Exact match through the unique ISBN index
+        book = get_book_by_isbn(search_term)
+        return [book] if book and offset == 0 else []
+    
+    if search_type not in ('title', 'author'):
+        return []
     
-    return []
+    return search_books(search_term, search_type, limit, offset)
 
-def get_patron_status_report(patron_id: str) -> Dict:
+def get_patron_status_report(patron_id: str, history_before: Optional[int] = None,
+                             history_limit: int = HISTORY_PAGE_SIZE) -> Dict:
     """
     Get status report for a patron.
+    Implements R7 as per requirements
+    
+    Built from a fixed number of set-based queries regardless of how many
+    books the patron has: open loans joined to books, the patron's counters,
+    and one page of history. Fees still accruing on open loans are computed
+    in one vectorized pass; fees from returned loans come from the
+    materialized total kept up to date by the database.
+    
+    Args:
+        patron_id: 6-digit library card ID
+        history_before: History cursor from a previous report (older loans)
+        history_limit: Loans per history page
+        
+    Returns:
+        dict: 'borrowed_books' (with per-book fees), 'borrowed_count',
+        'total_late_fees', 'history' and 'history_next_cursor';
+        or {'error': message} for an invalid patron ID
+    """
+    if not patron_id or not patron_id.isdigit() or len(patron_id) != 6:
+        return {'error': "Invalid patron ID. Must be exactly 6 digits."}
+    
+    now = to_epoch(datetime.now())
+    borrowed_books = get_patron_borrowed_books(patron_id, now)
+    open_fees = calculate_late_fees_bulk(patron_id, from_epoch(now), loans=(
+        (loan.id, patron_id, loan.book_id, loan.due_date) for loan in borrowed_books))
+    # Open loans are capped at MAX_BORROWED_BOOKS, so these few become dicts carrying the fees
+    borrowed_books = [dict(loan, is_overdue=bool(loan.is_overdue), fee_amount=fee, days_overdue=days)
+                      for loan, fee, days in zip(borrowed_books, open_fees['fee_amount'].tolist(),
+                                                 open_fees['days_overdue'].tolist())]
+    
+    counters = get_patron_counters(patron_id)
+    
+    history = get_patron_history(patron_id, history_before, history_limit, now)
+    return {
+        'patron_id': patron_id,
+        'borrowed_books': borrowed_books,
+        'borrowed_count': len(borrowed_books),
+        'total_late_fees': round(open_fees['total'] + counters['total_fees_owed'], 2),
+        'history': history['loans'],
+        'history_next_cursor': history['next_cursor']
+    }
+
+
+def _default_payment_gateway():
+    """The configured gateway API client, or the simulated gateway, behind the circuit breaker and bulkhead."""
+    return guard_payment_gateway(get_payment_client() or PaymentGateway())
+
+
+def _default_async_payment_gateway():
+    """The configured gateway's AsyncPaymentClient, or the simulated gateway on a thread, behind the circuit breaker and bulkhead."""
+    return guard_async_payment_gateway(get_async_payment_client() or ThreadedAsyncGateway(PaymentGateway()))
+
+
+def _idempotent(key: str, call: Callable[[], Tuple], in_progress: Tuple,
+                record: Optional[Callable[[Tuple], None]] = None) -> Tuple:
+    """
+    Make a payment gateway call at most once per idempotency key.
+    
+    Successful results are stored and replayed to duplicate requests (double
+    submits, client retries) until they expire; a duplicate arriving while
+    the first call is still running gets in_progress. Failed calls release
+    the key so they can be retried.
     
-    TODO: Implement R7 as per requirements
+    Once the gateway has accepted the call the key is never released: the
+    result is stored before record writes it to the local ledger. If that
+    write fails it is logged, and record runs again when a duplicate request
+    replays the result, so record must be safe to repeat.
     """
-    return {}
+    claimed, stored = claim_idempotency_key(key)
+    if not claimed:
+        if stored is None:
+            return in_progress
+        result = tuple(stored)
+        if record and result[0]:
+            _record_result(key, record, result)
+        return result
+    try:
+        result = call()
+    except BaseException:
+        release_idempotency_key(key)
+        raise
+    if not result[0]:
+        release_idempotency_key(key)
+        return result
+    save_idempotency_result(key, list(result))
+    if record:
+        _record_result(key, record, result)
+    return result
+
+
+async def _idempotent_async(key: str, call: Callable[[], Awaitable[Tuple]], in_progress: Tuple,
+                            record: Optional[Callable[[Tuple], None]] = None) -> Tuple:
+    """_idempotent for an awaited gateway call; key and ledger writes run on the SQLite thread pool."""
+    claimed, stored = await run_db(claim_idempotency_key, key)
+    if not claimed:
+        if stored is None:
+            return in_progress
+        result = tuple(stored)
+        if record and result[0]:
+            await run_db(_record_result, key, record, result)
+        return result
+    try:
+        result = await call()
+    except BaseException:
+        await run_db(release_idempotency_key, key)
+        raise
+    if not result[0]:
+        await run_db(release_idempotency_key, key)
+        return result
+    await run_db(save_idempotency_result, key, list(result))
+    if record:
+        await run_db(_record_result, key, record, result)
+    return result
+
+
+def _record_result(key: str, record: Callable[[Tuple], None], result: Tuple):
+    """Write an accepted gateway call to the ledger; a failure leaves it for the next replay."""
+    try:
+        record(result)
+    except Exception:
+        logger.exception("Recording gateway result for %s failed; it is retried on replay", key)
+
+
+def _prepare_late_fee_payment(patron_id: str, book_id: int) -> Tuple[Optional[Tuple], Optional[Dict]]:
+    """
+    Work out the charge pay_late_fees makes for a book (database reads only).
+    
+    Returns:
+        tuple: (failure result, None) when there is nothing to charge, else
+        (None, dict with 'amount', 'description', idempotency 'key' and the
+        'record' callback that writes an accepted charge to the ledgers)
+    """
+    # Validate patron ID
+    if not patron_id or not patron_id.isdigit() or len(patron_id) != 6:
+        return (False, "Invalid patron ID. Must be exactly 6 digits.", None), None
+    
+    # Calculate late fee first
+    fee_info = calculate_late_fee_for_book(patron_id, book_id)
+    
+    # Check if there's a fee to pay
+    if not fee_info or 'fee_amount' not in fee_info:
+        return (False, "Unable to calculate late fees.", None), None
+    
+    fee_amount = fee_info.get('fee_amount', 0.0)
+    
+    if fee_amount <= 0:
+        return (False, "No late fees to pay for this book.", None), None
+    
+    # Only charge what is still owed on the loan (it may have been paid per book or in a batch)
+    loan = get_loan_for_fee(patron_id, book_id)
+    if loan and loan['paid'] > 0:
+        fee_amount = round(fee_amount - loan['paid'], 2)
+        if fee_amount <= 0:
+            return (False, "Late fees for this book have already been paid.", None), None
+    
+    # Get book details for payment description
+    book = get_book_by_id(book_id)
+    if not book:
+        return (False, "Book not found.", None), None
+    
+    description = f"Late fees for '{book['title']}'"
+    
+    def record(result):
+        transaction_id = result[2]
+        record_payment(transaction_id, patron_id, fee_amount, description)
+        # Ledger the payment so batch settlement does not charge this loan again
+        if loan:
+            record_fee_payments(patron_id, [(loan['id'], book_id, fee_amount)], transaction_id)
+    
+    return None, {
+        'amount': fee_amount,
+        'description': description,
+        # The same fee (book and days overdue) is charged once; retries get the first result
+        'key': f"pay:{patron_id}:{book_id}:{fee_info.get('days_overdue', 0)}:{fee_amount:.2f}",
+        'record': record
+    }
+
+
+def _payment_result(success: bool, transaction_id: str, message: str) -> Tuple[bool, str, Optional[str]]:
+    """Turn a gateway's process_payment answer into a pay_late_fees result."""
+    if success:
+        return True, f"Payment successful! {message}", transaction_id
+    return False, f"Payment failed: {message}", None
+
+
+def _payment_error(error: Exception) -> Tuple[bool, str, None]:
+    """Turn an exception from the gateway into a pay_late_fees result."""
+    if isinstance(error, PaymentGatewayError):
+        # Gateway down, slow or shed by the circuit breaker/bulkhead
+        return False, str(error), None
+    return False, f"Payment processing error: {str(error)}", None
+
+
+PAYMENT_IN_PROGRESS = (False, "A payment for this fee is already in progress.", None)
 
 
 def pay_late_fees(patron_id: str, book_id: int, payment_gateway: PaymentGateway = None) -> Tuple[bool, str, Optional[str]]:
@@ -163,51 +544,156 @@ def pay_late_fees(patron_id: str, book_id: int, payment_gateway: PaymentGateway
         mock_gateway.process_payment.return_value = (True, "txn_123", "Success")
         success, msg, txn = pay_late_fees("123456", 1, mock_gateway)
     """
-    # Validate patron ID
+    failure, payment = _prepare_late_fee_payment(patron_id, book_id)
+    if failure:
+        return failure
+    
+    # Use provided gateway, else the configured or simulated gateway behind the circuit breaker
+    if payment_gateway is None:
+        payment_gateway = _default_payment_gateway()
+    
+    # Process payment through external gateway
+    # THIS IS WHAT YOU SHOULD MOCK IN THEIR TESTS!
+    def charge():
+        try:
+            return _payment_result(*payment_gateway.process_payment(
+                patron_id=patron_id,
+                amount=payment['amount'],
+                description=payment['description']
+            ))
+        except Exception as e:
+            return _payment_error(e)
+    
+    return _idempotent(payment['key'], charge, PAYMENT_IN_PROGRESS, payment['record'])
+
+
+async def pay_late_fees_async(patron_id: str, book_id: int, payment_gateway=None) -> Tuple[bool, str, Optional[str]]:
+    """
+    pay_late_fees for asyncio callers (the ASGI API).
+    
+    Database work runs on the SQLite thread pool and the gateway call is
+    awaited, so a payment waiting on the gateway holds no thread.
+    
+    Args:
+        patron_id: 6-digit library card ID
+        book_id: ID of the book with late fees
+        payment_gateway: asyncio gateway (e.g. AsyncPaymentClient); defaults
+            to the configured one behind the circuit breaker and bulkhead
+        
+    Returns:
+        tuple: (success: bool, message: str, transaction_id: Optional[str])
+    """
+    failure, payment = await run_db(_prepare_late_fee_payment, patron_id, book_id)
+    if failure:
+        return failure
+    
+    if payment_gateway is None:
+        payment_gateway = _default_async_payment_gateway()
+    
+    async def charge():
+        try:
+            return _payment_result(*await payment_gateway.process_payment(
+                patron_id=patron_id,
+                amount=payment['amount'],
+                description=payment['description']
+            ))
+        except Exception as e:
+            return _payment_error(e)
+    
+    return await _idempotent_async(payment['key'], charge, PAYMENT_IN_PROGRESS, payment['record'])
+
+
+def pay_all_late_fees(patron_id: str, payment_gateway: PaymentGateway = None) -> Tuple[bool, str, Optional[str]]:
+    """
+    Pay all of a patron's outstanding late fees with a single charge.
+    
+    Sums the unpaid fee of every returned loan (each capped per R5), charges
+    the total once, and records one ledger line per loan so each book's fee
+    is marked paid.
+    
+    Args:
+        patron_id: 6-digit library card ID
+        payment_gateway: Payment gateway instance (injectable for testing)
+        
+    Returns:
+        tuple: (success: bool, message: str, transaction_id: Optional[str])
+    """
     if not patron_id or not patron_id.isdigit() or len(patron_id) != 6:
         return False, "Invalid patron ID. Must be exactly 6 digits.", None
     
-    # Calculate late fee first
-    fee_info = calculate_late_fee_for_book(patron_id, book_id)
+    fees = get_outstanding_fees(patron_id)
+    total = round(sum(fee['amount'] for fee in fees), 2)
+    if total <= 0:
+        return False, "No late fees to pay.", None
     
-    # Check if there's a fee to pay
-    if not fee_info or 'fee_amount' not in fee_info:
-        return False, "Unable to calculate late fees.", None
+    if payment_gateway is None:
+        payment_gateway = _default_payment_gateway()
+    
+    description = f"Late fees for {len(fees)} book(s)"
+    def charge():
+        try:
+            success, transaction_id, message = payment_gateway.process_payment(
+                patron_id=patron_id,
+                amount=total,
+                description=description
+            )
+        except PaymentGatewayError as e:
+            return False, str(e), None
+        except Exception as e:
+            return False, f"Payment processing error: {str(e)}", None
+        
+        if not success:
+            return False, f"Payment failed: {message}", None
+        return True, f"Payment successful! {message}", transaction_id
     
-    fee_amount = fee_info.get('fee_amount', 0.0)
+    def record(result):
+        transaction_id = result[2]
+        record_payment(transaction_id, patron_id, total, description)
+        record_fee_payments(patron_id, [(fee['loan_id'], fee['book_id'], fee['amount']) for fee in fees],
+                            transaction_id)
     
-    if fee_amount <= 0:
-        return False, "No late fees to pay for this book.", None
+    line_items = ','.join(f"{fee['loan_id']}={fee['amount']:.2f}" for fee in fees)
+    key = f"pay_all:{patron_id}:{hashlib.sha256(line_items.encode()).hexdigest()[:32]}"
+    return _idempotent(key, charge, (False, "A payment for these fees is already in progress.", None), record)
+
+
+def settle_outstanding_fees(max_workers: int = 4, payment_gateway: PaymentGateway = None) -> Dict:
+    """
+    Settle every patron's outstanding late fees (nightly job).
     
-    # Get book details for payment description
-    book = get_book_by_id(book_id)
-    if not book:
-        return False, "Book not found.", None
+    Patrons owing fees come from the materialized patron counters; each is
+    charged once via pay_all_late_fees, at most max_workers at a time. Fees
+    still accruing on open loans are not charged, but their total is computed
+    in one vectorized pass for the job summary.
     
-    # Use provided gateway or create new one
+    Args:
+        max_workers: Patrons settled concurrently
+        payment_gateway: Payment gateway instance shared by all charges
+        
+    Returns:
+        dict: 'settled' (patron count), 'failed' ([(patron_id, message)]),
+        'accruing' (fees on open loans) and 'seconds'
+    """
+    start = time.perf_counter()
     if payment_gateway is None:
-        payment_gateway = PaymentGateway()
-    
-    # Process payment through external gateway
-    # THIS IS WHAT YOU SHOULD MOCK IN THEIR TESTS!
-    try:
-        success, transaction_id, message = payment_gateway.process_payment(
-            patron_id=patron_id,
-            amount=fee_amount,
-            description=f"Late fees for '{book['title']}'"
-        )
-        
-        if success:
-            return True, f"Payment successful! {message}", transaction_id
-        else:
-            return False, f"Payment failed: {message}", None
-            
-    except Exception as e:
-        # Handle payment gateway errors
-        return False, f"Payment processing error: {str(e)}", None
+        # Share the circuit breaker, but size the bulkhead to this job's workers
+        payment_gateway = guard_payment_gateway(get_payment_client() or PaymentGateway(),
+                                                bulkhead=Bulkhead(max(1, max_workers)))
+    patron_ids = get_patrons_owing_fees()
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        results = list(executor.map(lambda patron_id: pay_all_late_fees(patron_id, payment_gateway), patron_ids))
+    
+    failed = [(patron_id, message) for patron_id, (success, message, _) in zip(patron_ids, results) if not success]
+    return {
+        'settled': len(patron_ids) - len(failed),
+        'failed': failed,
+        'accruing': calculate_late_fees_bulk()['total'],
+        'seconds': time.perf_counter() - start
+    }
 
 
-def refund_late_fee_payment(transaction_id: str, amount: float, payment_gateway: PaymentGateway = None) -> Tuple[bool, str]:
+def refund_late_fee_payment(transaction_id: str, amount: float, payment_gateway: PaymentGateway = None,
+                            refund_id: Optional[str] = None) -> Tuple[bool, str]:
     """
     Refund a late fee payment (e.g., if book was returned on time but fees were charged in error).
     
@@ -217,6 +703,8 @@ def refund_late_fee_payment(transaction_id: str, amount: float, payment_gateway:
         transaction_id: Original transaction ID to refund
         amount: Amount to refund
         payment_gateway: Payment gateway instance (injectable for testing)
+        refund_id: Caller's ID for this refund; a retry with the same ID gets
+            the first result. Without one every call is a new refund.
         
     Returns:
         tuple: (success: bool, message: str)
@@ -228,22 +716,137 @@ def refund_late_fee_payment(transaction_id: str, amount: float, payment_gateway:
     if amount <= 0:
         return False, "Refund amount must be greater than 0."
     
-    if amount > 15.00:  # Maximum late fee per book
-        return False, "Refund amount exceeds maximum late fee."
-    
-    # Use provided gateway or create new one
+    # Use provided gateway, else the configured or simulated gateway behind the circuit breaker
     if payment_gateway is None:
-        payment_gateway = PaymentGateway()
+        payment_gateway = _default_payment_gateway()
     
     # Process refund through external gateway
     # THIS IS WHAT YOU SHOULD MOCK IN YOUR TESTS!
-    try:
-        success, message = payment_gateway.refund_payment(transaction_id, amount)
+    def refund():
+        # A charge in the fee ledger (possibly for several books) can be refunded
+        # up to what is left of it; any other charge covered one book's fee.
+        # Checked once the key is claimed, so a retried refund still replays.
+        refundable = get_refundable_amount(transaction_id)
+        if refundable is None:
+            if amount > MAX_LATE_FEE:  # Maximum late fee per book
+                return False, "Refund amount exceeds maximum late fee."
+        elif round(amount, 2) > refundable:
+            return False, f"Refund amount exceeds the ${refundable:.2f} left on this payment."
         
-        if success:
-            return True, message
-        else:
-            return False, f"Refund failed: {message}"
+        try:
+            success, message = payment_gateway.refund_payment(transaction_id, amount)
             
-    except Exception as e:
-        return False, f"Refund processing error: {str(e)}"
+            if success:
+                return True, message
+            else:
+                return False, f"Refund failed: {message}"
+                
+        except PaymentGatewayError as e:
+            return False, str(e)
+        except Exception as e:
+            return False, f"Refund processing error: {str(e)}"
+    
+    def record(result):
+        # Refunded fees count as owed again
+        reverse_fee_payments(transaction_id, amount, key)
+
+    # Two refunds of the same amount from one charge are different refunds
+    key = f"refund:{transaction_id}:{refund_id or uuid.uuid4().hex}"
+    return _idempotent(key, refund, (False, "A refund for this payment is already in progress."), record)
+
+
+def verify_payment(transaction_id: str, payment_gateway: PaymentGateway = None) -> Dict:
+    """
+    Check the status of a payment transaction.
+    
+    Payments in the local ledger with a final status (settled by the
+    reconciliation worker) are answered from the ledger. Other completed
+    transactions never change either, so their status is stored and
+    answered locally on later checks instead of asking the gateway again.
+    
+    Args:
+        transaction_id: Transaction ID to check
+        payment_gateway: Payment gateway instance (injectable for testing)
+        
+    Returns:
+        dict: Payment status information from the ledger or the gateway
+    """
+    payment = get_payment(transaction_id)
+    if payment and payment['status'] in PAYMENT_FINAL_STATUSES:
+        return payment
+    
+    key = f"verify:{transaction_id}"
+    cached = get_idempotency_result(key)
+    if cached is not None:
+        return cached
+    
+    if payment_gateway is None:
+        payment_gateway = _default_payment_gateway()
+    try:
+        status = payment_gateway.verify_payment_status(transaction_id)
+    except PaymentGatewayError as e:
+        return {"status": "unknown", "message": str(e)}
+    if payment:
+        update_payment_statuses([(transaction_id, _ledger_status(status))])
+    if status.get('status') == 'completed':
+        save_idempotency_result(key, status)
+    return status
+
+
+# Ledger statuses that the gateway will not change again
+PAYMENT_FINAL_STATUSES = ('completed', 'failed', 'refunded')
+
+
+def _ledger_status(gateway_status: Dict) -> str:
+    """Map a gateway status record to a payments ledger status."""
+    status = gateway_status.get('status')
+    if status in PAYMENT_FINAL_STATUSES:
+        return status
+    if status == 'not_found':
+        return 'failed'
+    return 'pending'
+
+
+def get_payment_status(transaction_id: str) -> Optional[Dict]:
+    """
+    Get a payment from the local ledger, without calling the gateway.
+    
+    Returns:
+        dict: Ledger row ('status' is 'pending' until reconciled), or None if unknown
+    """
+    return get_payment(transaction_id)
+
+
+def reconcile_pending_payments(batch_size: int = 50, payment_gateway: PaymentGateway = None) -> Dict:
+    """
+    Check one batch of pending ledger payments with the gateway and store their status.
+    
+    Payments checked least recently go first. The batch is claimed in the
+    ledger first, so concurrent reconcilers never check the same payment.
+    If the gateway becomes unavailable mid-batch the rest of the batch is
+    left for a later run, once its claim lapses.
+    
+    Args:
+        batch_size: Maximum payments checked
+        payment_gateway: Payment gateway instance (injectable for testing)
+        
+    Returns:
+        dict: 'checked' (payments the gateway answered for) and 'settled' (now final)
+    """
+    pending = claim_pending_payments(batch_size)
+    if not pending:
+        return {'checked': 0, 'settled': 0}
+    
+    if payment_gateway is None:
+        payment_gateway = _default_payment_gateway()
+    updates = []
+    for transaction_id in pending:
+        try:
+            updates.append((transaction_id, _ledger_status(payment_gateway.verify_payment_status(transaction_id))))
+        except PaymentGatewayError:
+            break
+    update_payment_statuses(updates)
+    return {
+        'checked': len(updates),
+        'settled': sum(1 for _, status in updates if status != 'pending')
+    }
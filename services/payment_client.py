@@ -0,0 +1,313 @@
+"""
+Payment Client Module - HTTP client for the external payment gateway API
+
+PaymentClient is interchangeable with PaymentGateway (same methods and
+return values) but talks to a real gateway over one pooled keep-alive
+session with per-call timeouts. AsyncPaymentClient makes the same calls as
+coroutines over a pooled httpx.AsyncClient, so asyncio callers (the ASGI
+app) hold no thread while a payment is in flight. Both clients share the
+same response handling; PaymentClient is the blocking one for the WSGI app
+and CLI jobs.
+"""
+
+import asyncio
+import os
+import threading
+import weakref
+from typing import Callable, Dict, Optional, Tuple, Union
+
+# Gateway endpoint; when unset, pay/refund fall back to the simulated PaymentGateway
+PAYMENT_URL = os.environ.get('LIBRARY_PAYMENT_URL')
+PAYMENT_API_KEY = os.environ.get('LIBRARY_PAYMENT_API_KEY', 'test_key_12345')
+
+# (connect, read) timeouts in seconds for every gateway call
+PAYMENT_TIMEOUT = (float(os.environ.get('LIBRARY_PAYMENT_CONNECT_TIMEOUT', '2')),
+                   float(os.environ.get('LIBRARY_PAYMENT_READ_TIMEOUT', '5')))
+
+# Keep-alive connections held open to the gateway
+PAYMENT_MAX_CONNECTIONS = int(os.environ.get('LIBRARY_PAYMENT_MAX_CONNECTIONS', '10'))
+
+Timeout = Union[float, Tuple[float, float]]
+
+
+class PaymentGatewayError(Exception):
+    """The gateway could not be reached or did not answer in time."""
+
+
+def _response_body(status_code: int, read_json: Callable[[], Dict]) -> Dict:
+    """
+    Get a gateway response's JSON body, with 'error' set on a 4xx decline.
+
+    Server errors (5xx) raise PaymentGatewayError: the gateway is failing,
+    not declining, so the circuit breaker counts them like a timeout.
+    """
+    if status_code >= 500:
+        raise PaymentGatewayError(f"Payment gateway returned HTTP {status_code}")
+    try:
+        body = read_json()
+    except ValueError:
+        body = {}
+    if status_code >= 400 and 'error' not in body:
+        body['error'] = f"Payment gateway returned HTTP {status_code}"
+    return body
+
+
+def _charge_result(body: Dict, amount: float) -> Tuple[bool, str, str]:
+    if 'error' in body:
+        return False, "", body['error']
+    return True, body['id'], body.get('message', f"Payment of ${amount:.2f} processed successfully")
+
+
+def _refund_result(body: Dict, amount: float) -> Tuple[bool, str]:
+    if 'error' in body:
+        return False, body['error']
+    return True, body.get('message', f"Refund of ${amount:.2f} processed successfully")
+
+
+def _status_result(status_code: int, body: Dict) -> Dict:
+    if status_code == 404:
+        return {"status": "not_found", "message": "Transaction not found"}
+    if 'error' in body:
+        return {"status": "unknown", "message": body['error']}
+    return body
+
+
+class PaymentClient:
+    """
+    Blocking client for the payment gateway's REST API.
+
+    All calls share one requests.Session, so connections are reused instead
+    of opened per payment, and every call is bounded by a timeout. Declines
+    (4xx) are returned as (False, ..., message) like PaymentGateway; transport
+    failures and server errors (5xx) raise PaymentGatewayError.
+    """
+
+    def __init__(self, base_url: str, api_key: str = PAYMENT_API_KEY,
+                 timeout: Timeout = PAYMENT_TIMEOUT, max_connections: int = PAYMENT_MAX_CONNECTIONS):
+        """
+        Args:
+            base_url: Gateway API root, e.g. https://api.payment-gateway.example.com
+            api_key: API key sent as a bearer token
+            timeout: Default (connect, read) timeout in seconds
+            max_connections: Keep-alive connections kept in the pool
+        """
+        # requests is only needed once a gateway is configured, not at app startup
+        import requests
+        from requests.adapters import HTTPAdapter
+        
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.session = requests.Session()
+        self.session.headers['Authorization'] = f"Bearer {api_key}"
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_connections)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def _request(self, method: str, path: str, payload: Optional[Dict] = None,
+                 timeout: Optional[Timeout] = None) -> Tuple[int, Dict]:
+        """Make one API call; returns (HTTP status, JSON body)."""
+        import requests
+        
+        try:
+            response = self.session.request(method, self.base_url + path, json=payload,
+                                            timeout=timeout or self.timeout)
+        except requests.Timeout as e:
+            raise PaymentGatewayError("Payment gateway timed out") from e
+        except requests.RequestException as e:
+            raise PaymentGatewayError(f"Payment gateway unreachable: {e}") from e
+        return response.status_code, _response_body(response.status_code, response.json)
+
+    def process_payment(self, patron_id: str, amount: float, description: str = "",
+                        timeout: Optional[Timeout] = None) -> Tuple[bool, str, str]:
+        """
+        Charge a patron.
+
+        Returns:
+            tuple: (success: bool, transaction_id: str, message: str)
+        """
+        status, body = self._request('POST', '/charges', {
+            'customer_id': patron_id,
+            'amount': amount,
+            'currency': 'usd',
+            'description': description
+        }, timeout)
+        return _charge_result(body, amount)
+
+    def refund_payment(self, transaction_id: str, amount: float,
+                       timeout: Optional[Timeout] = None) -> Tuple[bool, str]:
+        """
+        Refund a previous charge.
+
+        Returns:
+            tuple: (success: bool, message: str)
+        """
+        status, body = self._request('POST', '/refunds', {
+            'transaction_id': transaction_id,
+            'amount': amount
+        }, timeout)
+        return _refund_result(body, amount)
+
+    def verify_payment_status(self, transaction_id: str, timeout: Optional[Timeout] = None) -> Dict:
+        """
+        Look up a charge.
+
+        Returns:
+            dict: Gateway status record, or {'status': 'not_found' | 'unknown', 'message': ...}
+        """
+        status, body = self._request('GET', f"/charges/{transaction_id}", timeout=timeout)
+        return _status_result(status, body)
+
+    def close(self):
+        """Close pooled connections."""
+        self.session.close()
+
+
+def _httpx_timeout(timeout: Timeout):
+    """Convert a requests-style timeout (seconds, or (connect, read)) for httpx."""
+    import httpx
+
+    if isinstance(timeout, tuple):
+        connect, read = timeout
+        return httpx.Timeout(read, connect=connect)
+    return httpx.Timeout(timeout)
+
+
+class AsyncPaymentClient:
+    """
+    asyncio client for the payment gateway's REST API.
+
+    Same calls, return values and errors as PaymentClient, as coroutines.
+    All calls share one httpx.AsyncClient, so connections are reused, and
+    a call waiting on the gateway holds no thread: many payments can be in
+    flight from one event loop. The client belongs to the loop it is first
+    used on.
+    """
+
+    def __init__(self, base_url: str, api_key: str = PAYMENT_API_KEY,
+                 timeout: Timeout = PAYMENT_TIMEOUT, max_connections: int = PAYMENT_MAX_CONNECTIONS):
+        """
+        Args:
+            base_url: Gateway API root, e.g. https://api.payment-gateway.example.com
+            api_key: API key sent as a bearer token
+            timeout: Default (connect, read) timeout in seconds
+            max_connections: Connections open to the gateway at once (kept alive)
+        """
+        # httpx is only needed once a gateway is configured, not at app startup
+        import httpx
+
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.client = httpx.AsyncClient(
+            base_url=self.base_url,
+            headers={'Authorization': f"Bearer {api_key}"},
+            timeout=_httpx_timeout(timeout),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        )
+
+    async def _request(self, method: str, path: str, payload: Optional[Dict] = None,
+                       timeout: Optional[Timeout] = None) -> Tuple[int, Dict]:
+        """Make one API call; returns (HTTP status, JSON body)."""
+        import httpx
+
+        try:
+            response = await self.client.request(method, path, json=payload,
+                                                 timeout=_httpx_timeout(timeout or self.timeout))
+        except httpx.TimeoutException as e:
+            raise PaymentGatewayError("Payment gateway timed out") from e
+        except httpx.HTTPError as e:
+            raise PaymentGatewayError(f"Payment gateway unreachable: {e}") from e
+        return response.status_code, _response_body(response.status_code, response.json)
+
+    async def process_payment(self, patron_id: str, amount: float, description: str = "",
+                              timeout: Optional[Timeout] = None) -> Tuple[bool, str, str]:
+        """See PaymentClient.process_payment."""
+        status, body = await self._request('POST', '/charges', {
+            'customer_id': patron_id,
+            'amount': amount,
+            'currency': 'usd',
+            'description': description
+        }, timeout)
+        return _charge_result(body, amount)
+
+    async def refund_payment(self, transaction_id: str, amount: float,
+                             timeout: Optional[Timeout] = None) -> Tuple[bool, str]:
+        """See PaymentClient.refund_payment."""
+        status, body = await self._request('POST', '/refunds', {
+            'transaction_id': transaction_id,
+            'amount': amount
+        }, timeout)
+        return _refund_result(body, amount)
+
+    async def verify_payment_status(self, transaction_id: str, timeout: Optional[Timeout] = None) -> Dict:
+        """See PaymentClient.verify_payment_status."""
+        status, body = await self._request('GET', f"/charges/{transaction_id}", timeout=timeout)
+        return _status_result(status, body)
+
+    async def aclose(self):
+        """Close pooled connections."""
+        await self.client.aclose()
+
+
+class ThreadedAsyncGateway:
+    """
+    asyncio interface to a blocking gateway (the simulated PaymentGateway,
+    used when no gateway URL is configured): each call runs in a thread.
+    """
+
+    def __init__(self, gateway):
+        self.gateway = gateway
+
+    async def process_payment(self, *args, **kwargs):
+        return await asyncio.to_thread(self.gateway.process_payment, *args, **kwargs)
+
+    async def refund_payment(self, *args, **kwargs):
+        return await asyncio.to_thread(self.gateway.refund_payment, *args, **kwargs)
+
+    async def verify_payment_status(self, *args, **kwargs):
+        return await asyncio.to_thread(self.gateway.verify_payment_status, *args, **kwargs)
+
+
+_client: Optional[PaymentClient] = None
+_client_lock = threading.Lock()
+
+def get_payment_client() -> Optional[PaymentClient]:
+    """Get the process-wide PaymentClient, or None if no gateway URL is configured."""
+    global _client
+    if not PAYMENT_URL:
+        return None
+    with _client_lock:
+        if _client is None or _client.base_url != PAYMENT_URL.rstrip('/'):
+            if _client is not None:
+                _client.close()
+            _client = PaymentClient(PAYMENT_URL)
+        return _client
+
+def close_payment_client():
+    """Close the process-wide PaymentClient (it is recreated on next use)."""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+
+# One AsyncPaymentClient per event loop (httpx connections cannot move between loops)
+_async_clients = weakref.WeakKeyDictionary()
+
+def get_async_payment_client() -> Optional[AsyncPaymentClient]:
+    """Get the running event loop's AsyncPaymentClient, or None if no gateway URL is configured."""
+    if not PAYMENT_URL:
+        return None
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.base_url != PAYMENT_URL.rstrip('/'):
+        client = _async_clients[loop] = AsyncPaymentClient(PAYMENT_URL)
+    return client
+
+async def close_async_payment_client():
+    """Close the running event loop's AsyncPaymentClient (it is recreated on next use)."""
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
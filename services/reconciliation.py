@@ -0,0 +1,71 @@
+"""
+Reconciliation Module - Worker that settles pending payments
+
+Charges are added to the payments ledger as pending when the gateway
+accepts them. This worker polls the gateway for pending transactions in
+batches and stores their final status, so status reads are answered from
+the local ledger instead of a blocking gateway call per request.
+
+Web and CLI processes never start it on their own: run one dedicated
+`flask reconcile-payments --loop` process, or `flask reconcile-payments`
+from cron.
+"""
+
+import logging
+import os
+import threading
+from typing import Dict, Optional
+
+from services.library_service import reconcile_pending_payments
+
+# Seconds between reconciliation runs of `flask reconcile-payments --loop`
+RECONCILE_INTERVAL = float(os.environ.get('LIBRARY_RECONCILE_INTERVAL', '30'))
+
+# Pending payments checked per batch
+RECONCILE_BATCH_SIZE = int(os.environ.get('LIBRARY_RECONCILE_BATCH_SIZE', '50'))
+
+logger = logging.getLogger(__name__)
+
+
+class ReconciliationWorker(threading.Thread):
+    """
+    Daemon thread that runs reconcile_pending_payments every `interval`
+    seconds, draining full batches back to back, until stop() is called.
+    """
+
+    def __init__(self, interval: float = RECONCILE_INTERVAL, batch_size: int = RECONCILE_BATCH_SIZE,
+                 payment_gateway=None):
+        super().__init__(name='payment-reconciliation', daemon=True)
+        self.interval = interval
+        self.batch_size = batch_size
+        self.payment_gateway = payment_gateway
+        self.runs = 0
+        self.last_result: Optional[Dict] = None
+        self._stop_event = threading.Event()
+
+    def run_once(self) -> Dict:
+        """Reconcile until the pending backlog is drained or the gateway stops answering."""
+        total = {'checked': 0, 'settled': 0}
+        while not self._stop_event.is_set():
+            result = reconcile_pending_payments(self.batch_size, self.payment_gateway)
+            total['checked'] += result['checked']
+            total['settled'] += result['settled']
+            # A short or unproductive batch means there is nothing more to do right now
+            if result['checked'] < self.batch_size or result['settled'] == 0:
+                break
+        self.runs += 1
+        self.last_result = total
+        return total
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("Payment reconciliation failed")
+
+    def stop(self, timeout: Optional[float] = None):
+        """Ask the worker to exit and wait for it."""
+        self._stop_event.set()
+        if self.is_alive():
+            self.join(timeout)
@@ -0,0 +1,259 @@
+"""
+Resilience Module - Circuit breaker and bulkhead for payment gateway calls
+
+A slow or failing gateway must not tie up every web worker. The bulkhead
+caps how many gateway calls run at once and rejects the rest immediately;
+the circuit breaker watches recent calls and, once too many fail or run
+slow, rejects calls outright until a probe shows the gateway has recovered.
+Both raise PaymentGatewayError subclasses, which callers already treat as
+"gateway unavailable".
+"""
+
+import math
+import os
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+from services.payment_client import PaymentGatewayError
+
+# Open the circuit when this fraction of recent calls failed or ran slow
+BREAKER_FAILURE_RATE = float(os.environ.get('LIBRARY_PAYMENT_BREAKER_FAILURE_RATE', '0.5'))
+
+# A call taking longer than this (seconds) counts against the gateway even if it succeeded
+BREAKER_SLOW_CALL = float(os.environ.get('LIBRARY_PAYMENT_BREAKER_SLOW_CALL', '2'))
+
+# Recent calls considered, and how many are needed before the circuit can open
+BREAKER_WINDOW = int(os.environ.get('LIBRARY_PAYMENT_BREAKER_WINDOW', '20'))
+BREAKER_MIN_CALLS = int(os.environ.get('LIBRARY_PAYMENT_BREAKER_MIN_CALLS', '5'))
+
+# Seconds the circuit stays open before a probe call is let through
+BREAKER_RESET_TIMEOUT = float(os.environ.get('LIBRARY_PAYMENT_BREAKER_RESET_TIMEOUT', '30'))
+
+# Gateway calls allowed in flight at once (keep below the web worker thread count)
+BULKHEAD_MAX_CONCURRENT = int(os.environ.get('LIBRARY_PAYMENT_MAX_CONCURRENT', '4'))
+
+
+class CircuitOpenError(PaymentGatewayError):
+    """The circuit breaker is open; the gateway is not being called."""
+
+
+class BulkheadFullError(PaymentGatewayError):
+    """Every gateway call slot is busy."""
+
+
+class CircuitBreaker:
+    """
+    Failure-rate and latency circuit breaker.
+
+    closed: calls pass; outcomes are kept for the last `window` calls, and
+    once at least `min_calls` are recorded and the share of failed or slow
+    ones reaches `failure_rate`, the circuit opens.
+    open: calls raise CircuitOpenError until `reset_timeout` has passed.
+    half_open: up to `half_open_calls` probe calls pass; a good probe closes
+    the circuit, a failed or slow one opens it again.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_rate: float = BREAKER_FAILURE_RATE, slow_call_seconds: float = BREAKER_SLOW_CALL,
+                 window: int = BREAKER_WINDOW, min_calls: int = BREAKER_MIN_CALLS,
+                 reset_timeout: float = BREAKER_RESET_TIMEOUT, half_open_calls: int = 1,
+                 clock: Callable[[], float] = time.monotonic):
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.min_calls = min_calls
+        self.reset_timeout = reset_timeout
+        self.half_open_calls = half_open_calls
+        self.clock = clock
+        self.state = self.CLOSED
+        self._outcomes = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._probes = 0
+        self._lock = threading.Lock()
+        self.calls = self.failures = self.slow_calls = self.rejected = 0
+        self.transitions = Counter()
+
+    def _transition(self, state: str):
+        """Move to state and count the transition (lock held)."""
+        self.transitions[f"{self.state}->{state}"] += 1
+        self.state = state
+        self._outcomes.clear()
+        self._probes = 0
+        if state == self.OPEN:
+            self._opened_at = self.clock()
+
+    def _admit(self):
+        """Let a call through or raise CircuitOpenError."""
+        with self._lock:
+            if self.state == self.OPEN:
+                remaining = self.reset_timeout - (self.clock() - self._opened_at)
+                if remaining > 0:
+                    self.rejected += 1
+                    raise CircuitOpenError(
+                        f"Payment service is temporarily unavailable. Please try again in {math.ceil(remaining)} seconds.")
+                self._transition(self.HALF_OPEN)
+            if self.state == self.HALF_OPEN:
+                if self._probes >= self.half_open_calls:
+                    self.rejected += 1
+                    raise CircuitOpenError("Payment service is recovering. Please try again shortly.")
+                self._probes += 1
+
+    def _record(self, failed: bool, slow: bool):
+        with self._lock:
+            self.calls += 1
+            self.failures += failed
+            self.slow_calls += slow
+            bad = failed or slow
+            if self.state == self.HALF_OPEN:
+                self._transition(self.OPEN if bad else self.CLOSED)
+            elif self.state == self.CLOSED:
+                self._outcomes.append(bad)
+                if (len(self._outcomes) >= self.min_calls
+                        and sum(self._outcomes) >= self.failure_rate * len(self._outcomes)):
+                    self._transition(self.OPEN)
+
+    def call(self, func: Callable, *args, **kwargs):
+        """Run func through the breaker; exceptions count as failures and are re-raised."""
+        self._admit()
+        start = self.clock()
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            self._record(failed=True, slow=False)
+            raise
+        self._record(failed=False, slow=self.clock() - start > self.slow_call_seconds)
+        return result
+
+    async def call_async(self, func: Callable, *args, **kwargs):
+        """call() for a coroutine function: await func through the breaker."""
+        self._admit()
+        start = self.clock()
+        try:
+            result = await func(*args, **kwargs)
+        except Exception:
+            self._record(failed=True, slow=False)
+            raise
+        self._record(failed=False, slow=self.clock() - start > self.slow_call_seconds)
+        return result
+
+    def stats(self) -> Dict:
+        """Current state plus call, rejection and state-transition counters."""
+        with self._lock:
+            return {
+                'state': self.state,
+                'calls': self.calls,
+                'failures': self.failures,
+                'slow_calls': self.slow_calls,
+                'rejected': self.rejected,
+                'transitions': dict(self.transitions)
+            }
+
+
+class Bulkhead:
+    """Bounded concurrency: at most max_concurrent calls run at once, extra calls are rejected."""
+
+    def __init__(self, max_concurrent: int = BULKHEAD_MAX_CONCURRENT, max_wait: float = 0.0):
+        """
+        Args:
+            max_concurrent: Calls allowed in flight
+            max_wait: Seconds a call may wait for a free slot before it is rejected
+        """
+        self.max_concurrent = max_concurrent
+        self.max_wait = max_wait
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self.active = self.rejected = 0
+
+    @contextmanager
+    def slot(self, wait: bool = True):
+        """
+        Hold a call slot for the duration of the block, or raise BulkheadFullError.
+
+        With wait=False a full bulkhead rejects at once instead of waiting
+        max_wait (event loop callers must not block).
+        """
+        if wait and self.max_wait > 0:
+            acquired = self._slots.acquire(timeout=self.max_wait)
+        else:
+            acquired = self._slots.acquire(False)
+        if not acquired:
+            with self._lock:
+                self.rejected += 1
+            raise BulkheadFullError("Payment service is busy. Please try again shortly.")
+        with self._lock:
+            self.active += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.active -= 1
+            self._slots.release()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {'max_concurrent': self.max_concurrent, 'active': self.active, 'rejected': self.rejected}
+
+
+class GuardedPaymentGateway:
+    """
+    A payment gateway (PaymentGateway or PaymentClient) whose calls pass
+    through a bulkhead and a circuit breaker. Same methods and return values
+    as the wrapped gateway; rejected calls raise CircuitOpenError or
+    BulkheadFullError.
+    """
+
+    def __init__(self, gateway, breaker: CircuitBreaker, bulkhead: Bulkhead):
+        self.gateway = gateway
+        self.breaker = breaker
+        self.bulkhead = bulkhead
+
+    def _call(self, method: str, *args, **kwargs):
+        with self.bulkhead.slot():
+            return self.breaker.call(getattr(self.gateway, method), *args, **kwargs)
+
+    def process_payment(self, *args, **kwargs):
+        return self._call('process_payment', *args, **kwargs)
+
+    def refund_payment(self, *args, **kwargs):
+        return self._call('refund_payment', *args, **kwargs)
+
+    def verify_payment_status(self, *args, **kwargs):
+        return self._call('verify_payment_status', *args, **kwargs)
+
+
+class AsyncGuardedPaymentGateway(GuardedPaymentGateway):
+    """
+    GuardedPaymentGateway for an asyncio gateway (AsyncPaymentClient): its
+    methods are coroutines, awaited through the same bulkhead and breaker.
+    """
+
+    async def _call(self, method: str, *args, **kwargs):
+        with self.bulkhead.slot(wait=False):
+            return await self.breaker.call_async(getattr(self.gateway, method), *args, **kwargs)
+
+
+# Shared by every request in the process, so they see the same gateway health
+payment_breaker = CircuitBreaker()
+payment_bulkhead = Bulkhead()
+
+
+def guard_payment_gateway(gateway, breaker: Optional[CircuitBreaker] = None,
+                          bulkhead: Optional[Bulkhead] = None) -> GuardedPaymentGateway:
+    """Wrap gateway with the process-wide (or given) circuit breaker and bulkhead."""
+    return GuardedPaymentGateway(gateway, breaker or payment_breaker, bulkhead or payment_bulkhead)
+
+
+def guard_async_payment_gateway(gateway, breaker: Optional[CircuitBreaker] = None,
+                                bulkhead: Optional[Bulkhead] = None) -> AsyncGuardedPaymentGateway:
+    """Wrap an asyncio gateway with the process-wide (or given) circuit breaker and bulkhead."""
+    return AsyncGuardedPaymentGateway(gateway, breaker or payment_breaker, bulkhead or payment_bulkhead)
+
+
+def payment_gateway_stats() -> Dict:
+    """Metrics for the process-wide payment circuit breaker and bulkhead."""
+    return {'circuit': payment_breaker.stats(), 'bulkhead': payment_bulkhead.stats()}
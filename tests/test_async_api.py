@@ -0,0 +1,188 @@
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+
+import database
+from database import get_payment
+from routes.async_api import create_asgi_app
+from services import payment_client
+
+
+async def _exchange(app, path, query="", headers=(), method="GET"):
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    await app({"type": "http", "method": method, "path": path, "query_string": query.encode(),
+               "headers": [(name.encode(), value.encode()) for name, value in headers],
+               "http_version": "1.1", "scheme": "http", "root_path": "",
+               "server": ("testserver", 80), "client": ("127.0.0.1", 1234)}, receive, send)
+    body = b"".join(message.get("body", b"") for message in messages[1:])
+    response_headers = {name.decode(): value.decode() for name, value in messages[0]["headers"]}
+    return messages[0]["status"], response_headers, body
+
+
+async def _request(app, path, query=""):
+    status, _, body = await _exchange(app, path, query)
+    return status, body
+
+
+def _get(app, path, query=""):
+    return asyncio.run(_request(app, path, query))
+
+
+def test_search_matches_flask_api(client):
+    status, body = _get(create_asgi_app(), "/api/search", "q=gatsby&type=title&limit=5")
+
+    assert status == 200
+    assert json.loads(body) == client.get("/api/search?q=gatsby&type=title&limit=5").get_json()
+    assert _get(create_asgi_app(), "/api/search")[0] == 400
+
+
+def test_search_supports_conditional_get(client):
+    app = create_asgi_app()
+    status, headers, body = asyncio.run(_exchange(app, "/api/search", "q=gatsby"))
+    flask_response = client.get("/api/search?q=gatsby")
+
+    assert status == 200
+    assert headers["etag"] == flask_response.headers["ETag"]
+    assert headers["cache-control"] == flask_response.headers["Cache-Control"]
+
+    status, headers, body = asyncio.run(_exchange(app, "/api/search", "q=gatsby",
+                                                  [("If-None-Match", headers["etag"])]))
+    assert (status, body) == (304, b"")
+    assert headers["etag"] == flask_response.headers["ETag"]
+
+    client.post("/borrow", data={"patron_id": "654321", "book_id": "1"})
+    status, _, body = asyncio.run(_exchange(app, "/api/search", "q=gatsby",
+                                            [("If-None-Match", headers["etag"])]))
+    assert status == 200 and json.loads(body)["count"] == 1
+
+    status, headers, _ = asyncio.run(_exchange(app, "/api/search"))
+    assert status == 400 and "etag" not in headers
+
+
+def test_search_304_does_not_query_books(client, mocker):
+    app = create_asgi_app()
+    etag = asyncio.run(_exchange(app, "/api/search", "q=gatsby"))[1]["etag"]
+    search = mocker.patch("routes.async_api.search_books_in_catalog")
+
+    assert asyncio.run(_exchange(app, "/api/search", "q=gatsby", [("If-None-Match", etag)]))[0] == 304
+    search.assert_not_called()
+
+
+def test_late_fee_status_codes(client):
+    app = create_asgi_app()
+    status, body = _get(app, "/api/late_fee/123456/3")
+    assert status == 200
+    assert json.loads(body) == client.get("/api/late_fee/123456/3").get_json()
+
+    assert _get(app, "/api/late_fee/12ab56/3")[0] == 400
+    assert _get(app, "/api/late_fee/654321/3")[0] == 404
+
+
+def test_late_fee_payment_matches_flask_api(client):
+    status, _, body = asyncio.run(_exchange(create_asgi_app(), "/api/late_fee/12ab56/1/payment", method="POST"))
+    response = client.post("/api/late_fee/12ab56/1/payment")
+
+    assert (status, json.loads(body)) == (response.status_code, response.get_json())
+    assert json.loads(body) == {"success": False, "message": "Invalid patron ID. Must be exactly 6 digits.",
+                                "transaction_id": None}
+
+
+def test_late_fee_payments_await_the_gateway(temp_db, late_book, payment_server, monkeypatch):
+    monkeypatch.setattr(payment_client, "PAYMENT_URL", payment_server.url)
+    payment_server.delay = 0.3
+    app = create_asgi_app()
+
+    async def pay():
+        try:
+            return await asyncio.gather(*(_exchange(app, f"/api/late_fee/{100000 + i}/7/payment", method="POST")
+                                          for i in range(4)))
+        finally:
+            await payment_client.close_async_payment_client()
+
+    start = time.perf_counter()
+    results = asyncio.run(pay())
+    elapsed = time.perf_counter() - start
+
+    assert [status for status, _, _ in results] == [200] * 4
+    transaction_ids = [json.loads(body)["transaction_id"] for _, _, body in results]
+    assert sorted(transaction_ids) == sorted(payment_server.charges)
+    assert all(get_payment(transaction_id)["status"] == "pending" for transaction_id in transaction_ids)
+    assert elapsed < 2 * 0.3   # the gateway calls overlapped
+
+
+def test_unrouted_paths_without_fallback_are_404(temp_db):
+    assert _get(create_asgi_app(), "/catalog")[0] == 404
+
+
+def test_many_requests_share_a_few_database_threads(temp_db, mocker):
+    threads = set()
+    lock = threading.Lock()
+
+    def slow_search(*args):
+        with lock:
+            threads.add(threading.current_thread().name)
+        time.sleep(0.02)
+        return []
+
+    mocker.patch("routes.async_api.search_books_in_catalog", side_effect=slow_search)
+    app = create_asgi_app()
+
+    async def many():
+        return await asyncio.gather(*(_request(app, "/api/search", f"q=book{i}") for i in range(100)))
+
+    start = time.perf_counter()
+    results = asyncio.run(many())
+    elapsed = time.perf_counter() - start
+
+    assert all(status == 200 for status, _ in results)
+    assert len(threads) <= database.DB_THREADS
+    assert all(name.startswith("sqlite") for name in threads)
+    assert elapsed < 100 * 0.02   # queries overlapped across the pool
+
+
+def test_other_paths_fall_through_to_flask(client):
+    pytest.importorskip("asgiref")
+    from app import create_app
+
+    status, body = _get(create_asgi_app(create_app()), "/catalog")
+    assert status == 200
+    assert b"<table" in body
+
+
+def test_flask_paths_are_served_concurrently(client, mocker):
+    pytest.importorskip("asgiref")
+    from app import create_app
+
+    threads = set()
+    lock = threading.Lock()
+    get_books_page = database.get_books_page
+
+    def slow_page(*args, **kwargs):
+        with lock:
+            threads.add(threading.current_thread().name)
+        time.sleep(0.3)
+        return get_books_page(*args, **kwargs)
+
+    mocker.patch("routes.catalog_routes.get_books_page", side_effect=slow_page)
+    app = create_asgi_app(create_app(), wsgi_threads=4)
+
+    async def concurrent():
+        return await asyncio.gather(*(_request(app, "/catalog") for _ in range(4)))
+
+    start = time.perf_counter()
+    results = asyncio.run(concurrent())
+    elapsed = time.perf_counter() - start
+
+    assert all(status == 200 for status, _ in results)
+    assert len(threads) == 4 and all(name.startswith("wsgi") for name in threads)
+    assert elapsed < 2 * 0.3   # not one request at a time
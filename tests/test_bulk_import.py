@@ -0,0 +1,122 @@
+import json
+
+import pytest
+
+from app import create_app
+from database import get_book_by_isbn, insert_book
+from services.library_service import import_books_to_catalog, validate_book_fields
+
+
+def _record(isbn, title="Imported", author="Vendor", copies="2"):
+    return {"title": title, "author": author, "isbn": isbn, "total_copies": copies}
+
+
+def test_validation_matches_add_book_rules():
+    assert validate_book_fields("T", "A", "1234567890123", 1) is None
+    assert validate_book_fields(" ", "A", "1234567890123", 1) == "Title is required."
+    assert validate_book_fields("T", "A", "123", 1) == "ISBN must be exactly 13 digits."
+    assert validate_book_fields("T", "A", "1234567890123", 0) == "Total copies must be a positive integer."
+    assert validate_book_fields("T", "A", "1234567890123", True) == "Total copies must be a positive integer."
+
+
+def test_import_inserts_valid_rows_and_reports_rejects(temp_db):
+    assert insert_book("Existing", "Author", "7000000000000", 1, 1)
+    records = [
+        (2, _record("7000000000001")),
+        (3, _record("7000000000000")),               # already in the catalog
+        (4, _record("7000000000002", title="")),     # invalid title
+        (5, _record("7000000000003", copies="two")),  # invalid copies
+        (6, _record("7000000000001")),               # repeated in the file
+        (7, None),                                   # malformed line
+        (8, _record("7000000000004")),
+    ]
+
+    result = import_books_to_catalog(records, batch_size=3)
+
+    assert result["imported"] == 2
+    assert result["rejected"] == [
+        (3, "A book with this ISBN already exists."),
+        (4, "Title is required."),
+        (5, "Total copies must be a positive integer."),
+        (6, "A book with this ISBN already exists."),
+        (7, "Malformed record."),
+    ]
+    book = get_book_by_isbn("7000000000004")
+    assert book["total_copies"] == book["available_copies"] == 2
+
+
+def test_copies_are_never_coerced(temp_db):
+    records = [
+        (1, _record("7200000000001", copies=2.7)),
+        (2, _record("7200000000002", copies=True)),
+        (3, _record("7200000000003", copies="2.7")),
+        (4, _record("7200000000004", copies=3)),
+        (5, _record("7200000000005", copies=" 4 ")),
+    ]
+
+    result = import_books_to_catalog(records)
+
+    assert result["imported"] == 2
+    assert [line for line, _ in result["rejected"]] == [1, 2, 3]
+    assert all(reason == "Total copies must be a positive integer." for _, reason in result["rejected"])
+    assert get_book_by_isbn("7200000000004")["total_copies"] == 3
+    assert get_book_by_isbn("7200000000005")["total_copies"] == 4
+
+
+def test_non_text_title_or_author_is_rejected_per_row(temp_db):
+    result = import_books_to_catalog([
+        (1, _record("7300000000001", title=1984)),
+        (2, {**_record("7300000000002"), "author": ["Orwell"]}),
+        (3, _record("7300000000003")),
+    ])
+
+    assert result["imported"] == 1
+    assert result["rejected"] == [(1, "Title must be text."), (2, "Author must be text.")]
+    assert get_book_by_isbn("7300000000003") is not None
+
+
+def test_duplicate_within_one_batch_keeps_first(temp_db):
+    result = import_books_to_catalog([
+        (1, _record("7100000000000", title="First")),
+        (2, _record("7100000000000", title="Second")),
+    ])
+    assert result["imported"] == 1
+    assert get_book_by_isbn("7100000000000")["title"] == "First"
+
+
+@pytest.fixture
+def runner(temp_db):
+    return create_app().test_cli_runner()
+
+
+def test_import_books_command_csv(runner, tmp_path):
+    path = tmp_path / "feed.csv"
+    path.write_text(
+        "title,author,isbn,total_copies\n"
+        "CSV Book,CSV Author,7200000000001,4\n"
+        "Bad,Row,72,1\n"
+    )
+
+    result = runner.invoke(args=["import-books", str(path)])
+
+    assert result.exit_code == 0
+    assert "Imported 1 books, rejected 1" in result.output
+    assert "rows/sec" in result.output
+    assert "line 3: ISBN must be exactly 13 digits." in result.output
+    assert get_book_by_isbn("7200000000001")["title"] == "CSV Book"
+
+
+def test_import_books_command_ndjson(runner, tmp_path):
+    path = tmp_path / "feed.ndjson"
+    path.write_text(
+        json.dumps(_record("7300000000001", copies=1)) + "\n"
+        "{not json\n"
+        + json.dumps(_record("7300000000002", title=1984, copies=1)) + "\n"
+    )
+
+    result = runner.invoke(args=["import-books", str(path), "--batch-size", "10"])
+
+    assert result.exit_code == 0
+    assert "line 2: Malformed record." in result.output
+    assert "line 3: Title must be text." in result.output
+    assert get_book_by_isbn("7300000000001") is not None
@@ -0,0 +1,51 @@
+import cache
+from cache import LRUCache
+
+
+def test_get_counts_hits_and_misses():
+    lru = LRUCache(maxsize=4)
+    lru.set("a", 1)
+
+    assert lru.get("a") == 1
+    assert lru.get("b") is None
+    assert lru.stats() == {"hits": 1, "misses": 1, "size": 1, "maxsize": 4}
+
+
+def test_least_recently_used_entry_is_evicted():
+    lru = LRUCache(maxsize=2)
+    lru.set("a", 1)
+    lru.set("b", 2)
+    lru.get("a")  # "b" is now the oldest
+    lru.set("c", 3)
+
+    assert lru.get("b") is None
+    assert lru.get("a") == 1
+    assert lru.get("c") == 3
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    lru = LRUCache(maxsize=2, ttl=10)
+    lru.set("a", 1)
+
+    now[0] = 109.0
+    assert lru.get("a") == 1
+    now[0] = 111.0
+    assert lru.get("a") is None
+    assert len(lru) == 0
+
+
+def test_stale_fill_after_invalidation_is_dropped():
+    lru = LRUCache(maxsize=2)
+    generation = lru.generation  # reader starts its database read
+    lru.invalidate("a")          # a writer commits and invalidates
+    lru.set("a", "old row", generation)
+
+    assert lru.get("a") is None
+
+
+def test_zero_size_cache_stores_nothing():
+    lru = LRUCache(maxsize=0)
+    lru.set("a", 1)
+    assert lru.get("a") is None
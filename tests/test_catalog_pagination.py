@@ -0,0 +1,95 @@
+import pytest
+
+from database import (
+    CATALOG_MAX_PAGE_SIZE, decode_catalog_cursor, get_books_page,
+    get_db_connection, insert_book,
+)
+
+
+@pytest.fixture
+def catalog(temp_db):
+    # Duplicate titles make sure the id tie-breaker keeps pages stable
+    for i in range(12):
+        assert insert_book(f"Title {i // 2:02d}", "Author", f"{5000000000000 + i}", 1, 1)
+
+
+def _keys(books):
+    return [(book["title"], book["id"]) for book in books]
+
+
+def _all_keys():
+    conn = get_db_connection()
+    rows = conn.execute("SELECT title, id FROM books ORDER BY title, id").fetchall()
+    conn.close()
+    return [tuple(row) for row in rows]
+
+
+def test_forward_pages_cover_catalog_in_order(catalog):
+    seen, cursor = [], None
+    while True:
+        page = get_books_page(after=cursor, limit=5)
+        seen.extend(_keys(page["books"]))
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == _all_keys()
+
+
+def test_first_and_last_page_cursors(catalog):
+    first = get_books_page(limit=5)
+    assert first["prev_cursor"] is None
+    assert first["next_cursor"] is not None
+
+    last = get_books_page(after=get_books_page(after=first["next_cursor"], limit=5)["next_cursor"], limit=5)
+    assert len(last["books"]) == 2
+    assert last["next_cursor"] is None
+    assert last["prev_cursor"] is not None
+
+
+def test_previous_cursor_returns_to_same_page(catalog):
+    first = get_books_page(limit=5)
+    second = get_books_page(after=first["next_cursor"], limit=5)
+    back = get_books_page(before=second["prev_cursor"], limit=5)
+
+    assert _keys(back["books"]) == _keys(first["books"])
+    assert back["prev_cursor"] is None
+    assert back["next_cursor"] == first["next_cursor"]
+
+
+def test_page_size_is_capped(catalog):
+    assert len(get_books_page(limit=10_000)["books"]) == 12
+    assert len(get_books_page(limit=0)["books"]) == 1
+    assert CATALOG_MAX_PAGE_SIZE == 200
+
+
+def test_malformed_cursor_is_rejected():
+    with pytest.raises(ValueError):
+        decode_catalog_cursor("not-a-cursor")
+
+
+def test_seek_uses_title_index(temp_db):
+    conn = get_db_connection()
+    plan = " | ".join(row["detail"] for row in conn.execute(
+        "EXPLAIN QUERY PLAN SELECT * FROM books WHERE (title, id) > (?, ?) ORDER BY title, id LIMIT 51",
+        ("M", 0),
+    ))
+    conn.close()
+    assert "idx_books_title_id" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+def test_catalog_route_pages_with_cursors(client):
+    first = client.get("/catalog?per_page=2")
+    assert first.status_code == 200
+    assert b"Next" in first.data
+    assert b"To Kill a Mockingbird" not in first.data  # third title alphabetically
+
+    last = client.get("/catalog?per_page=2&after=" + get_books_page(limit=2)["next_cursor"])
+    assert b"To Kill a Mockingbird" in last.data
+    assert b"Previous" in last.data
+
+
+def test_catalog_route_ignores_bad_cursor(client):
+    response = client.get("/catalog?after=garbage")
+    assert response.status_code == 200
+    assert b"1984" in response.data
@@ -0,0 +1,65 @@
+import pytest
+
+import database
+from database import catalog_row_cache, insert_book, update_book_availability
+
+
+@pytest.fixture
+def rows(client):
+    database.clear_book_cache()
+    yield client
+    database.clear_book_cache()
+
+
+def test_repeat_pages_reuse_rendered_rows(rows):
+    first = rows.get("/catalog")
+    misses = catalog_row_cache.stats()["misses"]
+    assert len(catalog_row_cache) == 3
+
+    again = rows.get("/catalog")
+    assert again.data == first.data
+    assert catalog_row_cache.stats()["misses"] == misses
+    assert catalog_row_cache.stats()["hits"] >= 3
+
+
+def test_markup_matches_uncached_render(rows):
+    cached_page = rows.get("/catalog").data
+    database.clear_book_cache()
+    assert rows.get("/catalog").data == cached_page
+    assert b"<tbody>" in cached_page and b"&lt;tr" not in cached_page
+
+
+def test_borrow_and_return_rerender_the_row(rows):
+    rows.get("/catalog")
+    book = database.get_book_by_id(1)
+
+    rows.post("/borrow", data={"patron_id": "654321", "book_id": "1"})
+    assert catalog_row_cache.get(1) is None
+    page = rows.get("/catalog").data
+    expected = f"{book.available_copies - 1}/{book.total_copies} Available".encode()
+    assert expected in page
+
+    rows.post("/return", data={"patron_id": "654321", "book_id": "1"})
+    page = rows.get("/catalog").data
+    assert f"{book.available_copies}/{book.total_copies} Available".encode() in page
+
+
+def test_fragment_of_an_older_row_is_not_served(rows):
+    rows.get("/catalog")
+    book, _ = catalog_row_cache.get(1)
+    stale = book.copy()
+    stale.available_copies = 0
+    catalog_row_cache.set(1, (stale, "<tr><td>stale</td></tr>"))
+
+    assert b"stale" not in rows.get("/catalog").data
+
+
+def test_added_book_gets_a_row(rows):
+    rows.get("/catalog")
+    assert insert_book("Fragment Book", "Author", "9780000000123", 1, 1)
+    assert b"Fragment Book" in rows.get("/catalog").data
+
+    book = database.get_book_by_isbn("9780000000123")
+    assert update_book_availability(book.id, -1)
+    page = rows.get("/catalog").data
+    assert b"Not Available" in page
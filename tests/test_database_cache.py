@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import database
+from database import (
+    book_cache, borrow_book_transaction, get_book_by_id, get_book_by_isbn,
+    insert_book, return_book_transaction, update_book_availability,
+)
+
+
+@pytest.fixture
+def cached_book(temp_db):
+    database.clear_book_cache()
+    assert insert_book("Cached", "Author", "4000000000001", 2, 2)
+    book = get_book_by_isbn("4000000000001")
+    yield book
+    database.clear_book_cache()
+
+
+def _forbid_queries(monkeypatch):
+    # Only the catalog version is read; the book row comes from memory
+    def fail(*args):
+        raise AssertionError("lookup should have been served from the cache")
+    monkeypatch.setattr(database, "query_records", fail)
+
+
+def test_repeat_lookups_are_served_from_memory(cached_book, monkeypatch):
+    get_book_by_id(cached_book["id"])
+    _forbid_queries(monkeypatch)
+
+    assert get_book_by_id(cached_book["id"])["title"] == "Cached"
+    assert get_book_by_isbn("4000000000001")["id"] == cached_book["id"]
+    assert book_cache.stats()["hits"] >= 2
+
+
+def test_callers_cannot_mutate_cached_rows(cached_book):
+    book = get_book_by_id(cached_book["id"])
+    book["available_copies"] = 99
+    assert get_book_by_id(cached_book["id"])["available_copies"] == 2
+
+
+def test_availability_update_invalidates(cached_book):
+    get_book_by_id(cached_book["id"])
+    assert update_book_availability(cached_book["id"], -1)
+    assert get_book_by_id(cached_book["id"])["available_copies"] == 1
+
+
+def test_borrow_and_return_invalidate(cached_book):
+    book_id = cached_book["id"]
+    now = datetime.now()
+    get_book_by_id(book_id)
+
+    assert borrow_book_transaction("123456", book_id, now, now + timedelta(days=14))[0] == "borrowed"
+    assert get_book_by_id(book_id)["available_copies"] == 1
+
+    assert return_book_transaction("123456", book_id, now)[0] == "returned"
+    assert get_book_by_id(book_id)["available_copies"] == 2
+
+
+def test_reinserted_isbn_is_not_served_stale(cached_book):
+    # Simulate the table being cleared and the ISBN reused by a new row
+    conn = database.get_db_connection()
+    conn.execute("DELETE FROM books")
+    conn.commit()
+    conn.close()
+    assert insert_book("Replacement", "Author", "4000000000001", 1, 1)
+
+    assert get_book_by_isbn("4000000000001")["title"] == "Replacement"
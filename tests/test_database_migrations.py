@@ -0,0 +1,142 @@
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+import database
+from database import get_db_connection, get_patron_counters, get_schema_version, run_migrations, to_epoch
+
+
+def _plan(conn, sql, params=()):
+    rows = conn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+    return " | ".join(row["detail"] for row in rows)
+
+
+def test_migrations_are_recorded_once(temp_db):
+    conn = get_db_connection()
+    try:
+        versions = [row["version"] for row in conn.execute("SELECT version FROM schema_version")]
+        assert versions == [m[0] for m in database.MIGRATIONS]
+        assert get_schema_version(conn) == database.MIGRATIONS[-1][0]
+
+        # Running again at the next startup is a no-op
+        assert run_migrations(conn) == []
+    finally:
+        conn.close()
+
+
+def test_legacy_iso_dates_are_converted_to_epoch(tmp_path, monkeypatch):
+    path = tmp_path / "legacy.db"
+    due = datetime(2025, 3, 1, 12, 0)
+    returned = due + timedelta(days=10, hours=2)
+    legacy = sqlite3.connect(path)
+    legacy.executescript('''
+        CREATE TABLE books (id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT NOT NULL,
+            author TEXT NOT NULL, isbn TEXT UNIQUE NOT NULL, total_copies INTEGER NOT NULL,
+            available_copies INTEGER NOT NULL);
+        CREATE TABLE borrow_records (id INTEGER PRIMARY KEY AUTOINCREMENT, patron_id TEXT NOT NULL,
+            book_id INTEGER NOT NULL, borrow_date TEXT NOT NULL, due_date TEXT NOT NULL, return_date TEXT);
+    ''')
+    legacy.executemany(
+        "INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date, return_date) VALUES (?, ?, ?, ?, ?)",
+        [("123456", 1, (due - timedelta(days=14)).isoformat(), due.isoformat(), returned.isoformat()),
+         ("123456", 2, (due - timedelta(days=14)).isoformat(), due.isoformat(), None)])
+    legacy.commit()
+    legacy.close()
+
+    monkeypatch.setattr(database, "DATABASE", str(path))
+    try:
+        database.init_database()
+        conn = get_db_connection()
+        rows = [tuple(row) for row in conn.execute(
+            "SELECT due_date, return_date, typeof(borrow_date) FROM borrow_records ORDER BY id")]
+        conn.close()
+        assert rows == [(to_epoch(due), to_epoch(returned), "integer"), (to_epoch(due), None, "integer")]
+        # 7 days at $0.50 + 3 days at $1.00, assessed during the backfill
+        assert get_patron_counters("123456") == {"open_loans": 1, "total_fees_owed": 6.5}
+    finally:
+        database.close_pool()
+
+
+def test_failed_migration_rolls_back(temp_db, monkeypatch):
+    current = database.MIGRATIONS[-1][0]
+    monkeypatch.setattr(database, "MIGRATIONS", database.MIGRATIONS + [
+        (current + 1, "Broken migration", [
+            "CREATE TABLE half_done (id INTEGER)",
+            "THIS IS NOT SQL",
+        ]),
+    ])
+    conn = get_db_connection()
+    try:
+        with pytest.raises(Exception):
+            run_migrations(conn)
+        assert get_schema_version(conn) == current
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        assert "half_done" not in tables
+    finally:
+        conn.close()
+
+
+def test_patron_borrow_count_uses_open_loan_index(temp_db):
+    conn = get_db_connection()
+    try:
+        plan = _plan(conn, '''
+            SELECT COUNT(*) as count FROM borrow_records 
+            WHERE patron_id = ? AND return_date IS NULL
+        ''', ("123456",))
+    finally:
+        conn.close()
+    assert "idx_borrow_records_open_patron" in plan
+    assert "SCAN borrow_records" not in plan
+
+
+def test_patron_borrowed_books_uses_open_loan_index(temp_db):
+    conn = get_db_connection()
+    try:
+        plan = _plan(conn, '''
+            SELECT br.*, b.title, b.author 
+            FROM borrow_records br 
+            JOIN books b ON br.book_id = b.id 
+            WHERE br.patron_id = ? AND br.return_date IS NULL
+            ORDER BY br.borrow_date
+        ''', ("123456",))
+    finally:
+        conn.close()
+    assert "idx_borrow_records_open_patron" in plan
+    assert "SCAN br" not in plan
+
+
+def test_return_update_does_not_scan_borrow_records(temp_db):
+    conn = get_db_connection()
+    try:
+        plan = _plan(conn, '''
+            UPDATE borrow_records 
+            SET return_date = ? 
+            WHERE patron_id = ? AND book_id = ? AND return_date IS NULL
+        ''', ("2024-01-01", "123456", 1))
+    finally:
+        conn.close()
+    assert "USING INDEX" in plan
+    assert "SCAN borrow_records" not in plan
+
+
+def test_open_loans_for_book_use_book_return_index(temp_db):
+    conn = get_db_connection()
+    try:
+        plan = _plan(conn, '''
+            SELECT COUNT(*) FROM borrow_records WHERE book_id = ? AND return_date IS NULL
+        ''', (1,))
+    finally:
+        conn.close()
+    assert "idx_borrow_records_book_return" in plan
+
+
+def test_overdue_scan_uses_due_date_index(temp_db):
+    conn = get_db_connection()
+    try:
+        plan = _plan(conn, '''
+            SELECT * FROM borrow_records WHERE due_date < ? AND return_date IS NULL
+        ''', ("2024-01-01",))
+    finally:
+        conn.close()
+    assert "idx_borrow_records_due_date" in plan
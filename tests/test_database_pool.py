@@ -0,0 +1,84 @@
+import sqlite3
+
+from flask import Flask
+
+import database
+from database import ConnectionPool, get_db_connection, get_pool
+
+
+def test_closed_connection_is_reused_by_next_call(temp_db):
+    conn = get_db_connection()
+    conn.execute("SELECT 1")
+    conn.close()
+
+    again = get_db_connection()
+    assert again is conn
+    again.close()
+
+
+def test_pool_keeps_at_most_size_idle_connections(temp_db):
+    pool = ConnectionPool(temp_db, size=2)
+    conns = [pool.acquire() for _ in range(4)]
+    assert len({id(c) for c in conns}) == 4
+
+    for conn in conns:
+        conn.close()
+
+    assert pool.idle_count() == 2
+    pool.close_all()
+    assert pool.idle_count() == 0
+
+
+def test_unhealthy_connection_is_replaced(temp_db):
+    pool = ConnectionPool(temp_db, size=1)
+    conn = pool.acquire()
+    conn.close()
+
+    # Break the idle connection behind the pool's back
+    sqlite3.Connection.close(conn)
+
+    fresh = pool.acquire()
+    assert fresh is not conn
+    assert fresh.execute("SELECT 1").fetchone()[0] == 1
+    fresh.close()
+    pool.close_all()
+
+
+def test_release_rolls_back_uncommitted_work(temp_db):
+    conn = get_db_connection()
+    conn.execute(
+        "INSERT INTO books (title, author, isbn, total_copies, available_copies) "
+        "VALUES ('Pending', 'Nobody', '0000000000001', 1, 1)"
+    )
+    conn.close()
+
+    conn = get_db_connection()
+    count = conn.execute("SELECT COUNT(*) FROM books").fetchone()[0]
+    conn.close()
+    assert count == 0
+
+
+def test_pool_follows_database_setting(temp_db, tmp_path, monkeypatch):
+    first = get_pool()
+    monkeypatch.setattr(database, "DATABASE", str(tmp_path / "other.db"))
+    second = get_pool()
+
+    assert second is not first
+    assert first.closed is True
+
+
+def test_request_scoped_connection_shared_until_teardown(temp_db):
+    app = Flask(__name__)
+    database.init_app(app)
+
+    with app.app_context():
+        conn = get_db_connection()
+        assert get_db_connection() is conn
+
+        # Helpers call close() after each statement; the connection stays checked out
+        conn.close()
+        assert get_db_connection() is conn
+        idle_during_request = get_pool().idle_count()
+
+    assert get_pool().idle_count() == idle_during_request + 1
+
@@ -0,0 +1,99 @@
+import sqlite3
+import threading
+
+import pytest
+
+import database
+from database import get_db_connection, get_storage_settings
+
+
+def _pragma(conn, name):
+    return conn.execute(f"PRAGMA {name}").fetchone()[0]
+
+
+def test_throughput_profile_is_applied_to_pooled_connections(temp_db, monkeypatch):
+    monkeypatch.setattr(database, "STORAGE_PROFILE", "throughput")
+    conn = get_db_connection()
+    try:
+        assert _pragma(conn, "journal_mode") == "wal"
+        assert _pragma(conn, "synchronous") == 1  # NORMAL
+        assert _pragma(conn, "cache_size") == -64000
+        assert _pragma(conn, "temp_store") == 2  # MEMORY
+        assert _pragma(conn, "busy_timeout") == 5000
+    finally:
+        conn.close()
+
+
+def test_durability_profile_fsyncs_every_commit(temp_db, monkeypatch):
+    monkeypatch.setattr(database, "STORAGE_PROFILE", "durability")
+    conn = get_db_connection()
+    try:
+        assert _pragma(conn, "journal_mode") == "wal"
+        assert _pragma(conn, "synchronous") == 2  # FULL
+        assert _pragma(conn, "mmap_size") == 0
+    finally:
+        conn.close()
+
+
+def test_overrides_win_over_profile(monkeypatch):
+    monkeypatch.setattr(database, "STORAGE_OVERRIDES", {"busy_timeout": 250})
+    settings = get_storage_settings("durability")
+    assert settings["busy_timeout"] == 250
+    assert settings["synchronous"] == "FULL"
+
+
+def test_unknown_profile_is_rejected():
+    with pytest.raises(ValueError):
+        get_storage_settings("turbo")
+
+
+def test_catalog_reads_do_not_block_on_borrow_write(temp_db):
+    """A reader still sees the catalog while a borrow holds the write lock."""
+    conn = get_db_connection()
+    conn.execute(
+        "INSERT INTO books (title, author, isbn, total_copies, available_copies) "
+        "VALUES ('Busy', 'Writer', '1111111111111', 2, 2)"
+    )
+    conn.commit()
+
+    conn.execute("BEGIN EXCLUSIVE")
+    conn.execute("UPDATE books SET available_copies = available_copies - 1")
+
+    result = {}
+
+    def read_catalog():
+        reader = sqlite3.connect(temp_db, timeout=0.1)
+        try:
+            result["rows"] = reader.execute("SELECT available_copies FROM books").fetchall()
+        except sqlite3.OperationalError as e:
+            result["error"] = e
+        finally:
+            reader.close()
+
+    reader_thread = threading.Thread(target=read_catalog)
+    reader_thread.start()
+    reader_thread.join()
+    conn.rollback()
+    conn.close()
+
+    assert "error" not in result
+    # The reader sees the last committed snapshot
+    assert result["rows"] == [(2,)]
+
+
+def test_rollback_journal_blocks_readers(tmp_path):
+    """Baseline: with SQLite defaults the same read fails with a lock error."""
+    path = str(tmp_path / "default.db")
+    writer = sqlite3.connect(path)
+    writer.execute("CREATE TABLE books (available_copies INTEGER)")
+    writer.execute("INSERT INTO books VALUES (2)")
+    writer.commit()
+    writer.execute("BEGIN EXCLUSIVE")
+    writer.execute("UPDATE books SET available_copies = 1")
+
+    reader = sqlite3.connect(path, timeout=0.1)
+    with pytest.raises(sqlite3.OperationalError):
+        reader.execute("SELECT available_copies FROM books").fetchall()
+    reader.close()
+    writer.rollback()
+    writer.close()
@@ -0,0 +1,131 @@
+import threading
+from datetime import datetime, timedelta
+
+from database import (
+    MAX_BORROWED_BOOKS, borrow_book_transaction, get_book_by_isbn,
+    get_db_connection, insert_book, return_book_transaction, to_epoch,
+)
+
+
+def _add_book(isbn, copies):
+    assert insert_book(f"Book {isbn}", "Author", isbn, copies, copies)
+    return get_book_by_isbn(isbn)["id"]
+
+
+def _borrow(patron_id, book_id):
+    now = datetime.now()
+    return borrow_book_transaction(patron_id, book_id, now, now + timedelta(days=14))
+
+
+def _open_loans(book_id):
+    conn = get_db_connection()
+    try:
+        return conn.execute(
+            "SELECT COUNT(*) FROM borrow_records WHERE book_id = ? AND return_date IS NULL",
+            (book_id,),
+        ).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def _run_concurrently(target, args_list):
+    results = []
+    lock = threading.Lock()
+    start = threading.Barrier(len(args_list))
+
+    def worker(args):
+        start.wait()
+        result = target(*args)
+        with lock:
+            results.append(result)
+
+    threads = [threading.Thread(target=worker, args=(args,)) for args in args_list]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def test_borrow_transaction_statuses(temp_db):
+    book_id = _add_book("1000000000001", 1)
+
+    status, book = _borrow("123456", book_id)
+    assert status == "borrowed"
+    assert book["title"] == "Book 1000000000001"
+
+    assert _borrow("654321", book_id)[0] == "unavailable"
+    assert _borrow("123456", 9999) == ("not_found", None)
+    assert get_book_by_isbn("1000000000001")["available_copies"] == 0
+
+
+def test_borrow_transaction_enforces_limit(temp_db):
+    book_id = _add_book("1000000000002", 10)
+
+    for _ in range(MAX_BORROWED_BOOKS):
+        assert _borrow("123456", book_id)[0] == "borrowed"
+
+    assert _borrow("123456", book_id)[0] == "limit_reached"
+    assert _open_loans(book_id) == MAX_BORROWED_BOOKS
+
+
+def test_concurrent_borrows_never_oversubscribe_copies(temp_db):
+    copies = 5
+    book_id = _add_book("1000000000003", copies)
+
+    patrons = [(f"{100000 + i}", book_id) for i in range(20)]
+    results = _run_concurrently(_borrow, patrons)
+
+    statuses = [status for status, _ in results]
+    assert statuses.count("borrowed") == copies
+    assert statuses.count("unavailable") == len(patrons) - copies
+    assert get_book_by_isbn("1000000000003")["available_copies"] == 0
+    assert _open_loans(book_id) == copies
+
+
+def test_concurrent_borrows_by_one_patron_respect_limit(temp_db):
+    book_ids = [_add_book(f"20000000000{i:02d}", 1) for i in range(10)]
+
+    results = _run_concurrently(_borrow, [("123456", book_id) for book_id in book_ids])
+
+    assert [status for status, _ in results].count("borrowed") == MAX_BORROWED_BOOKS
+    assert sum(_open_loans(book_id) for book_id in book_ids) == MAX_BORROWED_BOOKS
+
+
+def test_return_transaction_closes_loan_and_restores_copy(temp_db):
+    book_id = _add_book("3000000000001", 2)
+    _borrow("123456", book_id)
+
+    returned_at = datetime.now()
+    status, loan = return_book_transaction("123456", book_id, returned_at)
+
+    assert status == "returned"
+    assert loan["title"] == "Book 3000000000001"
+    assert loan["return_date"] == to_epoch(returned_at)
+    assert isinstance(loan["due_date"], int)
+    assert _open_loans(book_id) == 0
+    assert get_book_by_isbn("3000000000001")["available_copies"] == 2
+
+    assert return_book_transaction("123456", book_id, returned_at) == ("not_borrowed", None)
+
+
+def test_return_transaction_clamps_availability_at_total(temp_db):
+    book_id = _add_book("3000000000002", 1)
+    _borrow("123456", book_id)
+    conn = get_db_connection()
+    conn.execute("UPDATE books SET available_copies = total_copies WHERE id = ?", (book_id,))
+    conn.commit()
+    conn.close()
+
+    assert return_book_transaction("123456", book_id, datetime.now())[0] == "returned"
+    assert get_book_by_isbn("3000000000002")["available_copies"] == 1
+
+
+def test_concurrent_returns_of_one_loan_count_once(temp_db):
+    book_id = _add_book("3000000000003", 3)
+    _borrow("123456", book_id)
+
+    results = _run_concurrently(return_book_transaction, [("123456", book_id, datetime.now())] * 8)
+
+    assert [status for status, _ in results].count("returned") == 1
+    assert get_book_by_isbn("3000000000003")["available_copies"] == 3
@@ -0,0 +1,84 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+import database
+from database import insert_book, insert_borrow_record, iter_table_rows
+
+
+@pytest.fixture
+def books(temp_db):
+    for i in range(7):
+        assert insert_book(f"Export {i}", "Author, Jr.", f"{6000000000000 + i}", 2, 2)
+
+
+def test_rows_stream_across_batches(books):
+    rows = list(iter_table_rows("books", batch_size=3))
+    assert [row[1] for row in rows] == [f"Export {i}" for i in range(7)]
+    assert len(rows[0]) == len(database.EXPORT_COLUMNS["books"])
+
+
+def test_connection_is_returned_when_stream_is_abandoned(books):
+    pool = database.get_pool()
+    idle_before = pool.idle_count()
+
+    rows = iter_table_rows("books", batch_size=2)
+    next(rows)
+    assert pool.idle_count() == max(idle_before - 1, 0)
+    rows.close()
+
+    assert pool.idle_count() == max(idle_before, 1)
+
+
+def test_unknown_table_is_rejected():
+    with pytest.raises(ValueError):
+        next(iter_table_rows("sqlite_master"))
+
+
+def test_books_csv_export(client, books):
+    response = client.get("/api/export/books")
+    assert response.status_code == 200
+    assert response.is_streamed
+    assert response.mimetype == "text/csv"
+    assert "books.csv" in response.headers["Content-Disposition"]
+
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert len(rows) == 10  # 3 sample books + 7 added
+    assert rows[-1]["author"] == "Author, Jr."
+
+
+def test_borrow_records_ndjson_export(client):
+    due = datetime.now() + timedelta(days=14)
+    assert insert_borrow_record("654321", 1, datetime.now(), due)
+
+    response = client.get("/api/export/borrow_records?format=ndjson")
+    assert response.mimetype == "application/x-ndjson"
+
+    records = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [r["patron_id"] for r in records] == ["123456", "654321"]
+    assert records[0]["return_date"] is None
+
+
+@pytest.mark.parametrize("export_format", ["csv", "ndjson"])
+def test_borrow_records_export_dates_are_iso(client, export_format):
+    borrowed = datetime(2024, 3, 1, 9, 30)
+    due = borrowed + timedelta(days=14)
+    assert insert_borrow_record("654321", 1, borrowed, due)
+    assert database.return_book_transaction("654321", 1, datetime(2024, 3, 10, 17, 0))[0] == "returned"
+
+    body = client.get(f"/api/export/borrow_records?format={export_format}").get_data(as_text=True)
+    if export_format == "csv":
+        record = list(csv.DictReader(io.StringIO(body)))[-1]
+    else:
+        record = json.loads(body.splitlines()[-1])
+
+    assert (record["borrow_date"], record["due_date"], record["return_date"]) == (
+        "2024-03-01T09:30:00", "2024-03-15T09:30:00", "2024-03-10T17:00:00")
+
+
+def test_export_rejects_unknown_format_and_table(client):
+    assert client.get("/api/export/books?format=xml").status_code == 400
+    assert client.get("/api/export/patrons").status_code == 404
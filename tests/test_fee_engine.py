@@ -0,0 +1,62 @@
+import random
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from services.fee_engine import compute_late_fee, compute_late_fees
+from services.library_service import calculate_late_fee_for_book, calculate_late_fees_bulk
+
+
+def test_vectorized_fees_match_scalar_rule():
+    rng = random.Random(327)
+    as_of = datetime(2024, 6, 1, 12, 0)
+    due_dates = [as_of - timedelta(seconds=rng.randint(-10 * 86400, 40 * 86400)) for _ in range(500)]
+
+    fees, days = compute_late_fees([int(d.timestamp()) for d in due_dates], int(as_of.timestamp()))
+
+    expected = [compute_late_fee(d, as_of) for d in due_dates]
+    assert fees.tolist() == [fee for fee, _ in expected]
+    assert days.tolist() == [d for _, d in expected]
+
+
+def test_vectorized_fees_accept_per_loan_return_times():
+    due = np.array([0, 0, 0])
+    returned = np.array([3 * 86400, 10 * 86400, 100 * 86400])
+    fees, days = compute_late_fees(due, returned)
+    assert fees.tolist() == [1.5, 6.5, 15.0]
+    assert days.tolist() == [3, 10, 100]
+
+
+def test_late_fee_for_open_overdue_loan(book_id, overdue_loan):
+    overdue_loan("123456", book_id, 9)
+    result = calculate_late_fee_for_book("123456", book_id)
+    assert result == {"fee_amount": 5.5, "days_overdue": 9, "status": "Overdue"}
+
+
+def test_late_fee_without_record_or_with_bad_patron(book_id):
+    assert calculate_late_fee_for_book("654321", book_id)["status"] == "No borrow record found"
+    assert calculate_late_fee_for_book("12", book_id)["status"] == "Invalid patron ID"
+
+
+def test_bulk_fees_over_open_loans(book_id, overdue_loan):
+    overdue_loan("123456", book_id, 2)
+    overdue_loan("123456", book_id, -3)  # not yet due
+    overdue_loan("654321", book_id, 30)
+
+    everyone = calculate_late_fees_bulk()
+    assert everyone["fee_amount"].tolist() == [1.0, 0.0, 15.0]
+    assert everyone["total"] == 16.0
+
+    one = calculate_late_fees_bulk("654321")
+    assert one["patron_id"].tolist() == ["654321"]
+    assert one["days_overdue"].tolist() == [30]
+
+
+def test_late_fee_api(client, book_id, overdue_loan):
+    overdue_loan("123456", book_id, 1)
+
+    response = client.get(f"/api/late_fee/123456/{book_id}")
+    assert response.status_code == 200
+    assert response.get_json()["fee_amount"] == 0.5
+
+    assert client.get(f"/api/late_fee/999999/{book_id}").status_code == 404
@@ -0,0 +1,216 @@
+import threading
+import time
+from unittest.mock import Mock
+
+from app import create_app
+from database import (
+    get_db_connection, get_outstanding_fees, get_patron_counters, get_payment, rebuild_patron_counters
+)
+from services.library_service import (
+    pay_all_late_fees, pay_late_fees, refund_late_fee_payment, settle_outstanding_fees
+)
+from services.payment_client import PaymentClient
+from services.payment_service import PaymentGateway
+
+
+def _gateway(success=True):
+    gateway = Mock(spec=PaymentGateway)
+    gateway.process_payment.return_value = (True, "txn_batch", "Paid") if success else (False, "", "Declined")
+    return gateway
+
+
+def _ledger(patron_id):
+    conn = get_db_connection()
+    rows = conn.execute("SELECT book_id, amount, transaction_id FROM fee_payments WHERE patron_id = ? ORDER BY id",
+                        (patron_id,)).fetchall()
+    conn.close()
+    return [tuple(row) for row in rows]
+
+
+def test_batch_charges_all_books_once(book_ids, late_return):
+    late_return("123456", book_ids[0], 3)    # $1.50
+    late_return("123456", book_ids[1], 30)   # $15.00 (capped)
+    gateway = _gateway()
+
+    success, message, transaction_id = pay_all_late_fees("123456", gateway)
+
+    assert (success, transaction_id) == (True, "txn_batch")
+    gateway.process_payment.assert_called_once_with(
+        patron_id="123456", amount=16.5, description="Late fees for 2 book(s)")
+    assert _ledger("123456") == [(book_ids[0], 1.5, "txn_batch"), (book_ids[1], 15.0, "txn_batch")]
+    assert get_patron_counters("123456")["total_fees_owed"] == 0.0
+    assert rebuild_patron_counters(check_only=True) == []
+
+    assert pay_all_late_fees("123456", gateway) == (False, "No late fees to pay.", None)
+    assert gateway.process_payment.call_count == 1
+
+
+def test_batch_skips_fees_already_paid_per_book(book_ids, late_return):
+    late_return("123456", book_ids[0], 3)
+    late_return("123456", book_ids[1], 5)
+    assert pay_late_fees("123456", book_ids[0], _gateway())[0] is True
+
+    gateway = _gateway()
+    assert pay_all_late_fees("123456", gateway)[0] is True
+    assert gateway.process_payment.call_args.kwargs["amount"] == 2.5
+    assert get_outstanding_fees("123456") == []
+
+
+def test_per_book_payment_after_batch_does_not_charge_again(book_ids, late_return):
+    late_return("123456", book_ids[0], 30)   # $15.00
+    assert pay_all_late_fees("123456", _gateway())[0] is True
+
+    gateway = _gateway()
+    result = pay_late_fees("123456", book_ids[0], gateway)
+
+    assert result == (False, "Late fees for this book have already been paid.", None)
+    gateway.process_payment.assert_not_called()
+    assert get_patron_counters("123456")["total_fees_owed"] == 0.0
+    assert rebuild_patron_counters(check_only=True) == []
+
+
+def test_per_book_payment_charges_only_the_unpaid_rest(book_ids, overdue_loan):
+    overdue_loan("123456", book_ids[0], 3)
+    assert pay_late_fees("123456", book_ids[0], _gateway())[0] is True   # $1.50 while still out
+    conn = get_db_connection()
+    conn.execute("UPDATE borrow_records SET due_date = due_date - 4 * 86400 WHERE patron_id = '123456'")
+    conn.commit()
+    conn.close()
+
+    gateway = _gateway()
+    assert pay_late_fees("123456", book_ids[0], gateway)[0] is True   # now 7 days: $3.50
+    assert gateway.process_payment.call_args.kwargs["amount"] == 2.0
+
+
+def test_refund_reverses_ledger_lines(book_ids, late_return):
+    late_return("123456", book_ids[0], 3)    # $1.50
+    late_return("123456", book_ids[1], 30)   # $15.00
+    assert pay_all_late_fees("123456", _gateway())[0] is True
+    gateway = _gateway()
+    gateway.refund_payment.return_value = (True, "Refunded")
+
+    assert refund_late_fee_payment("txn_batch", 15.0, gateway, refund_id="r1")[0] is True
+    assert refund_late_fee_payment("txn_batch", 15.0, gateway, refund_id="r1")[0] is True   # replayed, not reversed twice
+
+    assert [(fee["book_id"], fee["amount"]) for fee in get_outstanding_fees("123456")] == [(book_ids[1], 15.0)]
+    assert get_patron_counters("123456")["total_fees_owed"] == 15.0
+    assert rebuild_patron_counters(check_only=True) == []
+    assert get_payment("txn_batch")["status"] == "pending"
+
+    assert refund_late_fee_payment("txn_batch", 1.5, gateway, refund_id="r2")[0] is True
+    assert get_patron_counters("123456")["total_fees_owed"] == 16.5
+    assert get_payment("txn_batch")["status"] == "refunded"
+
+
+def test_partial_refunds_of_the_same_amount_both_reverse(book_ids, late_return):
+    late_return("123456", book_ids[0], 5)    # $2.50
+    late_return("123456", book_ids[1], 5)    # $2.50
+    assert pay_all_late_fees("123456", _gateway())[0] is True
+    gateway = _gateway()
+    gateway.refund_payment.return_value = (True, "Refunded")
+
+    assert refund_late_fee_payment("txn_batch", 2.5, gateway, refund_id="book-1")[0] is True
+    assert refund_late_fee_payment("txn_batch", 2.5, gateway, refund_id="book-2")[0] is True
+
+    assert gateway.refund_payment.call_count == 2
+    assert get_patron_counters("123456")["total_fees_owed"] == 5.0
+    assert get_payment("txn_batch")["status"] == "refunded"
+
+
+def test_batch_charge_above_one_book_maximum_can_be_refunded_in_full(book_ids, late_return):
+    late_return("123456", book_ids[0], 30)   # $15.00
+    late_return("123456", book_ids[1], 9)    # $5.50
+    assert pay_all_late_fees("123456", _gateway())[0] is True
+    gateway = _gateway()
+    gateway.refund_payment.return_value = (True, "Refunded")
+
+    assert refund_late_fee_payment("txn_batch", 20.6, gateway) == (
+        False, "Refund amount exceeds the $20.50 left on this payment.")
+    assert refund_late_fee_payment("txn_batch", 20.5, gateway) == (True, "Refunded")
+    assert get_payment("txn_batch")["status"] == "refunded"
+    assert get_patron_counters("123456")["total_fees_owed"] == 20.5
+
+    assert refund_late_fee_payment("txn_batch", 0.5, gateway)[0] is False   # nothing left
+    gateway.refund_payment.assert_called_once_with("txn_batch", 20.5)
+
+
+def test_declined_batch_leaves_fees_outstanding(book_ids, late_return):
+    late_return("123456", book_ids[0], 3)
+
+    success, message, _ = pay_all_late_fees("123456", _gateway(success=False))
+
+    assert success is False
+    assert message == "Payment failed: Declined"
+    assert _ledger("123456") == []
+    assert [fee["amount"] for fee in get_outstanding_fees("123456")] == [1.5]
+
+
+def test_invalid_patron_id():
+    assert pay_all_late_fees("12ab56")[0] is False
+
+
+class _CountingGateway:
+    """Records how many charges are in flight at once."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.active = self.peak = 0
+        self.charges = []
+
+    def process_payment(self, patron_id, amount, description=""):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(0.05)
+        with self.lock:
+            self.active -= 1
+            self.charges.append((patron_id, amount))
+        return True, f"txn_{patron_id}", "Paid"
+
+
+def test_settlement_is_concurrent_but_bounded(book_ids, late_return):
+    patrons = [f"{100000 + i}" for i in range(6)]
+    for patron_id in patrons:
+        late_return(patron_id, book_ids[0], 2)
+        late_return(patron_id, book_ids[1], 2)
+    gateway = _CountingGateway()
+
+    result = settle_outstanding_fees(max_workers=3, payment_gateway=gateway)
+
+    assert result["settled"] == 6 and result["failed"] == []
+    assert sorted(gateway.charges) == [(patron_id, 2.0) for patron_id in patrons]
+    assert 1 < gateway.peak <= 3
+    assert all(get_patron_counters(patron_id)["total_fees_owed"] == 0.0 for patron_id in patrons)
+
+
+def test_settlement_reports_fees_accruing_on_open_loans(book_ids, late_return, overdue_loan):
+    late_return("123456", book_ids[0], 3)
+    overdue_loan("654321", book_ids[1], 9)   # still out
+
+    result = settle_outstanding_fees(max_workers=2, payment_gateway=_CountingGateway())
+
+    assert result["settled"] == 1
+    assert result["accruing"] == 5.5
+
+
+def test_settlement_against_gateway_api(book_ids, payment_server, late_return):
+    late_return("123456", book_ids[0], 3)
+    late_return("654321", book_ids[1], 9)
+    client = PaymentClient(payment_server.url)
+    try:
+        result = settle_outstanding_fees(max_workers=2, payment_gateway=client)
+    finally:
+        client.close()
+
+    assert result["settled"] == 2
+    assert sorted(payment_server.charges.values()) == [1.5, 5.5]
+
+
+def test_settle_fees_command(book_ids, mocker, late_return):
+    late_return("123456", book_ids[0], 3)
+    mocker.patch("services.library_service.PaymentGateway", return_value=_gateway(success=False))
+
+    result = create_app().test_cli_runner().invoke(args=["settle-fees", "--workers", "2"])
+
+    assert result.exit_code == 1
+    assert "patron 123456: Payment failed: Declined" in result.output
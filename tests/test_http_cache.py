@@ -0,0 +1,62 @@
+import pytest
+
+from database import get_catalog_version, insert_book, update_book_availability
+
+
+@pytest.mark.parametrize("path", ["/catalog", "/search?q=gatsby&type=title", "/api/search?q=gatsby"])
+def test_unchanged_catalog_answers_304(client, path):
+    first = client.get(path)
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    assert "must-revalidate" in first.headers["Cache-Control"]
+
+    again = client.get(path, headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.data == b""
+    assert again.headers["ETag"] == etag
+
+
+def test_304_does_not_run_the_view(client, mocker):
+    etag = client.get("/catalog").headers["ETag"]
+    page = mocker.patch("routes.catalog_routes.get_books_page")
+
+    assert client.get("/catalog", headers={"If-None-Match": etag}).status_code == 304
+    page.assert_not_called()
+
+
+def test_book_changes_bump_the_version(client):
+    etag = client.get("/catalog").headers["ETag"]
+    version = get_catalog_version()
+
+    assert insert_book("Fresh Book", "Author", "9780000000099", 2, 2)
+    assert get_catalog_version() != version
+    response = client.get("/catalog", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert b"Fresh Book" in response.data
+
+    version = get_catalog_version()
+    update_book_availability(1, -1)
+    assert get_catalog_version() != version
+
+
+def test_borrow_and_return_change_the_etag(client):
+    etag = client.get("/api/search?q=gatsby").headers["ETag"]
+    client.post("/borrow", data={"patron_id": "654321", "book_id": "1"})
+    borrowed = client.get("/api/search?q=gatsby", headers={"If-None-Match": etag})
+    assert borrowed.status_code == 200
+
+    client.post("/return", data={"patron_id": "654321", "book_id": "1"})
+    returned = client.get("/api/search?q=gatsby", headers={"If-None-Match": borrowed.headers["ETag"]})
+    assert returned.status_code == 200
+
+
+def test_pending_flash_is_never_304(client):
+    etag = client.get("/catalog").headers["ETag"]
+    client.post("/borrow", data={"patron_id": "654321", "book_id": "not-a-number"})   # flashes, no change
+
+    response = client.get("/catalog", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert b"Invalid book ID." in response.data
+    assert "ETag" not in response.headers
+
+    assert client.get("/catalog", headers={"If-None-Match": etag}).status_code == 304
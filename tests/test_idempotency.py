@@ -0,0 +1,137 @@
+import sqlite3
+import threading
+from unittest.mock import Mock
+
+import database
+from database import (
+    claim_idempotency_key, get_idempotency_result, get_payment, release_idempotency_key,
+    save_idempotency_result
+)
+from services.library_service import pay_late_fees, refund_late_fee_payment, verify_payment
+from services.payment_service import PaymentGateway
+
+
+def test_key_lifecycle(temp_db):
+    assert claim_idempotency_key("k") == (True, None)
+    assert claim_idempotency_key("k") == (False, None)   # in progress
+    save_idempotency_result("k", [True, "done"])
+    assert claim_idempotency_key("k") == (False, [True, "done"])
+    assert get_idempotency_result("k") == [True, "done"]
+
+    release_idempotency_key("k")
+    assert get_idempotency_result("k") is None
+    assert claim_idempotency_key("k") == (True, None)
+
+
+def test_expired_keys_are_evicted(temp_db):
+    save_idempotency_result("old", [True, "done"], ttl=0)
+    assert get_idempotency_result("old") is None
+    assert claim_idempotency_key("old") == (True, None)
+
+
+def test_in_progress_claim_is_a_short_lease(temp_db):
+    assert database.IDEMPOTENCY_LEASE < database.IDEMPOTENCY_TTL
+    assert claim_idempotency_key("crashed", lease=0) == (True, None)
+    assert claim_idempotency_key("crashed") == (True, None)   # the dead worker's claim lapsed
+
+    save_idempotency_result("crashed", [True, "done"])
+    conn = database.get_db_connection()
+    expires_at = conn.execute("SELECT expires_at FROM idempotency_keys WHERE key = 'crashed'").fetchone()[0]
+    conn.close()
+    assert expires_at - database.to_epoch(database.datetime.now()) > database.IDEMPOTENCY_LEASE
+
+
+def test_ledger_failure_after_charge_keeps_the_key(temp_db, late_book, mocker):
+    gateway = Mock(spec=PaymentGateway)
+    gateway.process_payment.return_value = (True, "txn_kept", "Paid")
+    failures = [sqlite3.OperationalError("database is locked")]
+
+    def flaky_record_payment(*args):
+        if failures:
+            raise failures.pop()
+        database.record_payment(*args)
+
+    mocker.patch("services.library_service.record_payment", side_effect=flaky_record_payment)
+
+    first = pay_late_fees("123456", 7, gateway)
+    assert first == (True, "Payment successful! Paid", "txn_kept")
+    assert get_payment("txn_kept") is None
+
+    assert pay_late_fees("123456", 7, gateway) == first
+    gateway.process_payment.assert_called_once()
+    assert get_payment("txn_kept")["amount"] == 2.5   # written when the retry replayed
+
+
+def test_duplicate_payment_replays_first_result(temp_db, late_book):
+    gateway = Mock(spec=PaymentGateway)
+    gateway.process_payment.return_value = (True, "txn_once", "Paid")
+
+    first = pay_late_fees("123456", 7, gateway)
+    second = pay_late_fees("123456", 7, gateway)
+
+    assert first == second == (True, "Payment successful! Paid", "txn_once")
+    gateway.process_payment.assert_called_once()
+
+
+def test_failed_payment_can_be_retried(temp_db, late_book):
+    gateway = Mock(spec=PaymentGateway)
+    gateway.process_payment.side_effect = [(False, "", "Declined"), (True, "txn_retry", "Paid")]
+
+    assert pay_late_fees("123456", 7, gateway)[0] is False
+    assert pay_late_fees("123456", 7, gateway) == (True, "Payment successful! Paid", "txn_retry")
+
+
+def test_concurrent_duplicate_does_not_charge_twice(temp_db, late_book):
+    started, finish = threading.Event(), threading.Event()
+    gateway = Mock(spec=PaymentGateway)
+
+    def slow_payment(**kwargs):
+        started.set()
+        finish.wait(5)
+        return True, "txn_slow", "Paid"
+
+    gateway.process_payment.side_effect = slow_payment
+    results = []
+    first = threading.Thread(target=lambda: results.append(pay_late_fees("123456", 7, gateway)))
+    first.start()
+    assert started.wait(5)
+
+    assert pay_late_fees("123456", 7, gateway) == (False, "A payment for this fee is already in progress.", None)
+    finish.set()
+    first.join()
+    assert results == [(True, "Payment successful! Paid", "txn_slow")]
+    assert gateway.process_payment.call_count == 1
+
+
+def test_duplicate_refund_replays_first_result(temp_db):
+    gateway = Mock(spec=PaymentGateway)
+    gateway.refund_payment.return_value = (True, "Refunded")
+
+    assert refund_late_fee_payment("txn_abc", 5.0, gateway, refund_id="r1") == (True, "Refunded")
+    assert refund_late_fee_payment("txn_abc", 5.0, gateway, refund_id="r1") == (True, "Refunded")
+    gateway.refund_payment.assert_called_once_with("txn_abc", 5.0)
+
+
+def test_refunds_of_the_same_amount_are_not_duplicates(temp_db):
+    gateway = Mock(spec=PaymentGateway)
+    gateway.refund_payment.return_value = (True, "Refunded")
+
+    assert refund_late_fee_payment("txn_abc", 5.0, gateway, refund_id="r1") == (True, "Refunded")
+    assert refund_late_fee_payment("txn_abc", 5.0, gateway, refund_id="r2") == (True, "Refunded")
+    assert refund_late_fee_payment("txn_abc", 5.0, gateway) == (True, "Refunded")
+    assert gateway.refund_payment.call_count == 3
+
+
+def test_verify_caches_only_completed_transactions(temp_db):
+    gateway = Mock(spec=PaymentGateway)
+    gateway.verify_payment_status.side_effect = lambda txn: (
+        {"transaction_id": txn, "status": "completed", "amount": 5.0} if txn == "txn_done"
+        else {"status": "not_found", "message": "Transaction not found"})
+
+    for _ in range(3):
+        assert verify_payment("txn_done", gateway)["status"] == "completed"
+        assert verify_payment("txn_missing", gateway)["status"] == "not_found"
+
+    calls = [call.args[0] for call in gateway.verify_payment_status.call_args_list]
+    assert calls.count("txn_done") == 1
+    assert calls.count("txn_missing") == 3
@@ -0,0 +1,78 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import create_app
+from database import (
+    get_db_connection, get_patron_counters, insert_borrow_record, rebuild_patron_counters, return_book_transaction, to_epoch,
+    borrow_book_transaction, MAX_BORROWED_BOOKS
+)
+from services.fee_engine import compute_late_fee, late_fee_sql
+
+
+@pytest.mark.parametrize("days_late", [-3, 0, 1, 6, 7, 8, 12, 14, 15, 40])
+def test_sql_fee_matches_python(temp_db, days_late):
+    due = datetime(2025, 3, 1, 12, 0)
+    returned = due + timedelta(days=days_late, hours=5)
+    conn = get_db_connection()
+    try:
+        fee = conn.execute(f"WITH loan (due, returned) AS (VALUES (?, ?)) "
+                           f"SELECT {late_fee_sql('due', 'returned')} FROM loan",
+                           (to_epoch(due), to_epoch(returned))).fetchone()[0]
+    finally:
+        conn.close()
+    assert fee == compute_late_fee(due, returned)[0]
+
+
+def test_counters_follow_borrow_and_return(book_id):
+    now = datetime.now()
+    assert get_patron_counters("123456") == {"open_loans": 0, "total_fees_owed": 0.0}
+
+    borrow_book_transaction("123456", book_id, now - timedelta(days=24), now - timedelta(days=10))
+    assert get_patron_counters("123456")["open_loans"] == 1
+
+    return_book_transaction("123456", book_id, now)
+    # 7 days at $0.50 + 3 days at $1.00
+    assert get_patron_counters("123456") == {"open_loans": 0, "total_fees_owed": 6.5}
+
+
+def test_limit_check_reads_counter(book_id):
+    now = datetime.now()
+    for _ in range(MAX_BORROWED_BOOKS):
+        assert borrow_book_transaction("123456", book_id, now, now + timedelta(days=14))[0] == "borrowed"
+    assert borrow_book_transaction("123456", book_id, now, now + timedelta(days=14))[0] == "limit_reached"
+
+
+def test_rebuild_repairs_drift(book_id):
+    now = datetime.now()
+    assert insert_borrow_record("123456", book_id, now, now + timedelta(days=14))
+    conn = get_db_connection()
+    conn.execute("UPDATE patrons SET open_loans = 4, total_fees_owed = 2 WHERE patron_id = '123456'")
+    conn.commit()
+    conn.close()
+
+    mismatches = rebuild_patron_counters(check_only=True)
+    assert [(m["patron_id"], m["stored_open_loans"], m["open_loans"]) for m in mismatches] == [("123456", 4, 1)]
+    assert get_patron_counters("123456")["open_loans"] == 4
+
+    assert len(rebuild_patron_counters()) == 1
+    assert get_patron_counters("123456") == {"open_loans": 1, "total_fees_owed": 0.0}
+    assert rebuild_patron_counters(check_only=True) == []
+
+
+def test_rebuild_command_check_exit_code(book_id):
+    runner = create_app().test_cli_runner()
+    assert runner.invoke(args=["rebuild-patron-counters", "--check"]).exit_code == 0
+
+    conn = get_db_connection()
+    conn.execute("INSERT INTO patrons (patron_id, open_loans) VALUES ('999999', 2)")
+    conn.commit()
+    conn.close()
+
+    result = runner.invoke(args=["rebuild-patron-counters", "--check"])
+    assert result.exit_code == 1
+    assert "patron 999999" in result.output
+
+    result = runner.invoke(args=["rebuild-patron-counters"])
+    assert result.exit_code == 0
+    assert "Repaired 1 patron counters." in result.output
@@ -0,0 +1,82 @@
+from datetime import datetime
+
+import pytest
+
+import database
+from database import return_book_transaction
+from services.library_service import get_patron_status_report
+
+
+@pytest.fixture
+def select_log(monkeypatch):
+    """Record every SELECT issued on pooled connections."""
+    statements = []
+    real_connect = database.ConnectionPool._connect
+
+    def tracing_connect(pool):
+        conn = real_connect(pool)
+        conn.set_trace_callback(statements.append)
+        return conn
+
+    database.close_pool()
+    monkeypatch.setattr(database.ConnectionPool, "_connect", tracing_connect)
+    return lambda: [s for s in statements if s.lstrip().upper().startswith("SELECT") and s.strip() != "SELECT 1"]
+
+
+def test_report_contents(book_ids, overdue_loan):
+    overdue_loan("123456", book_ids[0], 3)    # open, $1.50 so far
+    overdue_loan("123456", book_ids[1], -5)   # open, not due yet
+    overdue_loan("123456", book_ids[2], 20)   # returned below
+    return_book_transaction("123456", book_ids[2], datetime.now())
+    overdue_loan("654321", book_ids[3], 10)   # someone else
+
+    report = get_patron_status_report("123456")
+
+    assert report["borrowed_count"] == 2
+    assert [b["book_id"] for b in report["borrowed_books"]] == book_ids[:2]
+    fees = {b["book_id"]: b["fee_amount"] for b in report["borrowed_books"]}
+    assert fees == {book_ids[0]: 1.5, book_ids[1]: 0.0}
+    # $1.50 accruing + $15.00 (capped) assessed on the late return
+    assert report["total_late_fees"] == 16.5
+    assert len(report["history"]) == 3
+    assert report["history"][0]["book_id"] == book_ids[2]
+
+
+@pytest.mark.parametrize("loans", [1, 5])
+def test_report_query_count_does_not_grow_with_loans(book_ids, select_log, loans, overdue_loan):
+    for book_id in book_ids[:loans]:
+        overdue_loan("123456", book_id, 2)
+
+    get_patron_status_report("123456")
+
+    assert len(select_log()) == 3
+
+
+def test_history_pages_with_cursor(book_ids, overdue_loan):
+    for book_id in book_ids:
+        overdue_loan("123456", book_id, 0)
+
+    first = get_patron_status_report("123456", history_limit=4)
+    second = get_patron_status_report("123456", history_before=first["history_next_cursor"], history_limit=4)
+
+    assert len(first["history"]) == 4
+    assert len(second["history"]) == 2
+    assert second["history_next_cursor"] is None
+    ids = [loan["id"] for loan in first["history"] + second["history"]]
+    assert ids == sorted(ids, reverse=True)
+
+
+def test_patron_page_and_api(client):
+    page = client.get("/patron/123456")
+    assert page.status_code == 200
+    assert b"1984" in page.data
+    assert b"Patron Status" in page.data
+
+    data = client.get("/api/patron/123456").get_json()
+    assert data["borrowed_count"] == 1
+    assert data["borrowed_books"][0]["title"] == "1984"
+    due = datetime.fromisoformat(data["borrowed_books"][0]["due_date"])
+    assert due.strftime("%Y-%m-%d").encode() in page.data
+
+    assert client.get("/api/patron/abc").status_code == 400
+    assert client.get("/patron?patron_id=123456").status_code == 302
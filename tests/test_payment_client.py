@@ -0,0 +1,138 @@
+import asyncio
+import time
+
+import pytest
+
+from services import payment_client
+from services.library_service import pay_late_fees, refund_late_fee_payment
+from services.payment_client import AsyncPaymentClient, PaymentClient, PaymentGatewayError
+
+
+@pytest.fixture
+def client(payment_server):
+    client = PaymentClient(payment_server.url)
+    yield client
+    client.close()
+
+
+def test_process_payment_success(client):
+    success, transaction_id, message = client.process_payment("123456", 10.5, "Late fees")
+    assert success is True
+    assert transaction_id.startswith("txn_123456")
+    assert message == "Payment of $10.50 processed successfully"
+
+
+@pytest.mark.parametrize("patron_id, amount, error", [
+    ("123456", 0, "Invalid amount"),
+    ("123456", 2000, "Payment declined"),
+    ("12345", 5, "Invalid patron ID"),
+])
+def test_process_payment_declines(client, patron_id, amount, error):
+    success, transaction_id, message = client.process_payment(patron_id, amount)
+    assert (success, transaction_id) == (False, "")
+    assert error in message
+
+
+def test_refund_and_verify(client):
+    _, transaction_id, _ = client.process_payment("123456", 4.0)
+
+    assert client.refund_payment(transaction_id, 4.0) == (True, "Refund of $4.00 processed successfully")
+    assert client.refund_payment("txn_unknown", 4.0) == (False, "Invalid transaction ID")
+    assert client.verify_payment_status(transaction_id)["status"] == "completed"
+    assert client.verify_payment_status("txn_unknown")["status"] == "not_found"
+
+
+def test_calls_reuse_one_connection(client, payment_server):
+    for _ in range(5):
+        assert client.process_payment("123456", 1.0)[0]
+    assert payment_server.connections == 1
+
+
+def test_slow_gateway_times_out(client, payment_server):
+    payment_server.delay = 1.0
+    start = time.perf_counter()
+    with pytest.raises(PaymentGatewayError, match="timed out"):
+        client.process_payment("123456", 1.0, timeout=(1, 0.1))
+    assert time.perf_counter() - start < 0.5
+
+
+def test_unreachable_gateway_raises():
+    client = PaymentClient("http://127.0.0.1:9", timeout=0.5)
+    with pytest.raises(PaymentGatewayError, match="unreachable"):
+        client.process_payment("123456", 1.0)
+
+
+def test_service_uses_configured_gateway(payment_server, monkeypatch, mocker):
+    monkeypatch.setattr(payment_client, "PAYMENT_URL", payment_server.url)
+    mocker.patch("services.library_service.calculate_late_fee_for_book",
+                 return_value={"fee_amount": 3.5, "days_overdue": 7, "status": "Overdue"})
+    mocker.patch("services.library_service.get_book_by_id", return_value={"id": 1, "title": "Remote"})
+    try:
+        success, message, transaction_id = pay_late_fees("123456", 1)
+        assert success is True
+        assert payment_server.charges[transaction_id] == 3.5
+
+        assert refund_late_fee_payment(transaction_id, 3.5)[0] is True
+    finally:
+        payment_client.close_payment_client()
+
+
+def test_async_client_matches_blocking_client(payment_server):
+    async def calls():
+        client = AsyncPaymentClient(payment_server.url)
+        try:
+            success, transaction_id, message = await client.process_payment("123456", 10.5, "Late fees")
+            return [
+                (success, message),
+                await client.process_payment("123456", 2000),
+                await client.refund_payment(transaction_id, 4.0),
+                (await client.verify_payment_status(transaction_id))["status"],
+                (await client.verify_payment_status("txn_unknown"))["status"],
+            ]
+        finally:
+            await client.aclose()
+
+    assert asyncio.run(calls()) == [
+        (True, "Payment of $10.50 processed successfully"),
+        (False, "", "Payment declined: amount exceeds limit"),
+        (True, "Refund of $4.00 processed successfully"),
+        "completed",
+        "not_found",
+    ]
+
+
+def test_async_payments_overlap_on_pooled_connections(payment_server):
+    payment_server.delay = 0.2
+
+    async def many():
+        client = AsyncPaymentClient(payment_server.url, max_connections=5)
+        try:
+            return await asyncio.gather(*(client.process_payment(f"{100000 + i}", 1.0) for i in range(10)))
+        finally:
+            await client.aclose()
+
+    start = time.perf_counter()
+    results = asyncio.run(many())
+
+    assert all(success for success, _, _ in results)
+    assert time.perf_counter() - start < 10 * 0.2 / 2
+    assert payment_server.connections <= 5
+
+
+def test_async_client_timeouts_and_server_errors(payment_server):
+    async def calls():
+        client = AsyncPaymentClient(payment_server.url)
+        try:
+            payment_server.delay = 1.0
+            with pytest.raises(PaymentGatewayError, match="timed out"):
+                await client.process_payment("123456", 1.0, timeout=(1, 0.1))
+            payment_server.delay = 0.0
+            payment_server.fail_status = 503
+            with pytest.raises(PaymentGatewayError, match="HTTP 503"):
+                await client.process_payment("123456", 1.0)
+        finally:
+            await client.aclose()
+        with pytest.raises(PaymentGatewayError, match="unreachable"):
+            await AsyncPaymentClient("http://127.0.0.1:9", timeout=0.5).process_payment("123456", 1.0)
+
+    asyncio.run(calls())
@@ -0,0 +1,158 @@
+import threading
+import time
+from unittest.mock import Mock
+
+from app import create_app
+from database import claim_pending_payments, get_payment, record_payment
+from services.library_service import (
+    get_payment_status, pay_late_fees, reconcile_pending_payments, verify_payment
+)
+from services.payment_client import PaymentClient, PaymentGatewayError
+from services.payment_service import PaymentGateway
+from services.reconciliation import ReconciliationWorker
+
+
+def _gateway(statuses):
+    """Mock gateway answering verify_payment_status from a {transaction_id: status} map."""
+    gateway = Mock(spec=PaymentGateway)
+    gateway.verify_payment_status.side_effect = lambda txn: {"transaction_id": txn, "status": statuses[txn]}
+    return gateway
+
+
+def test_successful_charge_is_ledgered_as_pending(temp_db, late_book):
+    gateway = Mock(spec=PaymentGateway)
+    gateway.process_payment.return_value = (True, "txn_ledger", "Paid")
+
+    assert pay_late_fees("123456", 7, gateway)[0] is True
+
+    payment = get_payment_status("txn_ledger")
+    assert (payment["patron_id"], payment["amount"], payment["status"]) == ("123456", 2.5, "pending")
+    assert payment["description"] == "Late fees for 'Late Book'"
+
+
+def test_reconcile_updates_statuses_in_batches(temp_db):
+    for i in range(5):
+        record_payment(f"txn_{i}", "123456", 1.0)
+    gateway = _gateway({"txn_0": "completed", "txn_1": "not_found", "txn_2": "pending",
+                        "txn_3": "completed", "txn_4": "refunded"})
+
+    assert reconcile_pending_payments(batch_size=3, payment_gateway=gateway) == {"checked": 3, "settled": 2}
+    assert reconcile_pending_payments(batch_size=3, payment_gateway=gateway) == {"checked": 3, "settled": 2}
+
+    statuses = {f"txn_{i}": get_payment(f"txn_{i}")["status"] for i in range(5)}
+    assert statuses == {"txn_0": "completed", "txn_1": "failed", "txn_2": "pending",
+                        "txn_3": "completed", "txn_4": "refunded"}
+    assert get_payment("txn_2")["attempts"] == 2
+    assert reconcile_pending_payments(payment_gateway=gateway) == {"checked": 1, "settled": 0}
+
+
+def test_reconcile_stops_when_gateway_is_down(temp_db):
+    record_payment("txn_a", "123456", 1.0)
+    record_payment("txn_b", "123456", 1.0)
+    gateway = Mock(spec=PaymentGateway)
+    gateway.verify_payment_status.side_effect = [{"status": "completed"}, PaymentGatewayError("timed out")]
+
+    assert reconcile_pending_payments(payment_gateway=gateway) == {"checked": 1, "settled": 1}
+    assert get_payment("txn_b")["status"] == "pending"
+    assert get_payment("txn_b")["attempts"] == 0
+
+
+def test_claimed_payments_are_skipped_until_the_lease_lapses(temp_db):
+    for i in range(3):
+        record_payment(f"txn_{i}", "123456", 1.0)
+
+    assert claim_pending_payments(2) == ["txn_0", "txn_1"]
+    assert claim_pending_payments(5) == ["txn_2"]
+    assert claim_pending_payments(5) == []
+
+    assert claim_pending_payments(5, lease=0) == []
+    record_payment("txn_3", "123456", 1.0)
+    assert claim_pending_payments(5, lease=0) == ["txn_3"]
+    assert claim_pending_payments(5) == ["txn_3"]   # the zero-second claim already lapsed
+
+
+def test_concurrent_reconcilers_never_check_the_same_payment(temp_db):
+    for i in range(40):
+        record_payment(f"txn_{i}", "123456", 1.0)
+    checked = []
+    lock = threading.Lock()
+
+    def verify(transaction_id):
+        time.sleep(0.002)
+        with lock:
+            checked.append(transaction_id)
+        return {"transaction_id": transaction_id, "status": "completed"}
+
+    gateway = Mock(spec=PaymentGateway)
+    gateway.verify_payment_status.side_effect = verify
+
+    def reconcile():
+        while reconcile_pending_payments(batch_size=5, payment_gateway=gateway)["checked"]:
+            pass
+
+    threads = [threading.Thread(target=reconcile) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(checked) == sorted(f"txn_{i}" for i in range(40))
+
+
+def test_create_app_does_not_start_a_reconciler(temp_db):
+    create_app()
+    create_app()
+    assert not [thread for thread in threading.enumerate() if thread.name == "payment-reconciliation"]
+
+
+def test_verify_answers_settled_payments_from_ledger(temp_db):
+    record_payment("txn_done", "123456", 4.0)
+    gateway = _gateway({"txn_done": "completed"})
+
+    assert verify_payment("txn_done", gateway)["status"] == "completed"   # gateway, then ledgered
+    assert get_payment("txn_done")["status"] == "completed"
+    assert verify_payment("txn_done", gateway)["amount"] == 4.0           # ledger
+    gateway.verify_payment_status.assert_called_once_with("txn_done")
+
+
+def test_worker_reconciles_in_background(temp_db, payment_server):
+    client = PaymentClient(payment_server.url)
+    _, transaction_id, _ = client.process_payment("123456", 3.0)
+    record_payment(transaction_id, "123456", 3.0)
+
+    worker = ReconciliationWorker(interval=0.05, batch_size=10, payment_gateway=client)
+    worker.start()
+    try:
+        deadline = time.monotonic() + 5
+        while get_payment(transaction_id)["status"] == "pending" and time.monotonic() < deadline:
+            time.sleep(0.02)
+    finally:
+        worker.stop(timeout=5)
+        client.close()
+
+    assert get_payment(transaction_id)["status"] == "completed"
+    assert worker.runs >= 1 and not worker.is_alive()
+
+
+def test_payment_status_api_reads_ledger(client, mocker):
+    record_payment("txn_api", "123456", 2.0, "Late fees")
+    gateway = mocker.patch("services.library_service.PaymentGateway")
+
+    response = client.get("/api/payments/txn_api")
+    assert response.status_code == 200
+    assert response.get_json()["status"] == "pending"
+    assert response.get_json()["checked_at"] is None
+
+    assert client.get("/api/payments/txn_missing").status_code == 404
+    gateway.assert_not_called()
+
+
+def test_reconcile_payments_command(temp_db, mocker):
+    record_payment("txn_cli", "123456", 2.0)
+    mocker.patch("services.library_service.PaymentGateway", return_value=_gateway({"txn_cli": "completed"}))
+
+    result = create_app().test_cli_runner().invoke(args=["reconcile-payments"])
+
+    assert result.exit_code == 0
+    assert "Checked 1 pending payments, 1 settled." in result.output
+    assert get_payment("txn_cli")["status"] == "completed"
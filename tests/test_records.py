@@ -0,0 +1,57 @@
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+from flask import json
+
+from database import get_book_by_isbn, get_db_connection, get_patron_history, insert_book, insert_borrow_record
+from records import Book, Loan
+
+
+def test_book_columns_match_table_order(temp_db):
+    conn = get_db_connection()
+    try:
+        table_columns = tuple(row["name"] for row in conn.execute("PRAGMA table_info(books)"))
+    finally:
+        conn.close()
+    assert Book.__slots__ == table_columns
+
+
+def test_records_behave_like_read_only_dicts():
+    book = Book(1, "Title", "Author", "1234567890123", 3, 2)
+    assert book["title"] == book.title == "Title"
+    assert book.get("missing", "x") == "x"
+    assert "isbn" in book and "missing" not in book
+    assert dict(book) == {"id": 1, "title": "Title", "author": "Author", "isbn": "1234567890123",
+                          "total_copies": 3, "available_copies": 2}
+    with pytest.raises(KeyError):
+        book["missing"]
+    with pytest.raises(AttributeError):
+        book.extra = 1
+    assert not hasattr(book, "__dict__")
+
+
+def test_copy_is_independent():
+    book = Book(1, "Title", "Author", "1234567890123", 3, 2)
+    copy = book.copy()
+    copy["available_copies"] = 0
+    assert copy == Book(1, "Title", "Author", "1234567890123", 3, 0)
+    assert book.available_copies == 2
+
+
+def test_records_serialize_as_json_objects():
+    book = Book(1, "Title", "Author", "1234567890123", 3, 2)
+    assert json.loads(json.dumps([book])) == [dict(book)]
+
+
+def test_data_layer_builds_records_from_rows(temp_db):
+    assert insert_book("Record", "Author", "8400000000000", 1, 1)
+    book = get_book_by_isbn("8400000000000")
+    assert isinstance(book, Book)
+
+    now = datetime.now()
+    assert insert_borrow_record("123456", book.id, now - timedelta(days=20), now - timedelta(days=6))
+    loan = get_patron_history("123456")["loans"][0]
+    assert isinstance(loan, Loan)
+    assert (loan.book_id, loan.title, loan.return_date, loan.is_overdue) == (book.id, "Record", None, 1)
+    assert sys.getsizeof(loan) < sys.getsizeof(dict(loan))
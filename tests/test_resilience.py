@@ -0,0 +1,237 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from services import resilience
+from services.library_service import pay_late_fees, verify_payment
+from services.payment_client import AsyncPaymentClient, PaymentClient, PaymentGatewayError
+from services.resilience import (
+    Bulkhead, BulkheadFullError, CircuitBreaker, CircuitOpenError, guard_async_payment_gateway,
+    guard_payment_gateway
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeGateway:
+    """Gateway whose calls take `delay` seconds of the fake clock, or raise when `down`."""
+
+    def __init__(self, clock, delay=0.0):
+        self.clock = clock
+        self.delay = delay
+        self.down = False
+        self.calls = 0
+
+    def process_payment(self, patron_id, amount, description=""):
+        self.calls += 1
+        self.clock.now += self.delay
+        if self.down:
+            raise PaymentGatewayError("Payment gateway timed out")
+        return True, f"txn_{patron_id}_{self.calls}", "Paid"
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def breaker(clock):
+    return CircuitBreaker(failure_rate=0.5, slow_call_seconds=1.0, window=4, min_calls=4,
+                          reset_timeout=30, clock=clock)
+
+
+def test_failures_open_the_circuit(clock, breaker):
+    gateway = FakeGateway(clock)
+    guarded = guard_payment_gateway(gateway, breaker, Bulkhead(2))
+
+    gateway.down = True
+    for _ in range(4):
+        with pytest.raises(PaymentGatewayError):
+            guarded.process_payment("123456", 1.0)
+    assert breaker.state == CircuitBreaker.OPEN
+
+    with pytest.raises(CircuitOpenError, match="try again in 30 seconds"):
+        guarded.process_payment("123456", 1.0)
+    assert gateway.calls == 4
+    assert breaker.stats()["rejected"] == 1
+
+
+def test_slow_calls_open_the_circuit(clock, breaker):
+    gateway = FakeGateway(clock, delay=2.0)
+    guarded = guard_payment_gateway(gateway, breaker, Bulkhead(2))
+
+    for _ in range(4):
+        assert guarded.process_payment("123456", 1.0)[0] is True
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.stats()["slow_calls"] == 4
+
+
+def test_mostly_healthy_gateway_stays_closed(clock, breaker):
+    gateway = FakeGateway(clock)
+    guarded = guard_payment_gateway(gateway, breaker, Bulkhead(2))
+
+    for down in (True, False, False, False, True, False, False):
+        gateway.down = down
+        try:
+            guarded.process_payment("123456", 1.0)
+        except PaymentGatewayError:
+            pass
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_half_open_probe_closes_or_reopens(clock, breaker):
+    gateway = FakeGateway(clock)
+    guarded = guard_payment_gateway(gateway, breaker, Bulkhead(2))
+    gateway.down = True
+    for _ in range(4):
+        with pytest.raises(PaymentGatewayError):
+            guarded.process_payment("123456", 1.0)
+
+    clock.now += 30
+    with pytest.raises(PaymentGatewayError, match="timed out"):   # failed probe
+        guarded.process_payment("123456", 1.0)
+    assert breaker.state == CircuitBreaker.OPEN
+
+    clock.now += 30
+    gateway.down = False
+    assert guarded.process_payment("123456", 1.0)[0] is True      # good probe
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.stats()["transitions"] == {
+        "closed->open": 1, "open->half_open": 2, "half_open->open": 1, "half_open->closed": 1
+    }
+
+
+def test_half_open_lets_one_probe_through(clock, breaker):
+    breaker._transition(CircuitBreaker.OPEN)
+    clock.now += 30
+    started, finish = threading.Event(), threading.Event()
+
+    def probe():
+        started.set()
+        finish.wait(5)
+        return "ok"
+
+    worker = threading.Thread(target=breaker.call, args=(probe,))
+    worker.start()
+    assert started.wait(5)
+    with pytest.raises(CircuitOpenError, match="recovering"):
+        breaker.call(lambda: "second")
+    finish.set()
+    worker.join()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_bulkhead_rejects_calls_beyond_limit():
+    bulkhead = Bulkhead(max_concurrent=2)
+    with bulkhead.slot(), bulkhead.slot():
+        with pytest.raises(BulkheadFullError):
+            with bulkhead.slot():
+                pass
+        assert bulkhead.stats() == {"max_concurrent": 2, "active": 2, "rejected": 1}
+    with bulkhead.slot():
+        assert bulkhead.stats()["active"] == 1
+
+
+def test_slow_gateway_cannot_exhaust_workers(temp_db, late_book, payment_server, mocker, monkeypatch):
+    """With the gateway hanging, only the bulkhead's slots wait on it; other payments fail fast."""
+    monkeypatch.setattr(resilience, "payment_bulkhead", Bulkhead(max_concurrent=2))
+    payment_server.delay = 0.5
+    client = PaymentClient(payment_server.url)
+    mocker.patch("services.library_service.get_payment_client", return_value=client)
+
+    results = []
+    def pay(patron_id):
+        results.append(pay_late_fees(patron_id, 7))
+    slow = [threading.Thread(target=pay, args=(f"{100000 + i}",)) for i in range(2)]
+    for thread in slow:
+        thread.start()
+    time.sleep(0.1)
+
+    start = time.perf_counter()
+    assert pay_late_fees("654321", 7) == (False, "Payment service is busy. Please try again shortly.", None)
+    assert time.perf_counter() - start < 0.1
+    for thread in slow:
+        thread.join()
+    client.close()
+    assert [success for success, _, _ in results] == [True, True]
+
+
+def test_gateway_server_errors_open_the_circuit(payment_server, breaker):
+    client = PaymentClient(payment_server.url)
+    gateway = guard_payment_gateway(client, breaker=breaker, bulkhead=Bulkhead(4))
+    try:
+        payment_server.fail_status = 503
+        for _ in range(4):
+            with pytest.raises(PaymentGatewayError, match="HTTP 503"):
+                gateway.process_payment("123456", 1.0)
+        assert breaker.state == CircuitBreaker.OPEN
+
+        with pytest.raises(CircuitOpenError):
+            gateway.process_payment("123456", 1.0)
+        assert len(payment_server.requests) == 4
+    finally:
+        client.close()
+
+
+def test_async_gateway_calls_share_the_breaker(payment_server, breaker):
+    async def calls():
+        client = AsyncPaymentClient(payment_server.url)
+        gateway = guard_async_payment_gateway(client, breaker=breaker, bulkhead=Bulkhead(4))
+        try:
+            payment_server.fail_status = 503
+            for _ in range(4):
+                with pytest.raises(PaymentGatewayError, match="HTTP 503"):
+                    await gateway.process_payment("123456", 1.0)
+            assert breaker.state == CircuitBreaker.OPEN
+            with pytest.raises(CircuitOpenError):
+                await gateway.process_payment("123456", 1.0)
+        finally:
+            await client.aclose()
+
+    asyncio.run(calls())
+    assert len(payment_server.requests) == 4
+
+
+def test_gateway_declines_do_not_open_the_circuit(payment_server, breaker):
+    client = PaymentClient(payment_server.url)
+    gateway = guard_payment_gateway(client, breaker=breaker, bulkhead=Bulkhead(4))
+    try:
+        for _ in range(6):
+            assert gateway.process_payment("123456", 5000.0)[0] is False   # 402 decline
+        assert breaker.state == CircuitBreaker.CLOSED
+    finally:
+        client.close()
+
+
+def test_open_circuit_fails_payments_fast(temp_db, late_book, mocker, monkeypatch):
+    monkeypatch.setattr(resilience, "payment_breaker", CircuitBreaker(reset_timeout=60))
+    resilience.payment_breaker._transition(CircuitBreaker.OPEN)
+    gateway = mocker.patch("services.library_service.PaymentGateway").return_value
+
+    success, message, transaction_id = pay_late_fees("123456", 7)
+
+    assert (success, transaction_id) == (False, None)
+    assert message.startswith("Payment service is temporarily unavailable")
+    assert verify_payment("txn_123456_1")["status"] == "unknown"
+    gateway.process_payment.assert_not_called()
+    gateway.verify_payment_status.assert_not_called()
+
+
+def test_health_endpoint_reports_circuit_state(client):
+    response = client.get("/api/payments/health")
+    assert response.status_code == 200
+    assert response.get_json()["circuit"]["state"] == "closed"
+
+    resilience.payment_breaker._transition(CircuitBreaker.OPEN)
+    response = client.get("/api/payments/health")
+    assert response.status_code == 503
+    assert response.get_json()["circuit"]["transitions"] == {"closed->open": 1}
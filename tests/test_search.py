@@ -0,0 +1,90 @@
+import pytest
+
+from database import get_db_connection, insert_book
+from services.library_service import search_books_in_catalog
+
+
+@pytest.fixture
+def catalog(temp_db):
+    books = [
+        ("The Great Gatsby", "F. Scott Fitzgerald", "9780743273565"),
+        ("Great Expectations", "Charles Dickens", "9780141439563"),
+        ("A Tale of Two Cities", "Charles Dickens", "9780141439600"),
+        ("Gatsby's Greatest Hits", "Anonymous", "9780000000001"),
+        ("Go", "Ann Author", "9780000000002"),
+    ]
+    for title, author, isbn in books:
+        assert insert_book(title, author, isbn, 1, 1)
+
+
+def _titles(books):
+    return [book["title"] for book in books]
+
+
+def test_title_search_is_partial_and_case_insensitive(catalog):
+    results = search_books_in_catalog("gREAT", "title")
+    assert set(_titles(results)) == {"The Great Gatsby", "Great Expectations", "Gatsby's Greatest Hits"}
+
+
+def test_author_search_matches_inside_names(catalog):
+    results = search_books_in_catalog("dicken", "author")
+    assert set(_titles(results)) == {"Great Expectations", "A Tale of Two Cities"}
+
+
+def test_results_use_catalog_row_format(catalog):
+    book = search_books_in_catalog("Tale of", "title")[0]
+    assert set(book) == {"id", "title", "author", "isbn", "total_copies", "available_copies"}
+
+
+def test_isbn_search_is_exact(catalog):
+    assert _titles(search_books_in_catalog("9780141439600", "isbn")) == ["A Tale of Two Cities"]
+    assert search_books_in_catalog("978014143960", "isbn") == []
+
+
+def test_short_terms_fall_back_to_substring_scan(catalog):
+    assert _titles(search_books_in_catalog("go", "title")) == ["Go"]
+
+
+def test_quotes_and_wildcards_are_matched_literally(catalog):
+    assert _titles(search_books_in_catalog("Gatsby's", "title")) == ["Gatsby's Greatest Hits"]
+    assert search_books_in_catalog('"', "title") == []
+    assert search_books_in_catalog("%", "title") == []
+
+
+def test_limit_and_offset_page_through_results(catalog):
+    first = search_books_in_catalog("great", "title", limit=2)
+    rest = search_books_in_catalog("great", "title", limit=2, offset=2)
+    assert len(first) == 2
+    assert len(rest) == 1
+    assert set(_titles(first + rest)) == {"The Great Gatsby", "Great Expectations", "Gatsby's Greatest Hits"}
+
+
+def test_unknown_type_or_blank_term_returns_nothing(catalog):
+    assert search_books_in_catalog("great", "publisher") == []
+    assert search_books_in_catalog("   ", "title") == []
+
+
+def test_index_follows_title_changes(catalog):
+    conn = get_db_connection()
+    conn.execute("UPDATE books SET title = 'Hard Times' WHERE isbn = '9780141439563'")
+    conn.commit()
+    conn.close()
+
+    assert "Hard Times" in _titles(search_books_in_catalog("hard", "title"))
+    assert "Great Expectations" not in _titles(search_books_in_catalog("expectations", "title"))
+
+
+def test_api_search_returns_ranked_page(client):
+    response = client.get("/api/search?q=gatsby&type=title&limit=5")
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data["count"] == 1
+    assert data["results"][0]["title"] == "The Great Gatsby"
+    assert data["limit"] == 5
+
+
+def test_search_page_renders_results(client):
+    response = client.get("/search?q=orwell&type=author")
+    assert response.status_code == 200
+    assert b"1984" in response.data
+    assert b"Not Yet Implemented" not in response.data
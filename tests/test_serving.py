@@ -0,0 +1,81 @@
+import os
+import runpy
+import subprocess
+import sys
+from unittest.mock import Mock
+
+import database
+from database import get_pool, insert_book, warm_up
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONFIG = os.path.join(ROOT, "gunicorn.conf.py")
+
+
+def test_warm_up_opens_connections_and_fills_cache(temp_db):
+    for i in range(3):
+        assert insert_book(f"Warm {i}", "Author", f"{8600000000000 + i}", 1, 1)
+    database.clear_book_cache()
+
+    assert warm_up(connections=4) == {"connections": 4, "books": 3}
+    assert get_pool().idle_count() == 4
+    assert len(database.book_cache) == 3
+    assert database.get_book_by_isbn("8600000000001").title == "Warm 1"
+
+
+def _borrow_in_other_process(path, book_id):
+    """Borrow a book from a separate Python process sharing the database file (like another worker)."""
+    script = (
+        "import sys; from datetime import datetime, timedelta; import database\n"
+        "database.DATABASE = sys.argv[1]\n"
+        "now = datetime.now()\n"
+        "print(database.borrow_book_transaction('654321', int(sys.argv[2]), now, now + timedelta(days=14))[0])\n"
+    )
+    result = subprocess.run([sys.executable, "-c", script, path, str(book_id)],
+                            cwd=ROOT, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "borrowed"
+
+
+def test_borrows_in_other_workers_are_not_served_stale(client, temp_db):
+    database.clear_book_cache()
+    warm_up()
+    url = "/api/search?q=9780743273565&type=isbn"
+    first = client.get(url)
+    assert first.get_json()["results"][0]["available_copies"] == 3
+
+    _borrow_in_other_process(temp_db, first.get_json()["results"][0]["id"])
+
+    again = client.get(url, headers={"If-None-Match": first.headers["ETag"]})
+    assert again.status_code == 200
+    assert again.get_json()["results"][0]["available_copies"] == 2
+    assert client.get(url, headers={"If-None-Match": again.headers["ETag"]}).status_code == 304
+
+
+def test_gunicorn_config_from_environment(monkeypatch):
+    monkeypatch.setenv("LIBRARY_WEB_WORKERS", "3")
+    monkeypatch.setenv("LIBRARY_WEB_THREADS", "16")
+    monkeypatch.setenv("LIBRARY_KEEPALIVE", "10")
+    monkeypatch.setenv("LIBRARY_MAX_REQUESTS", "500")
+    monkeypatch.setenv("LIBRARY_ACCESS_LOG", "")
+
+    config = runpy.run_path(CONFIG)
+
+    assert (config["workers"], config["threads"], config["worker_class"]) == (3, 16, "gthread")
+    assert (config["keepalive"], config["max_requests"]) == (10, 500)
+    assert config["accesslog"] is None
+    assert config["preload_app"] is False
+
+
+def test_post_worker_init_warms_up(temp_db, mocker):
+    warm = mocker.patch("database.warm_up", return_value={"connections": 5, "books": 0})
+    worker = Mock()
+
+    runpy.run_path(CONFIG)["post_worker_init"](worker)
+
+    warm.assert_called_once_with()
+    worker.log.info.assert_called_once()
+
+
+def test_wsgi_entry_point(temp_db):
+    from wsgi import app
+
+    assert app.test_client().get("/catalog").status_code == 200
@@ -0,0 +1,70 @@
+import os
+import subprocess
+import sys
+
+import database
+from app import create_app
+from database import get_db_connection
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Cumulative `import app` time allowed, in milliseconds
+IMPORT_BUDGET_MS = float(os.environ.get("LIBRARY_IMPORT_BUDGET_MS", "750"))
+
+
+def _import_times(module):
+    """Run `python -X importtime -c 'import module'`; returns {module: cumulative microseconds}."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=ROOT, capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def test_app_import_stays_within_budget():
+    times = _import_times("app")
+    assert not {"requests", "numpy"} & times.keys()
+    assert times["app"] / 1000 < IMPORT_BUDGET_MS
+
+
+def _book_count():
+    conn = get_db_connection()
+    count = conn.execute("SELECT COUNT(*) FROM books").fetchone()[0]
+    conn.close()
+    return count
+
+
+def test_create_app_sets_up_schema_once_and_does_not_seed(temp_db, mocker, monkeypatch):
+    monkeypatch.setattr(database, "DATABASE", temp_db + ".fresh")
+    migrations = mocker.spy(database, "run_migrations")
+
+    create_app()
+    create_app()
+
+    assert migrations.call_count == 1
+    assert _book_count() == 0
+    database.close_pool()
+
+
+def test_current_schema_skips_migrations(temp_db, mocker):
+    migrations = mocker.spy(database, "run_migrations")
+    database.init_database()
+    migrations.assert_not_called()
+
+    conn = get_db_connection()
+    conn.execute("PRAGMA user_version = 0")
+    conn.close()
+    database.init_database()
+    assert migrations.call_count == 1
+
+
+def test_seed_command(temp_db):
+    runner = create_app().test_cli_runner()
+
+    assert runner.invoke(args=["seed"]).exit_code == 0
+    assert runner.invoke(args=["seed"]).exit_code == 0
+    assert _book_count() == 3
@@ -0,0 +1,12 @@
+"""
+WSGI entry point for production servers, e.g.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+`flask run` and `python app.py` use the single-process development server
+and are for local work only.
+"""
+
+from app import create_app
+
+app = create_app()